@@ -0,0 +1,82 @@
+import os, sys, glob, hashlib, tempfile
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def compiler_hash():
+    """ hash of the compiler sources (and python version), anything built by
+    one version of the compiler is stale for every other version """
+    h = hashlib.sha256(sys.version.encode())
+    for path in sorted(glob.glob(os.path.join(SRC_DIR, '*.py'))):
+        if os.path.basename(path) == 'parsetab.py':
+            continue
+        with open(path, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+class CompileCache:
+    """ content addressed store of generated assembly.
+
+    Entries are keyed on the hash of the source text, the compiler version
+    and the flags affecting code generation, and live in `<dir>/<xx>/<key>.s`
+    (`.json` for the code of single functions).
+    Every hit refreshes the mtime of the entry, once the cache grows past
+    `max_size` bytes the least recently used entries are evicted. """
+
+    _compiler_hash = None
+
+    def __init__(self, path, max_size):
+        self.path = path
+        self.max_size = max_size
+
+    def key(self, source, flags):
+        if CompileCache._compiler_hash is None:
+            CompileCache._compiler_hash = compiler_hash()
+        h = hashlib.sha256(CompileCache._compiler_hash.encode())
+        h.update(repr(sorted(flags.items())).encode())
+        h.update(source.encode())
+        return h.hexdigest()
+
+    def entry(self, key, ext):
+        return os.path.join(self.path, key[:2], key + ext)
+
+    def get(self, key, ext='.s'):
+        entry = self.entry(key, ext)
+        try:
+            with open(entry, 'r') as f:
+                asm = f.read()
+            os.utime(entry)
+        except OSError:
+            return None
+        return asm
+
+    def put(self, key, asm, ext='.s'):
+        entry = self.entry(key, ext)
+        try:
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(entry))
+        except OSError:
+            # cache is best effort, a read only cache dir is not an error
+            return
+        with os.fdopen(fd, 'w') as f:
+            f.write(asm)
+        os.replace(tmp, entry)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for entry in glob.glob(os.path.join(self.path, '*', '*.*')):
+            try:
+                st = os.stat(entry)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, entry))
+
+        size = sum(e[1] for e in entries)
+        for _, entry_size, entry in sorted(entries):
+            if size <= self.max_size:
+                break
+            try:
+                os.unlink(entry)
+            except OSError:
+                pass
+            size -= entry_size
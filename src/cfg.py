@@ -0,0 +1,166 @@
+from helper import Op
+
+class BasicBlock:
+    """ maximal run of instructions `codes[start:end]` entered only at the
+    top and left only at the bottom """
+
+    def __init__(self, idx, start, end):
+        self.idx = idx
+        self.start = start
+        self.end = end
+        self.preds = []         # BasicBlock
+        self.succs = []         # BasicBlock, fall through first
+        self.idom = None        # immediate dominator (None for the entry)
+        self.loop_depth = 0     # number of loops the block is part of
+
+    def __repr__(self):
+        return f'B{self.idx}[{self.start}:{self.end}]'
+
+class CFG:
+    """ control flow graph of the IR of a single function.
+
+    Built from the function's instruction list (FuncBegin first, FuncEnd
+    last) and invalid once the list is modified; passes changing the code
+    build a new one. """
+
+    def __init__(self, codes):
+        self.codes = codes
+        self.name = codes[0].e1
+        self.blocks = []
+        self.block_of = [None] * len(codes)     # instr index => BasicBlock
+        self.targets = sorted({label for code in codes if code.is_jump() for label in code.targets()})
+
+        self.build()
+        self.compute_dominators()
+        self.compute_loops()
+
+    @property
+    def entry(self):
+        return self.blocks[0]
+
+    def build(self):
+        starts = {0}
+        for idx, code in enumerate(self.codes):
+            if code.is_jump():
+                starts.update(code.targets())
+                starts.add(idx + 1)
+            elif code.instr == Op.TAIL_CALL:
+                starts.add(idx + 1)
+        # a jump past the last instruction leaves the function
+        starts = sorted(s for s in starts if s < len(self.codes))
+
+        for idx, start in enumerate(starts):
+            end = starts[idx + 1] if idx + 1 < len(starts) else len(self.codes)
+            block = BasicBlock(idx, start, end)
+            self.blocks.append(block)
+            self.block_of[start:end] = [block] * (end - start)
+
+        for block in self.blocks:
+            for succ in self.instr_successors(block.end - 1):
+                if succ < len(self.codes) and self.block_of[succ] not in block.succs:
+                    block.succs.append(self.block_of[succ])
+                    self.block_of[succ].preds.append(block)
+
+    def instr_successors(self, idx):
+        """ indices control may reach right after instruction idx """
+        code = self.codes[idx]
+        succ = []
+        # a tail call leaves the function, a switch always jumps
+        if code.instr not in (Op.GOTO, Op.TAIL_CALL, Op.SWITCH) and idx + 1 < len(self.codes):
+            succ.append(idx + 1)
+        if code.is_jump():
+            succ.extend(code.targets())
+        return succ
+
+    def instrs(self, block):
+        return self.codes[block.start:block.end]
+
+    def reachable(self):
+        """ blocks reachable from the entry, in reverse post order """
+        order = []
+        seen = set()
+        stack = [(self.entry, iter(self.entry.succs))]
+        seen.add(self.entry)
+        while stack:
+            block, succs = stack[-1]
+            for succ in succs:
+                if succ not in seen:
+                    seen.add(succ)
+                    stack.append((succ, iter(succ.succs)))
+                    break
+            else:
+                stack.pop()
+                order.append(block)
+        return order[::-1]
+
+    def compute_dominators(self):
+        # Cooper, Harvey, Kennedy: "A Simple, Fast Dominance Algorithm"
+        order = self.reachable()
+        rpo = {block: idx for idx, block in enumerate(order)}
+
+        def intersect(a, b):
+            while a is not b:
+                while rpo[a] > rpo[b]:
+                    a = a.idom
+                while rpo[b] > rpo[a]:
+                    b = b.idom
+            return a
+
+        self.entry.idom = self.entry
+        changed = True
+        while changed:
+            changed = False
+            for block in order[1:]:
+                new_idom = None
+                for pred in block.preds:
+                    if pred.idom is None:
+                        continue
+                    new_idom = pred if new_idom is None else intersect(pred, new_idom)
+                if new_idom is not block.idom:
+                    block.idom = new_idom
+                    changed = True
+        self.entry.idom = None
+
+    def dominates(self, a, b):
+        """ True if every path from the entry to b goes through a """
+        while b is not None:
+            if b is a:
+                return True
+            b = b.idom
+        return False
+
+    def compute_loops(self):
+        """ natural loops, by header, from the back edges (edges to a block
+        dominating their source) """
+        self.loops = {}
+        for block in self.reachable():
+            for succ in block.succs:
+                if self.dominates(succ, block):
+                    body = self.loops.setdefault(succ, {succ})
+                    stack = [block]
+                    while stack:
+                        node = stack.pop()
+                        if node not in body:
+                            body.add(node)
+                            stack.extend(node.preds)
+
+        for body in self.loops.values():
+            for block in body:
+                block.loop_depth += 1
+
+    def gen_dot(self, graph):
+        """ add the CFG to a pydot graph as a cluster of its own """
+        import pydot
+
+        cluster = pydot.Cluster(f'cfg_{self.name}', label=self.name)
+        for block in self.blocks:
+            lines = [f'{idx}: {self.codes[idx]}' for idx in range(block.start, block.end)]
+            label = f'B{block.idx} (loop depth {block.loop_depth})\\l' + ''.join(
+                line.replace('\\', '\\\\').replace('"', '\\"') + '\\l' for line in lines)
+            cluster.add_node(pydot.Node(f'{self.name}_B{block.idx}', shape='box', label=f'"{label}"'))
+        for block in self.blocks:
+            for succ in block.succs:
+                style = 'dashed' if succ in self.loops and block in self.loops[succ] else 'solid'
+                cluster.add_edge(pydot.Edge(f'{self.name}_B{block.idx}', f'{self.name}_B{succ.idx}', style=style))
+        graph.add_subgraph(cluster)
+        return cluster
@@ -1,12 +1,38 @@
-from parser import symtable
 import re
 
 from parser_class import Function, VarType
+from helper import Op, parse_int
+from cfg import CFG
+from dataflow import escaped_vars, tracked_kind, sym_key, liveness, next_uses
+from peephole import Peephole
 import struct
 
 INT_MAX = 2**31 - 1
 INT_MIN = -2**31
 
+# i386 cdecl: a callee may change eax, ecx and edx, and must restore ebx,
+# esi and edi (and ebp) before returning
+CALLER_SAVED = ('eax', 'ecx', 'edx')
+CALLEE_SAVED = ('ebx', 'esi', 'edi')
+
+# jumps taken if a comparison holds, for the flags of cmp and of ucomiss /
+# fcomip (unsigned, operands of < and <= swapped). Float == and != need the
+# parity flag too and are not fused with the branch
+INT_JCC = {'==': 'je', '!=': 'jne', '<': 'jl', '<=': 'jle', '>': 'jg', '>=': 'jge'}
+FLOAT_JCC = {'<': 'ja', '<=': 'jae', '>': 'ja', '>=': 'jae'}
+
+# instructions calling a function that returns to the caller
+CALLS = (Op.CALL, Op.PRINTF, Op.SCANF)
+
+# structs up to this size are copied a word at a time, larger ones by
+# rep movsl
+INLINE_COPY_BYTES = 64
+
+# xmm registers caching float symbols with --sse (all of them are caller
+# saved), the last one is kept free for constants and conversions
+NUM_XMM = 7
+XMM_SCRATCH = '%xmm7'
+
 def binary(num):
     return hex(struct.unpack('<I', struct.pack('<f', num))[0])
     # return ''.join('{:0>8b}'.format(c) for c in struct.pack('!f', num))
@@ -14,18 +40,54 @@ def binary(num):
 def binary2float(b):
     return struct.unpack('>f', struct.pack('>I', int(b, 16)))[0]
 
+def magic_divisor(d):
+    """ multiplier m and shift s dividing a signed 32 bit x by d (> 1, not a
+    power of two): the high half of m * x (plus x if m is negative as a
+    signed value) shifted right by s, plus one if x is negative
+    (Hacker's Delight, 10-1) """
+    two31 = 2**31
+    anc = two31 - 1 - two31 % d
+    p = 31
+    q1, r1 = divmod(two31, anc)
+    q2, r2 = divmod(two31, d)
+    while True:
+        p += 1
+        q1, r1 = 2 * q1, 2 * r1
+        if r1 >= anc:
+            q1, r1 = q1 + 1, r1 - anc
+        q2, r2 = 2 * q2, 2 * r2
+        if r2 >= d:
+            q2, r2 = q2 + 1, r2 - d
+        delta = d - r2
+        if not (q1 < delta or (q1 == delta and r1 == 0)):
+            break
+    return q2 + 1, p - 32
+
 class AssemblyGen:
-    def __init__(self, func_code, debug=False):
-        self.func_code = func_code
+    def __init__(self, ctx, debug=False, opt=0, sse=False):
+        self.ctx = ctx
+        self.symtable = ctx.symtable
+        self.func_code = ctx.tac.func_code
         self.reg_no = {'ebx':0, 'ecx':1, 'esi':2, 'edi':3, 'eax':4, 'edx':5}
         self.reg_name =  {value:key for key, value in self.reg_no.items()}
         self.num_reg = len(self.reg_no)
         self.tie_reg = 0 # register to be spilled if all registers are full
         self.reg_d = [None] * self.num_reg
         self.addr_d = {}
+        self.pinned = {} # symbol => register it is held in for its whole live range
+        self.reserved = set() # registers the current instruction uses implicitly
         self.assembly = []
         self.cur_instr = None
         self.debug = debug
+        self.opt = opt # >= 1: use the liveness of the IR symbols
+        self.live_out = None # tracked symbols live after each instr of the function
+        self.next_use = None # next instr of the block reading each symbol
+        self.clobbered = set() # registers the function writes
+        self.sse = sse # floats in xmm registers (SSE2) instead of the x87 stack
+        self.xreg_d = [None] * NUM_XMM
+        self.xaddr_d = {}
+        self.peephole = Peephole() if opt >= 1 else None
+        self.func_text = {} # generated code of each function
     
     def code_idx(self):
         return len(self.assembly)
@@ -43,11 +105,19 @@ class AssemblyGen:
 
         for i in available_regs:
             if self.reg_d[i] is None:
+                self.clobbered.add(i)
                 return i
         
         # all registers are full
-        self.spillreg(available_regs[0])
-        return available_regs[0]
+        if self.next_use is not None:
+            # evict a dead value, else the one needed furthest ahead
+            victim = max(available_regs, key=self.eviction_rank)
+            self.spillreg(victim, need=self.is_live_after(self.reg_d[victim]))
+        else:
+            victim = available_regs[0]
+            self.spillreg(victim)
+        self.clobbered.add(victim)
+        return victim
         # for i in range(self.num_reg):
         #     if byte_reg and (not self.is_byte_reg(i)):
         #         continue
@@ -62,8 +132,13 @@ class AssemblyGen:
         #     return self.getreg(byte_reg=True)
         # return reg
     
-    def spillreg(self, reg, need=True):
+    def spillreg(self, reg, need=None):
+        if self.reg_d[reg] in self.pinned:
+            # the register is the home of the symbol, memory is never read
+            return
         if self.reg_d[reg] != None:
+            if need is None:
+                need = self.may_read(self.reg_d[reg])
             if not self.is_in_scope(self.reg_d[reg]):
                 # variable stored in reg is out of scope so we don't need its value
                 need = False
@@ -90,7 +165,76 @@ class AssemblyGen:
     def spillallregs(self, need=True): #need implies if we may need to store or just empty it
         for reg in range(self.num_reg):
             self.spillreg(reg, need)
+        for xreg in range(NUM_XMM):
+            self.spill_xmm(xreg, need)
+
+    def spill_block_end(self, idx):
+        """ empty the registers at the end of a basic block (instruction idx),
+        values nobody reads after it are dropped without a store """
+        for reg in range(self.num_reg):
+            if self.reg_d[reg] is not None:
+                self.spillreg(reg, need=self.is_live_after(self.reg_d[reg], idx))
+        for xreg in range(NUM_XMM):
+            if self.xreg_d[xreg] is not None:
+                self.spill_xmm(xreg, need=self.is_live_after(self.xreg_d[xreg], idx))
+
+    def may_read(self, name):
+        """ if the value of name may still be read, by the current instruction
+        or after it. A dead value is not stored, its stack slot may belong to
+        another symbol by now """
+        return name in (self.cur_instr.e1, self.cur_instr.e2, self.cur_instr.e3) or self.is_live_after(name)
+
+    def is_live_after(self, name, idx=None):
+        """ if the value of name may be read after instruction idx (default
+        the current one) """
+        if self.live_out is None or tracked_kind(self.cur_instr, name, self.escaped) is None:
+            return True
+        idx = self.cur_idx if idx is None else idx
+        return sym_key(self.cur_instr, name) in self.live_out[idx]
+
+    def eviction_rank(self, reg):
+        name = self.reg_d[reg]
+        if not self.is_live_after(name):
+            return (1, 0)
+        next_idx = self.next_use[self.cur_idx].get(sym_key(self.cur_instr, name))
+        return (0, len(self.next_use) if next_idx is None else next_idx)
+
+    def spill_for_call(self):
+        """ empty the registers a call may change, only the values read after
+        it are stored. Symbols the callee can read or write in memory (globals,
+        variables with a pointer to them) are stored and dropped from every
+        register """
+        for reg in range(self.num_reg):
+            name = self.reg_d[reg]
+            if name is None or name in self.pinned:
+                continue
+            if tracked_kind(self.cur_instr, name, self.escaped) is None:
+                self.spillreg(reg)
+            elif self.reg_name[reg] in CALLER_SAVED:
+                self.spillreg(reg, need=self.is_live_after(name))
+        for xreg in range(NUM_XMM):
+            if self.xreg_d[xreg] is not None:
+                self.spill_xmm(xreg, need=self.is_live_after(self.xreg_d[xreg]))
     
+    def spill_for_memory(self, base):
+        """ a load or store through the pointer base may touch any symbol
+        a pointer can reach (globals, variables with a pointer to them),
+        their copies in registers are stored and dropped first. Elements of
+        an array named by base are never held in a register """
+        if self.opt < 1:
+            return
+        info = self.get_info(base)
+        if info is not None and info['type'].is_array() and not info['type'].is_param:
+            return
+        for reg in range(self.num_reg):
+            name = self.reg_d[reg]
+            if name is not None and name not in self.pinned and tracked_kind(self.cur_instr, name, self.escaped) is None:
+                self.spillreg(reg)
+        for xreg in range(NUM_XMM):
+            name = self.xreg_d[xreg]
+            if name is not None and tracked_kind(self.cur_instr, name, self.escaped) is None:
+                self.spill_xmm(xreg)
+
     def get_info(self, name):
         """ Get symbol table information related to name symbol """
         # print(f'{self.cur_instr}, {self.cur_instr.scope.scope_id}, {self.cur_instr.scope.lookup_info(name)}, {name}')
@@ -113,7 +257,8 @@ class AssemblyGen:
         return self.addr_d[name]
     
     def get_all_regs(self):
-        return list(range(self.num_reg))
+        pinned = self.pinned.values()
+        return [reg for reg in range(self.num_reg) if reg not in pinned]
 
     def get_active_regs(self):
         regs = []
@@ -124,7 +269,7 @@ class AssemblyGen:
         return regs
     
     def get_available_regs(self, byte_reg=False):
-        restricted_regs = self.get_active_regs()
+        restricted_regs = self.get_active_regs() + list(self.reserved)
         if byte_reg:
             # add esi, edi to restricted reg
             for reg in [self.reg_no['esi'], self.reg_no['edi']]:
@@ -147,6 +292,9 @@ class AssemblyGen:
         elif isinstance(name_info, str):
             # if argument is name of symbol then get info from scope/symbol table
             name = name_info
+            if name in self.xaddr_d:
+                # memory is read or written directly, the xmm copy goes
+                self.spill_xmm(self.xaddr_d[name])
             name_info = self.get_info(name_info)
             if name_info == None: # possibly constant value
                 # return '$' + name
@@ -170,6 +318,11 @@ class AssemblyGen:
                 return f'{hex(name_info["offset"])}(%ebp)'
     
     def loadreg(self, reg, name, need=True):
+        if name in self.pinned:
+            # copy, the symbol stays in its home register
+            if need:
+                self.add(f"mov %{self.reg_name[self.pinned[name]]}, %{self.reg_name[reg]}")
+            return
         if self.reg_d[reg] != None:
             self.addr_d.pop(self.reg_d[reg], None)
             self.reg_d[reg] = None
@@ -227,19 +380,167 @@ class AssemblyGen:
             else:
                 return self.get_addr(name)
 
-    def gen_assembly(self, ):
-        self.add('.data')
-        
+    def gen_data(self):
         # dump global symtable into .data section
-        for keys, value in symtable.global_scope.variables.items():
+        for keys, value in self.symtable.global_scope.variables.items():
             self.add(f'{value["name"]}:')
             self.add(f'.zero {value["type"].get_size()}')
         
         # add fmt string info
-        for (label, fmt_str) in symtable.fmt_var.items():
+        for (label, fmt_str) in self.symtable.fmt_var.items():
             self.add(f'{label}:')
             self.add (f'.string {fmt_str}')
 
+    def gen_functions(self):
+        # IR of the functions compiled in this run, the others are reused
+        func_code = {codes[0].e1: codes for codes in self.func_code or []}
+
+        for fname in self.ctx.func_order:
+            if fname in self.ctx.reused:
+                self.assembly.extend(self.ctx.reused[fname]['text'])
+                continue
+            start = len(self.assembly)
+            self.gen_function(fname, func_code[fname])
+            if self.peephole is not None:
+                self.assembly[start:] = self.peephole.run(self.assembly[start:])
+            self.func_text[fname] = self.assembly[start:]
+
+    def gen_function(self, fname, codes):
+        # code of a function must not depend on the functions before it
+        self.tie_reg = 0
+        self.epilogue_idx = []
+        self.codes = codes
+        self.branch_cc = None # jump of a comparison fused with the next ifnz
+        self.call_pad = self.call_padding(codes) if self.opt >= 1 else {}
+
+        # a label for every jump target (named after the function so that
+        # code of a function does not depend on its position in the file)
+        cfg = CFG(codes)
+        self.labels = {label: f"label_{fname}_{id}" for id, label in enumerate(cfg.targets)}
+
+        # symbols the allocator gave a register for their whole live range
+        homes = self.ctx.homes.get(fname, [])
+
+        self.clobbered = set()
+        if self.opt >= 1:
+            self.escaped = escaped_vars(codes)
+            self.live_out = liveness(cfg, self.escaped)
+            self.next_use = next_uses(cfg)
+
+        for idx, code in enumerate(codes):
+            self.cur_instr = code
+            self.cur_idx = idx
+
+            # if cur code is part of new label => create it
+            if idx in self.labels:
+                # spill registers before jump / labelled instruction for consistency
+                self.spill_block_end(idx - 1)
+                self.add(f'{self.labels[idx]}:')
+            
+            self.add(f'\n // {code}')
+            if self.debug:
+                self.add(f'\n // {self.reg_no} \n // {self.addr_d} \n // {self.reg_d}')
+
+            self.pin_homes(homes, idx)
+                
+            # gen it!
+            self.gen_instr(code)
+
+            if idx == 0:
+                # params held in registers are loaded once, past the prologue
+                for home in homes:
+                    scope_id, name = home.key
+                    info = self.symtable.all_scope[scope_id].variables[name]
+                    if home.start == 0 and info['offset'] > 0:
+                        self.add(f"mov {self.get_addr(info)}, %{home.reg}")
+
+        # FIXME: don't know what it is for
+        if len(codes) in self.labels:
+            self.add(f'{self.labels[len(codes)]}:')
+        
+        self.spillallregs(need=False)
+        self.pin_homes([], len(codes))
+        self.live_out = None
+        self.next_use = None
+
+        self.save_callee_saved(fname, align=self.opt >= 1 and any(code.instr in CALLS for code in codes))
+
+    def param_bytes(self, code):
+        """ bytes pushed by the param instruction code """
+        info = code.scope.lookup_info(code.e1)
+        if info is None:
+            return 4
+        if info['type'].is_float():
+            # floats are passed as double
+            return 8
+        if info['type'].is_struct_type():
+            return info['type']._type.get_size()
+        return 4
+
+    def call_padding(self, codes):
+        """ bytes left free before the arguments of each call so that esp is
+        16 byte aligned at the call (the frame is), by index of the first
+        param instruction and of the call """
+        pads = {}
+        for idx, code in enumerate(codes):
+            if code.instr not in CALLS:
+                continue
+            first, pushed = idx, 0
+            while codes[first - 1].instr == Op.PUSH_PARAM:
+                first -= 1
+                pushed += self.param_bytes(codes[first])
+            if pushed % 16:
+                pads[first] = pads[idx] = -pushed % 16
+        return pads
+
+    def save_callee_saved(self, fname, align=False):
+        """ callers keep values in ebx, esi and edi across the call, those the
+        function writes are saved below its locals and restored on return.
+        With align the frame is rounded up to keep esp 16 byte aligned """
+        saved = [reg for reg in CALLEE_SAVED if self.reg_no[reg] in self.clobbered]
+        func = self.symtable.lookup_func(fname)
+        scope = self.symtable.all_scope[func.scope_id]
+        frame = scope.size + scope.child_max_size
+        slots = [f'{hex(-(frame + 4 * (i + 1)))}(%ebp)' for i in range(len(saved))]
+        size = frame + 4 * len(saved)
+        if align:
+            # the return address and the saved ebp are on top of the frame
+            size = (size + 8 + 15) // 16 * 16 - 8
+
+        # epilogues (the return and every tail call) first, the prologue
+        # comes before them
+        for idx in reversed(self.epilogue_idx):
+            self.assembly[idx:idx] = [f'mov {slot}, %{reg}' for reg, slot in zip(saved, slots)]
+        self.assembly[self.frame_idx] = f'sub ${hex(size)}, %esp'
+        self.assembly[self.frame_idx + 1:self.frame_idx + 1] = [
+            f'mov %{reg}, {slot}' for reg, slot in zip(saved, slots)]
+
+    def pin_homes(self, homes, idx):
+        """ release the home registers of the live ranges that ended before
+        instruction idx and take the ones of the ranges starting at it """
+        live = {home.name: home for home in homes if home.start <= idx <= home.end}
+        for name, reg in list(self.pinned.items()):
+            if name not in live:
+                del self.pinned[name]
+                self.addr_d.pop(name, None)
+                self.reg_d[reg] = None
+        for name, home in live.items():
+            if name not in self.pinned:
+                reg = self.reg_no[home.reg]
+                self.spillreg(reg)
+                self.clobbered.add(reg)
+                self.pinned[name] = reg
+                self.addr_d[name] = reg
+                self.reg_d[reg] = name
+
+    def gen_assembly(self, ):
+        prelude = self.ctx.prelude
+
+        self.add('.data')
+        self.gen_data()
+        if prelude is not None:
+            self.assembly.extend(prelude.data)
+
         # .text section
         self.add('.text')
         self.add('.global main')
@@ -256,42 +557,32 @@ class AssemblyGen:
 
         # self.add("\textern fread2")
 
-        # start traversing the IR (one function at a time!)
-        for fidx, codes in enumerate(self.func_code):
+        # precompiled stdlib helpers, private copy in every object file
+        if prelude is not None:
+            self.assembly.extend(prelude.text)
 
-            # compute the labels info and store in relevant places
-            labels = []
-            for code in codes:
-                if hasattr(code, 'label'):
-                    labels.append(code.label)
-            
-            self.labels = {label: f"label_{fidx}_{id}" for id, label in enumerate(labels)}
-
-            for idx, code in enumerate(codes):
-                self.cur_instr = code
+        self.gen_functions()
 
-                # if cur code is part of new label => create it
-                if str(idx) in self.labels:
-                    self.spillallregs() # spill registers before jump / labelled instruction for consistency
-                    self.add(f'{self.labels[str(idx)]}:')
-                
-                self.add(f'\n // {code}')
-                if self.debug:
-                    self.add(f'\n // {self.reg_no} \n // {self.addr_d} \n // {self.reg_d}')
-                    
-                # gen it!
-                self.gen_instr(code)
-
-            # FIXME: don't know what it is for
-            if str(len(codes)) in self.labels:
-                self.add(f'{self.labels[str(len(codes))]}:')
-            
-            self.spillallregs(need=False)
+        if self.debug:
+            self.assembly.extend(f'\n // {name}: {count}' for name, count in self.ctx.ir_stats.items())
+        if self.debug and self.peephole is not None:
+            self.assembly.extend(self.peephole.report())
         
     def gen_instr(self, code):
         """ generate x86 from 3AC instr """
-        if code.instr == 'ifnz':
-            if self.is_float(code.e1):
+        self.reserved = set()
+        if code.instr == Op.IFNZ:
+            if self.branch_cc is not None:
+                # the comparison right before set the flags
+                cc, self.branch_cc = self.branch_cc, None
+                self.spill_block_end(self.cur_idx)
+                self.add(f'{cc} {self.labels[code.label]}')
+                return
+
+            if self.is_float(code.e1) and self.sse:
+                self.add(f'xorps {XMM_SCRATCH}, {XMM_SCRATCH}')
+                self.add(f'ucomiss {XMM_SCRATCH}, {self.get_xmm(code.e1)}')
+            elif self.is_float(code.e1):
                 if code.e1 in self.addr_d:
                     self.spillreg(self.addr_d[code.e1])
                 self.add(f'fldz')
@@ -301,39 +592,48 @@ class AssemblyGen:
             else:
                 self.add(f'cmp $0, {self.get_symbol(code.e1)}')
             
-            self.spillallregs() # spill registers before jumps / labelled statements for consistency
+            self.spill_block_end(self.cur_idx) # spill registers before jumps / labelled statements for consistency
             self.add(f'jne {self.labels[code.label]}')
 
-        elif code.instr == 'goto':
-            self.spillallregs() # spill registers before jumps / labelled statements for consistency
+        elif code.instr == Op.GOTO:
+            self.spill_block_end(self.cur_idx) # spill registers before jumps / labelled statements for consistency
             self.add(f'jmp {self.labels[code.label]}')
 
-        elif code.instr == 'binop':
+        elif code.instr == Op.BINOP:
             self.binary_op_assembly(code)
 
-        elif code.instr == 'mov':
+        elif code.instr == Op.MOV:
             # check if instruction is 1byte aligned
-            if self.is_char(code.e2):
+            if self.is_float(code.e2) and self.sse:
+                src = self.xmm_operand(code.e1)
+                self.add(f'movss {src}, {self.get_xmm(code.e2, need=False, avoid=[src])}')
+            elif self.is_char(code.e2):
                 self.spillreg(self.reg_no['eax'])
                 self.loadreg(self.reg_no['eax'], code.e1)
                 self.add(f'movb %al, {self.get_addr(code.e2)}')
             else:
                 # mov e1, e2
-                # Forcing e2 to be a register
-                r2 = self.get_symbol(code.e2, reg=True)
+                # Forcing e2 to be a register, its old value is not needed
+                r2 = self.get_symbol(code.e2, reg=True, need=code.e1 == code.e2)
                 r1 = self.get_symbol(code.e1)
                 self.add(f'mov {r1}, {r2}')
 
-        elif code.instr == 'unaryop':
+        elif code.instr == Op.UNARYOP:
+            if code.op == '*':
+                self.spill_for_memory(code.e1)
             self.unary_op_assembly(code)
 
-        elif code.instr == 'array access':
+        elif code.instr == Op.ARRAY_ACCESS:
             # mov e1[e2], e3
             # e1[e2] is memory so e3 is required to be in register
 
 
+            if not self.get_info(code.e3)['type'].is_array():
+                self.spill_for_memory(code.e1)
+
             # displ = self.get_addr(code.e1, displ=True) # need only offset/displacement of e1 not entier address
             r1 = self.get_symbol(code.e1, reg=True) # need only offset/displacement of e1 not entier address
+            self.reserved.add(self.reg_no[r1[1:]])
 
             if self.get_info(code.e3)['type'].is_array():
                 instr = 'lea'
@@ -352,9 +652,9 @@ class AssemblyGen:
             #     self.add(f'{instr} ({r1}, {self.get_symbol(code.e2, reg=True)}, {self.get_info(code.e1)["type"].get_ref_size()}), {r}')
             # else:
             if instr == 'movb':
-                self.add(f'{instr} ({r1} , {self.get_symbol(code.e2, reg=True)}, 1), %{r3[2]}l')
+                self.add(f'{instr} {self.array_operand(code, r1)}, %{r3[2]}l')
             else:
-                self.add(f'{instr} ({r1} , {self.get_symbol(code.e2, reg=True)}, 1), {r3}')
+                self.add(f'{instr} {self.array_operand(code, r1)}, {r3}')
 
             if self.is_char(code.e3):
                 r3 = self.reg_no[r3[1:]]
@@ -368,25 +668,27 @@ class AssemblyGen:
                     self.add(f"mov %{self.reg_name[old_reg]}, %{self.reg_name[r3]}")
                 self.add(f"movzbl %{self.reg_name[r3][1]}l, %{self.reg_name[r3]}")
 
-        elif code.instr == 'call':
-
-            self.spillreg(self.reg_no['eax'])
+        elif code.instr == Op.CALL:
 
             # library funcitons may change value in registers
             # recommanded use of functions wrapped with custom functions
             # e.g. prefer using prints/printn over printf 
             # if only custom functions are used no need to spill regs
             # while using ready-made functions spilling regs is required
-            self.spillallregs()
+            if self.opt >= 1:
+                self.spill_for_call()
+            else:
+                self.spillreg(self.reg_no['eax'])
+                self.spillallregs()
 
             # assuming label for the function is same as name of the function
             self.add(f'call {code.e1}')
 
-            FuncType = symtable.lookup_func(code.e1)
+            FuncType = self.symtable.lookup_func(code.e1)
             if FuncType is None:
                 raise Exception(f'functype is none {code.e1}')
 
-            self.add(f'add ${hex(FuncType.param_size())}, %esp')
+            self.add(f'add ${hex(FuncType.param_size() + self.call_pad.get(self.cur_idx, 0))}, %esp')
 
             if code.e2 != '#':
                 if self.is_float(code.e2):
@@ -395,21 +697,48 @@ class AssemblyGen:
                     self.reg_d[self.reg_no['eax']] = code.e2
                     self.addr_d[code.e2] = self.reg_no['eax']
 
-        elif code.instr in ['printf', 'scanf']:
+        elif code.instr == Op.TAIL_CALL:
+            # the arguments pushed take the place of the function's own, the
+            # callee returns to our caller (who pops them)
+            self.spill_for_call()
+            FuncType = self.symtable.lookup_func(code.e1)
+            for offset in range(0, FuncType.param_size(), 4):
+                self.add(f'mov {hex(offset)}(%esp), %eax')
+                # past the saved ebp and the return address
+                self.add(f'mov %eax, {hex(offset + 8)}(%ebp)')
+            self.epilogue_idx.append(self.code_idx())
+            self.add(f'mov %ebp, %esp')
+            self.add(f'pop %ebp')
+            self.add(f'jmp {code.e1}')
 
-            self.spillreg(self.reg_no['eax'])
+        elif code.instr in (Op.PRINTF, Op.SCANF):
+
+            if self.opt >= 1:
+                self.spill_for_call()
+            else:
+                self.spillreg(self.reg_no['eax'])
+                for xreg in range(NUM_XMM):
+                    self.spill_xmm(xreg)
 
             # assuming label for the function is same as name of the function
-            self.add(f'call {code.instr}')
+            self.add(f'call {code.instr.value}')
 
-            self.add(f'add ${hex(int(code.e1))}, %esp')
+            self.add(f'add ${hex(int(code.e1) + self.call_pad.get(self.cur_idx, 0))}, %esp')
 
             if code.e2 != '#':
                 self.reg_d[self.reg_no['eax']] = code.e2
                 self.addr_d[code.e2] = self.reg_no['eax']
         
-        elif code.instr == 'push param':
-            if self.is_float(code.e1):
+        elif code.instr == Op.PUSH_PARAM:
+            if self.cur_idx in self.call_pad:
+                self.add(f'sub ${hex(self.call_pad[self.cur_idx])}, %esp')
+
+            if self.is_float(code.e1) and self.sse:
+                # floats are passed as double
+                self.add(f'cvtss2sd {self.xmm_operand(code.e1)}, {XMM_SCRATCH}')
+                self.add(f'lea -0x8(%esp), %esp')
+                self.add(f'movsd {XMM_SCRATCH}, (%esp)')
+            elif self.is_float(code.e1):
                 if code.e1 in self.addr_d:
                     self.spillreg(self.addr_d[code.e1])
                 self.add(f'lea -0x8(%esp), %esp')
@@ -423,15 +752,29 @@ class AssemblyGen:
                 size = self.get_info(code.e1)['type']._type.get_size()
                 r = self.get_symbol(code.e1, reg=True)
                 assert(size % 4 == 0)
-                for i in reversed(range(0, size, 4)):
-                    self.add(f'pushl {hex(i)}({r})')
+                if size <= INLINE_COPY_BYTES:
+                    for i in reversed(range(0, size, 4)):
+                        self.add(f'pushl {hex(i)}({r})')
+                else:
+                    dst = '%' + self.reg_name[self.getreg()]
+                    self.add(f'sub ${hex(size)}, %esp')
+                    self.add(f'mov %esp, {dst}')
+                    self.copy_block(size, r, dst)
             else:
                 self.add(f'push {self.get_symbol(code.e1)}')
 
-        elif code.instr == 'memory update':
+        elif code.instr == Op.BLOCK_COPY:
+            self.spill_for_memory(code.e1)
+            self.spill_for_memory(code.e2)
+            src = self.get_symbol(code.e1, reg=True)
+            dst = self.get_symbol(code.e2, reg=True)
+            self.copy_block(code.op, src, dst)
+
+        elif code.instr == Op.MEMORY_UPDATE:
 
             # mov e1, (e2)
             # (e2) is memory location so e1 is required to be in register
+            self.spill_for_memory(code.e2)
 
             info = self.get_info(code.e2)
             if info['type'].get_ref_type().is_char():
@@ -454,14 +797,20 @@ class AssemblyGen:
                         self.loadreg(r, code.e1, need=False)
                         self.add(f'movb {self.get_addr(code.e1)}, %{self.reg_name[r][1]}l')
                         self.add(f'movzbl %{self.reg_name[r][1]}l, %{self.reg_name[r]}')
+                    # a constant e1 is in a register no symbol owns
+                    self.reserved.add(r)
                     self.add(f'movb %{self.reg_name[r][1]}l, ({self.get_symbol(code.e2, reg=True)})')
             else:
-                self.add(f'mov {self.get_symbol(code.e1, reg=True)}, ({self.get_symbol(code.e2, reg=True)})')
+                r1 = self.get_symbol(code.e1, reg=True)
+                # a constant e1 is in a register no symbol owns
+                self.reserved.add(self.reg_no[r1[1:]])
+                self.add(f'mov {r1}, ({self.get_symbol(code.e2, reg=True)})')
 
-        elif code.instr == 'array update':
+        elif code.instr == Op.ARRAY_UPDATE:
 
             # mov e1, e3[e2]
             # e3[e2] is memory location so e1 is required to be in register
+            self.spill_for_memory(code.e3)
             info = self.get_info(code.e3)
             if info['type'].get_ref_type().is_char():
                 byte_reg = True
@@ -470,52 +819,77 @@ class AssemblyGen:
                 byte_reg = False
                 instr = 'mov'
             r1 = self.get_symbol(code.e1, reg=True, byte_reg=byte_reg)
+            # a constant e1 is in a register no symbol owns
+            self.reserved.add(self.reg_no[r1[1:]])
 
             r3 = self.get_symbol(code.e3, reg=True) 
-            r2 = self.get_symbol(code.e2, reg=True)
 
             if instr == 'movb':
-                self.add(f'{instr} %{r1[2]}l, ({r3} , {r2}, 1)')
+                self.add(f'{instr} %{r1[2]}l, {self.array_operand(code, r3)}')
             else:
-                self.add(f'{instr} {r1}, ({r3} , {r2}, 1)')
+                self.add(f'{instr} {r1}, {self.array_operand(code, r3)}')
 
-        elif code.instr == 'ifeq':
+        elif code.instr == Op.IFEQ:
             r1 = self.get_symbol(code.e1, reg=True)
             r2 = self.get_symbol(code.e2)
 
             self.add(f'cmp {r2}, {r1}')
             self.add(f'je {self.labels[code.label]}')
 
-        elif code.instr == 'return':
+        elif code.instr == Op.SWITCH:
+            # jump through a table in .rodata, compared unsigned a value
+            # below the table is out of range too
+            r1 = self.get_symbol(code.e1, reg=True)
+            index = '%' + self.reg_name[self.getreg()]
+            self.add(f'lea {hex(-parse_int(code.e2))}({r1}), {index}')
+            self.spill_block_end(self.cur_idx)
+            self.add(f'cmp ${hex(len(code.op) - 1)}, {index}')
+            self.add(f'ja {self.labels[code.label]}')
+            table = f'table_{self.codes[0].e1}_{self.cur_idx}'
+            self.add(f'jmp *{table}(, {index}, 4)')
+            self.add('.section .rodata')
+            self.add('.align 4')
+            self.add(f'{table}:')
+            for label in code.op:
+                self.add(f'.long {self.labels[label]}')
+            self.add('.text')
+
+        elif code.instr == Op.RETURN:
             
             # print(self.reg_no, self.reg_d)
             # name = self.reg_d[self.reg_no['eax']]
             self.spillreg(self.reg_no['eax'])
             if self.is_float(code.e1):
+                if code.e1 in self.addr_d:
+                    # update memory with actual value of e1
+                    self.spillreg(self.addr_d[code.e1])
                 self.add(f'fld {self.get_addr(code.e1)}')
             else:
                 self.loadreg(self.reg_no['eax'], code.e1)
             
-        elif code.instr == 'FuncBegin':
+        elif code.instr == Op.FUNC_BEGIN:
+            if self.ctx.prelude is not None and code.e1 != 'main':
+                # export for calls from the other files linked alongside
+                self.add(f'.globl {code.e1}')
             self.add(f'{code.e1}:')
             self.add(f'push %ebp')
             self.add(f'mov %esp, %ebp')
-            func = symtable.lookup_func(code.e1)
-            scope = symtable.all_scope[func.scope_id]
+            func = self.symtable.lookup_func(code.e1)
+            scope = self.symtable.all_scope[func.scope_id]
+            self.frame_idx = self.code_idx()
             self.add(f'sub ${hex(scope.size + scope.child_max_size)}, %esp')
             
-        elif code.instr == 'FuncEnd':
-            func = symtable.lookup_func(code.e1)
-            if func.ret_type.is_struct_type():
+        elif code.instr == Op.FUNC_END:
+            func = self.symtable.lookup_func(code.e1)
+            if func.ret_type.is_struct_type() and func.ret_local is None:
                 # copy from %eax to ret@ and store addr of ret@ in %eax
-                scope = symtable.all_scope[func.scope_id]
-                self.add(f'pushl ${func.ret_type.get_size()}')
-                self.add(f'pushl %eax')
-                self.add(f'pushl {hex(scope.lookup_info("ret@")["offset"])}(%ebp)')
-                self.add(f'call bufcpy')
-                self.add(f'addl $12, %esp')
-                self.add(f'movl {hex(scope.lookup_info("ret@")["offset"])}(%ebp), %eax')
+                # (a local built in ret@ is returned with its address in %eax)
+                scope = self.symtable.all_scope[func.scope_id]
+                self.add(f'mov {hex(scope.lookup_info("ret@")["offset"])}(%ebp), %ecx')
+                self.copy_block(func.ret_type.get_size(), '%eax', '%ecx', tmp='%edx')
+                self.add(f'mov %ecx, %eax')
                 
+            self.epilogue_idx.append(self.code_idx())
             self.add(f'mov %ebp, %esp')
             self.add(f'pop %ebp')
             if func.ret_type.is_struct_type():
@@ -523,28 +897,50 @@ class AssemblyGen:
             else:
                 self.add(f'ret ')
         
-        elif code.instr == 'CallSeqBegin':
+        elif code.instr in (Op.CALL_SEQ_BEGIN, Op.CALL_SEQ_END) and self.opt >= 1:
+            # the call stores the caller saved registers still needed after
+            # it, the callee restores the others
+            pass
+
+        elif code.instr == Op.CALL_SEQ_BEGIN:
             self.add(f'push %ebx')
             self.add(f'push %ecx')
             self.add(f'push %edx')
             self.add(f'push %esi')
             self.add(f'push %edi')
             
-        elif code.instr == 'CallSeqEnd':
+        elif code.instr == Op.CALL_SEQ_END:
             self.add(f'pop %edi')
             self.add(f'pop %esi')
             self.add(f'pop %edx')
             self.add(f'pop %ecx')
             self.add(f'pop %ebx')
         
-        elif code.instr == 'spill all':
-            self.spillallregs()
         else:
             raise Exception(f'Invalid code instr = {code.instr}')
 
     def is_const(self, e):
         return e[0] == '$'
     
+    def array_operand(self, code, base):
+        """ memory operand addressing e2 from the register base, scaled and
+        displaced as the optimizer folded into the access """
+        scale, displ = code.op or (1, 0)
+        if self.is_const(code.e2):
+            displ += self.int_value(code.e2) * scale
+            return f'{displ or ""}({base})'
+        index = self.get_symbol(code.e2, reg=True)
+        return f'{displ or ""}({base} , {index}, {scale})'
+
+    def int_value(self, e):
+        """ value of an int constant operand, None for anything else """
+        if not self.is_const(e):
+            return None
+        try:
+            return int(e[1:])
+        except ValueError:
+            return None
+
     def is_global(self, e):
         info = self.get_info(e)
         if e == None:
@@ -556,7 +952,9 @@ class AssemblyGen:
         return self.get_info(e) and self.get_info(e)['type'].is_float()
 
     def unary_op_assembly(self, code):
-        if code.op == '&':
+        if self.sse and code.op in ('float-', 'int2float', 'float2int', 'double2float'):
+            self.sse_unary_op(code)
+        elif code.op == '&':
             # lea (e1), e2
             # e2 requires to be in register
             self.add(f'lea {self.get_addr(code.e1, need=True, remove_dollar=True)}, {self.get_symbol(code.e2, reg=True)}')
@@ -668,37 +1066,48 @@ class AssemblyGen:
         """
         binary ops: +, -, *, /, %, <<, >>, |, &, ^, >, >=, <, <=, ==, !=
         """
-        if code.op == 'int+':
+        if self.sse and code.op.startswith('float'):
+            self.sse_binary_op(code)
+        elif code.op == 'int+':
             # add e1, e2
-            r2 = self.get_symbol(code.e3, reg=True)
+            r2 = self.get_symbol(code.e3, reg=True, need=code.e3 in (code.e1, code.e2))
             
             # copy e2 into e3
             self.add(f'mov {self.get_symbol(code.e2)}, {r2}')
             self.add(f'add {self.get_symbol(code.e1)}, {r2}')
         elif code.op == 'int-':
             # sub e2, e1
-            r2 = self.get_symbol(code.e3, reg=True)
+            r2 = self.get_symbol(code.e3, reg=True, need=code.e3 in (code.e1, code.e2))
             
             # copy e1 into e3
             self.add(f'mov {self.get_symbol(code.e1)}, {r2}')
 
             self.add(f'sub {self.get_symbol(code.e2)}, {r2}')
+        elif code.op == 'int*' and self.opt >= 1 and self.int_value(code.e1) is not None:
+            self.mul_by_const(code.e3, code.e2, self.int_value(code.e1))
+        elif code.op == 'int*' and self.opt >= 1 and self.int_value(code.e2) is not None:
+            self.mul_by_const(code.e3, code.e1, self.int_value(code.e2))
         elif code.op == 'int*':
             # imul e1, e2
-            r2 = self.get_symbol(code.e3, reg=True)
+            r2 = self.get_symbol(code.e3, reg=True, need=code.e3 in (code.e1, code.e2))
             
             # copy e2 into e3
             self.add(f'mov {self.get_symbol(code.e2)}, {r2}')
 
             self.add(f'imul {self.get_symbol(code.e1)}, {r2}')
+        elif code.op in ('int/', '%') and self.opt >= 1 and self.int_value(code.e2) not in (None, 0) \
+                and not self.is_const(code.e1):
+            self.div_by_const(code)
         elif code.op == 'int/':
             # idivl e2
             # store e1 in edx:eax, eax will have quotient and edx will have remainder
             self.spillreg(self.reg_no['edx'])
             self.spillreg(self.reg_no['eax'])
             
-            self.add(f'mov $0, %edx')
+            # sign extend e1 into edx:eax
             self.add(f'mov {self.get_symbol(code.e1)}, %eax')
+            self.add('cltd')
+            self.reserved = {self.reg_no['eax'], self.reg_no['edx']}
             
             if self.is_const(code.e2):
                 self.add(f'idivl {self.get_symbol(code.e2, reg=True)}')
@@ -712,8 +1121,10 @@ class AssemblyGen:
             self.spillreg(self.reg_no['edx'])
             self.spillreg(self.reg_no['eax'])
             
-            self.add(f'mov $0, %edx')
+            # sign extend e1 into edx:eax
             self.add(f'mov {self.get_symbol(code.e1)}, %eax')
+            self.add('cltd')
+            self.reserved = {self.reg_no['eax'], self.reg_no['edx']}
             
             if self.is_const(code.e2):
                 self.add(f'idivl {self.get_symbol(code.e2, reg=True)}')
@@ -721,29 +1132,41 @@ class AssemblyGen:
                 self.add(f'idivl {self.get_symbol(code.e2)}')
             self.reg_d[self.reg_no['edx']] = code.e3
             self.addr_d[code.e3] = self.reg_no['edx']
+        elif code.op == '<<' and self.opt >= 1 and self.int_value(code.e2) is not None:
+            # count known, no need of %cl
+            r = self.get_symbol(code.e3, reg=True, need=code.e3 in (code.e1, code.e2))
+            self.add(f'mov {self.get_symbol(code.e1)}, {r}')
+            self.add(f'shl ${self.int_value(code.e2) & 31}, {r}')
         elif code.op == '<<':
             # shl e2, e1
             # e2 can either be constant or %cl (lower 8 bits of %ecx) register
             self.spillreg(self.reg_no['ecx'])
             self.add(f"mov {self.get_symbol(code.e2)}, %ecx")
+            self.reserved = {self.reg_no['ecx']}
             
-            r = self.get_symbol(code.e3, reg=True)
+            r = self.get_symbol(code.e3, reg=True, need=code.e3 in (code.e1, code.e2))
             self.add(f'mov {self.get_symbol(code.e1)}, {r}') # store e1 in e3
 
             self.add(f'shl %cl, {r}')
+        elif code.op == '>>' and self.opt >= 1 and self.int_value(code.e2) is not None:
+            # count known, no need of %cl
+            r = self.get_symbol(code.e3, reg=True, need=code.e3 in (code.e1, code.e2))
+            self.add(f'mov {self.get_symbol(code.e1)}, {r}')
+            self.add(f'shr ${self.int_value(code.e2) & 31}, {r}')
         elif code.op == '>>':
             # shr e2, e1
             # e2 can either be constant or %cl (lower 8 bits of %ecx) register
             self.spillreg(self.reg_no['ecx'])
             self.add(f"mov {self.get_symbol(code.e2)}, %ecx")
+            self.reserved = {self.reg_no['ecx']}
             
-            r = self.get_symbol(code.e3, reg=True)
+            r = self.get_symbol(code.e3, reg=True, need=code.e3 in (code.e1, code.e2))
             self.add(f'mov {self.get_symbol(code.e1)}, {r}') # store e1 in e3
 
             self.add(f'shr %cl, {r}')
         elif code.op == '|':
             # or e1, e2
-            r2 = self.get_symbol(code.e3, reg=True)
+            r2 = self.get_symbol(code.e3, reg=True, need=code.e3 in (code.e1, code.e2))
             
             # copy e2 into e3
             self.add(f'mov {self.get_symbol(code.e2)}, {r2}')
@@ -751,7 +1174,7 @@ class AssemblyGen:
             self.add(f'or {self.get_symbol(code.e1)}, {r2}')
         elif code.op == '&':
             # and e1, e2
-            r2 = self.get_symbol(code.e3, reg=True)
+            r2 = self.get_symbol(code.e3, reg=True, need=code.e3 in (code.e1, code.e2))
             
             # copy e2 into e3
             self.add(f'mov {self.get_symbol(code.e2)}, {r2}')
@@ -759,7 +1182,7 @@ class AssemblyGen:
             self.add(f'and {self.get_symbol(code.e1)}, {r2}')
         elif code.op == '^':
             # xor e1, e2
-            r2 = self.get_symbol(code.e3, reg=True)
+            r2 = self.get_symbol(code.e3, reg=True, need=code.e3 in (code.e1, code.e2))
             
             # copy e2 into e3
             self.add(f'mov {self.get_symbol(code.e2)}, {r2}')
@@ -772,8 +1195,11 @@ class AssemblyGen:
             # self.add(f'cmp {r2}, {self.get_symbol(code.e1)}')
             self.add(f'cmp {self.get_symbol(code.e2)}, {r1}')
 
-            r = self.get_symbol(code.e3, need=False, byte_reg=True)
-            self.comparator_assembly(code.op[3:], r)
+            if self.fused_branch(code):
+                self.branch_cc = INT_JCC[code.op[3:]]
+            else:
+                r = self.get_symbol(code.e3, need=False, byte_reg=True)
+                self.comparator_assembly(code.op[3:], r)
 
         elif code.op == "float+":
             if code.e1 in self.addr_d:
@@ -843,16 +1269,57 @@ class AssemblyGen:
 
             if code.e2 in self.addr_d:
                 self.spillreg(self.addr_d[code.e2])
-            
-            self.add(f'fld {self.get_addr(code.e1)}')
-            self.add(f'fld {self.get_addr(code.e2)}')
+
+            # fcomip compares st(0) with st(1), a < b is tested as b > a
+            op = code.op[5:]
+            e1, e2 = (code.e2, code.e1) if op in ('<', '<=') else (code.e1, code.e2)
+            self.add(f'fld {self.get_addr(e2)}')
+            self.add(f'fld {self.get_addr(e1)}')
             self.add(f'fcomip')
             self.add(f'fstp %st(0)')
-            r = self.get_symbol(code.e3, need=False, byte_reg=True)
-            self.comparator_assembly(code.op[5:], r)
+            if op in FLOAT_JCC and self.fused_branch(code):
+                self.branch_cc = FLOAT_JCC[op]
+            else:
+                r = self.get_symbol(code.e3, need=False, byte_reg=True)
+                self.float_setcc(op, r)
         else:
             raise Exception(f'float is not handled {code.op}')
     
+    def copy_block(self, size, src, dst, tmp=None):
+        """ copy size bytes (a multiple of 4) from the address in register
+        src to the one in register dst. Small blocks go a word at a time
+        through register tmp (a free one if not given), larger ones by rep
+        movsl, which keeps esi, edi and ecx """
+        if size <= INLINE_COPY_BYTES:
+            tmp = tmp or '%' + self.reg_name[self.getreg()]
+            for i in range(0, size, 4):
+                self.add(f'mov {hex(i)}({src}), {tmp}')
+                self.add(f'mov {tmp}, {hex(i)}({dst})')
+            return
+        for reg in ('%esi', '%edi', '%ecx'):
+            self.add(f'push {reg}')
+        # through the stack, src and dst may be any of the three
+        self.add(f'push {src}')
+        self.add(f'push {dst}')
+        self.add(f'pop %edi')
+        self.add(f'pop %esi')
+        self.add(f'mov ${hex(size // 4)}, %ecx')
+        self.add(f'rep movsl')
+        for reg in ('%ecx', '%edi', '%esi'):
+            self.add(f'pop {reg}')
+
+    def fused_branch(self, code):
+        """ if the result of the comparison code is only read by the ifnz
+        right after it. That one jumps on the flags instead, the result is
+        never materialized """
+        idx = self.cur_idx + 1
+        if self.live_out is None or idx in self.labels:
+            return False
+        branch = self.codes[idx]
+        return (branch.instr == Op.IFNZ and branch.e1 == code.e3
+            and tracked_kind(code, code.e3, self.escaped) is not None
+            and sym_key(code, code.e3) not in self.live_out[idx])
+
     def comparator_assembly(self, op, r):
         if op == '==':
             self.add(f'sete %{r[2]}l')
@@ -876,10 +1343,201 @@ class AssemblyGen:
         else:
             raise Exception(f'Unkown comparator {op}')
     
+    def mul_by_const(self, dst, src, c):
+        """ dst = src * c with a shift and a lea when c is a power of two
+        times 1, 3, 5 or 9, imul with an immediate otherwise """
+        r = self.get_symbol(dst, reg=True, need=dst == src)
+        x = self.get_symbol(src)
+        c = (c + 2**31) % 2**32 - 2**31
+        a = abs(c)
+        k = (a & -a).bit_length() - 1
+        if c == 0:
+            self.add(f'mov $0, {r}')
+        elif a >> k in (1, 3, 5, 9):
+            self.add(f'mov {x}, {r}')
+            if a >> k > 1:
+                self.add(f'lea ({r}, {r}, {(a >> k) - 1}), {r}')
+            if k:
+                self.add(f'shl ${k}, {r}')
+            if c < 0:
+                self.add(f'neg {r}')
+        elif self.is_const(x):
+            self.add(f'mov {x}, {r}')
+            self.add(f'imul ${c}, {r}')
+        else:
+            self.add(f'imul ${c}, {x}, {r}')
+
+    def div_by_const(self, code):
+        """ e1 / c and e1 % c rounding towards zero like idivl, by shifts for
+        a power of two and by a multiplication with the magic number of c
+        otherwise. The quotient is left in edx, the remainder in eax """
+        d = self.int_value(code.e2)
+        self.spillreg(self.reg_no['edx'])
+        self.spillreg(self.reg_no['eax'])
+        self.reserved = {self.reg_no['eax'], self.reg_no['edx']}
+        x = self.get_symbol(code.e1)
+        a = abs(d)
+        k = a.bit_length() - 1
+        if a == 1:
+            self.add(f'mov {x}, %edx')
+            self.add('mov $0, %eax')
+        elif a == 1 << k:
+            # negative x is biased by a - 1 so that the shift rounds up
+            self.add(f'mov {x}, %eax')
+            self.add('cltd')
+            self.add(f'shr ${32 - k}, %edx')
+            self.add('add %eax, %edx')
+            if code.op == 'int/':
+                self.add(f'sar ${k}, %edx')
+            else:
+                self.add(f'and ${-a}, %edx')
+                self.add('sub %edx, %eax')
+        else:
+            m, s = magic_divisor(a)
+            self.add(f'mov ${m - 2**32 if m > INT_MAX else m}, %eax')
+            self.add(f'imull {x}')
+            if m > INT_MAX:
+                self.add(f'add {x}, %edx')
+            if s:
+                self.add(f'sar ${s}, %edx')
+            self.add(f'mov {x}, %eax')
+            self.add('shr $31, %eax')
+            self.add('add %eax, %edx')
+            if code.op == '%':
+                self.add(f'imul ${a}, %edx')
+                self.add(f'mov {x}, %eax')
+                self.add('sub %edx, %eax')
+        if code.op == 'int/' and d < 0:
+            self.add('neg %edx')
+        res = self.reg_no['edx' if code.op == 'int/' else 'eax']
+        self.reg_d[res] = code.e3
+        self.addr_d[code.e3] = res
+
+    def spill_xmm(self, xreg, need=None):
+        name = self.xreg_d[xreg]
+        if name is None:
+            return
+        if need is None:
+            need = self.may_read(name)
+        self.xreg_d[xreg] = None
+        self.xaddr_d.pop(name, None)
+        if need and self.is_in_scope(name):
+            self.add(f'movss %xmm{xreg}, {self.get_addr(name)}')
+
+    def get_xmm(self, name, need=True, avoid=()):
+        """ xmm register holding float symbol name (loaded from memory if
+        need), registers in avoid are not handed out """
+        if name in self.xaddr_d:
+            return f'%xmm{self.xaddr_d[name]}'
+        if name in self.addr_d:
+            # moved around by the integer instructions, memory is current
+            # once it is stored
+            self.spillreg(self.addr_d[name], need=need)
+
+        active = [self.xaddr_d[e] for e in (self.cur_instr.e1, self.cur_instr.e2, self.cur_instr.e3)
+            if isinstance(e, str) and e in self.xaddr_d]
+        free = [x for x in range(NUM_XMM) if f'%xmm{x}' not in avoid and x not in active]
+        xreg = next((x for x in free if self.xreg_d[x] is None), free[0])
+        self.spill_xmm(xreg)
+
+        if need:
+            if self.is_const(name):
+                self.add(f'movd {self.xmm_const(name)}, %xmm{xreg}')
+            else:
+                self.add(f'movss {self.get_addr(name)}, %xmm{xreg}')
+        if not self.is_const(name):
+            self.xreg_d[xreg] = name
+            self.xaddr_d[name] = xreg
+        return f'%xmm{xreg}'
+
+    def xmm_const(self, const):
+        # float constants are the immediate of their bits, put in a scratch
+        # general register for movd
+        r = '%' + self.reg_name[self.getreg()]
+        self.add(f'mov {const}, {r}')
+        return r
+
+    def xmm_operand(self, name):
+        """ source operand of an SSE instruction: xmm register or memory """
+        if name in self.xaddr_d:
+            return f'%xmm{self.xaddr_d[name]}'
+        if self.is_const(name):
+            self.add(f'movd {self.xmm_const(name)}, {XMM_SCRATCH}')
+            return XMM_SCRATCH
+        if name in self.addr_d:
+            self.spillreg(self.addr_d[name])
+        return self.get_addr(name)
+
+    def sse_binary_op(self, code):
+        """ float+, float-, float*, float/ and float comparisons in xmm registers """
+        arith = {'float+': 'addss', 'float-': 'subss', 'float*': 'mulss', 'float/': 'divss'}
+        if code.op in arith:
+            src = self.xmm_operand(code.e2)
+            x3 = self.get_xmm(code.e3, need=False, avoid=[src])
+            if self.is_const(code.e1):
+                self.add(f'movd {self.xmm_const(code.e1)}, {x3}')
+            else:
+                self.add(f'movss {self.xmm_operand(code.e1)}, {x3}')
+            self.add(f'{arith[code.op]} {src}, {x3}')
+            return
+
+        # ucomiss sets the flags like an unsigned compare, unordered (NaN)
+        # operands set ZF, PF and CF. a < b is tested as b > a, so that NaN
+        # compares false everywhere but in !=
+        op = code.op[5:]
+        e1, e2 = (code.e2, code.e1) if op in ('<', '<=') else (code.e1, code.e2)
+        x2 = self.xmm_operand(e2)
+        x1 = self.get_xmm(e1, avoid=[x2])
+        self.add(f'ucomiss {x2}, {x1}')
+
+        if op in FLOAT_JCC and self.fused_branch(code):
+            self.branch_cc = FLOAT_JCC[op]
+        else:
+            r = self.get_symbol(code.e3, need=False, byte_reg=True)
+            self.float_setcc(op, r)
+
+    def float_setcc(self, op, r):
+        """ r = result of the float comparison op from the flags ucomiss or
+        fcomip set (like an unsigned compare of the operands, swapped for
+        < and <=) """
+        setcc = {'==': 'sete', '!=': 'setne', '<': 'seta', '<=': 'setae', '>': 'seta', '>=': 'setae'}
+        self.add(f'{setcc[op]} %{r[2]}l')
+        if op in ('==', '!='):
+            tmp = self.reg_name[self.getreg(byte_reg=True)]
+            self.add(f'{"setnp" if op == "==" else "setp"} %{tmp[1]}l')
+            self.add(f'{"and" if op == "==" else "or"} %{tmp[1]}l, %{r[2]}l')
+        self.add(f'movzbl %{r[2]}l, {r}')
+
+    def sse_unary_op(self, code):
+        """ float negation and the conversions to and from float in xmm registers """
+        if code.op == 'float-':
+            # 0 - e1 like the x87 code, -0.0 stays +0.0
+            src = self.xmm_operand(code.e1)
+            x2 = self.get_xmm(code.e2, need=False, avoid=[src])
+            self.add(f'xorps {x2}, {x2}')
+            self.add(f'subss {src}, {x2}')
+        elif code.op == 'int2float':
+            if self.is_const(code.e1):
+                src = self.get_symbol(code.e1, reg=True)
+            else:
+                src = self.get_symbol(code.e1)
+            self.add(f'cvtsi2ssl {src}, {self.get_xmm(code.e2, need=False)}')
+        elif code.op == 'float2int':
+            # truncates towards zero as C asks for
+            src = self.xmm_operand(code.e1)
+            self.add(f'cvttss2si {src}, {self.get_symbol(code.e2, reg=True, need=False)}')
+        elif code.op == 'double2float':
+            self.add(f'cvtsd2ss {self.get_addr(code.e1)}, {self.get_xmm(code.e2, need=False)}')
+
+    def get_code(self):
+        code = []
+        for idx, instr in enumerate(self.assembly):
+            if instr[-1] == ':':
+                code.append("" + instr + "\n")
+            else:
+                code.append("\t" + instr + "\n")
+        return ''.join(code)
+
     def dump_code(self, filename):
         with open(filename, 'w') as f:
-            for idx, instr in enumerate(self.assembly):
-                if instr[-1] == ':':
-                    f.write("" + instr + "\n")
-                else:
-                    f.write("\t" + instr + "\n")
+            f.write(self.get_code())
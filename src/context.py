@@ -0,0 +1,93 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from helper import SymbolTable, IRHelper
+
+# context whose translation unit is currently being parsed / lowered,
+# AST nodes bind themselves to it when they are created
+_active_ctx = ContextVar('active_ctx', default=None)
+
+def active_context():
+    return _active_ctx.get()
+
+class CompilerContext:
+    """ state of a single translation unit: symbol table, IR buffer, lexer
+    and the declaration state shared by the grammar actions.
+
+    The generated PLY tables and the parser object itself carry no per file
+    state, so any number of contexts can be compiled one after another in
+    the same process. """
+
+    def __init__(self, filename='<input>', prelude=None):
+        self.symtable = SymbolTable(self)
+        self.tac = IRHelper(self.symtable)
+
+        # precompiled stdlib, its declarations are visible to the input
+        # and its code is emitted along with the input's
+        self.prelude = prelude
+        if prelude is not None:
+            prelude.load(self)
+
+        self.lexer = lexer.clone()
+        self.lexer.ctx = self
+        self.lexer.struct_kw = False
+        self.lexer.lineno = 1
+        self.lexer.filename = filename
+        self.lexer.lines = []
+
+        # declaration state set by declaration_specifiers and read by the
+        # declarators reduced after it
+        self.type = None
+        self.is_typedef = False
+        self.is_static = False
+        self.typedef_type = None
+        self.compilation_err = False
+
+        # functions in order of definition, and the ones whose code is
+        # reused from an earlier compilation (name -> cached code)
+        self.func_order = []
+        self.reused = {}
+
+        # registers given to symbols for their whole live range, by function
+        # (filled by the optimizer, see optimizer.allocate_registers)
+        self.homes = {}
+
+        # instructions removed by the IR passes reporting it, by pass
+        self.ir_stats = {}
+
+    def __deepcopy__(self, memo):
+        # types are deep copied freely, the context they belong to is not
+        return self
+
+    @property
+    def filename(self):
+        return self.lexer.filename
+
+    @contextmanager
+    def activate(self):
+        token = _active_ctx.set(self)
+        try:
+            yield self
+        finally:
+            _active_ctx.reset(token)
+
+    def parse(self, ifile):
+        """ parse the source text and return the syntax tree (None on error) """
+        self.lexer.lines = ifile.split("\n")
+        with self.activate():
+            return parser.parse(ifile, lexer=self.lexer)
+
+    def gen(self, syntax_tree):
+        """ lower the syntax tree into three address code """
+        with self.activate():
+            syntax_tree.gen()
+
+    def error(self, error_str):
+        lineno = self.lexer.lineno
+
+        self.compilation_err = True
+        print(bcolors.BOLD+f'{self.lexer.filename}:{lineno}:0'+bcolors.ENDC,end='')
+        print(bcolors.FAIL+' Error:'+bcolors.ENDC, error_str)
+        print('     {} |{}'.format(lineno,self.lexer.lines[lineno - 1]))
+
+from lexer import lexer
+from parser import parser, bcolors
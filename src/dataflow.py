@@ -0,0 +1,129 @@
+from helper import Op
+
+# #############################################################################
+# Symbols
+# #############################################################################
+
+def scalar_kind(info):
+    """ 'int' (pointers included), 'char' or 'float' for symbols held in a
+    single register or memory word, None for everything else """
+    if info is None:
+        return None
+    vtype = info['type']
+    if vtype.is_array() or vtype.is_struct_type():
+        return None
+    if vtype.is_pointer() or vtype.is_int():
+        return 'int'
+    if vtype.is_char():
+        return 'char'
+    if vtype.is_float() and not vtype.is_param:
+        # float params are passed as doubles
+        return 'float'
+    return None
+
+def sym_key(code, name):
+    """ identity of the symbol `name` refers to in the scope of code """
+    if not isinstance(name, str) or name.startswith('$'):
+        return None
+    info = code.scope.lookup_info(name)
+    if info is None:
+        return None
+    return (info['scope_id'], name)
+
+def defined(code):
+    """ operand written by the instruction, if any """
+    if code.instr in (Op.MOV, Op.UNARYOP):
+        return code.e2
+    if code.instr in (Op.BINOP, Op.ARRAY_ACCESS):
+        return code.e3
+    if code.instr in (Op.CALL, Op.PRINTF, Op.SCANF) and code.e2 != '#':
+        return code.e2
+    return None
+
+def operands(code):
+    """ operands read by the instruction """
+    if code.instr in (Op.MOV, Op.UNARYOP, Op.IFNZ, Op.SWITCH, Op.PUSH_PARAM, Op.RETURN):
+        return [code.e1]
+    if code.instr in (Op.BINOP, Op.ARRAY_ACCESS, Op.MEMORY_UPDATE, Op.BLOCK_COPY, Op.IFEQ):
+        return [code.e1, code.e2]
+    if code.instr == Op.ARRAY_UPDATE:
+        return [code.e1, code.e2, code.e3]
+    return []
+
+def escaped_vars(codes):
+    """ variables with a pointer to them still in use, they can change
+    behind the back of the instructions naming them """
+    pointers = {}
+    reads = set()
+    for code in codes:
+        if code.instr == Op.UNARYOP and code.op == '&':
+            pointers[code.e2] = sym_key(code, code.e1)
+        reads.update(e for e in operands(code) if isinstance(e, str))
+    return {key for ptr, key in pointers.items() if ptr in reads}
+
+def tracked_kind(code, name, escaped):
+    """ scalar kind of the symbol if only its own assignments change it
+    (temporaries and locals with no pointer to them), None otherwise """
+    key = sym_key(code, name)
+    if key is None or key[0] == 0 or key in escaped:
+        return None
+    return scalar_kind(code.scope.lookup_info(name))
+
+# #############################################################################
+# Liveness
+# #############################################################################
+
+def liveness(cfg, escaped):
+    """ tracked symbols live right after each instruction """
+    codes = cfg.codes
+    uses, defs = [], []
+    for code in codes:
+        uses.append({sym_key(code, e) for e in operands(code) if tracked_kind(code, e, escaped)})
+        dst = defined(code)
+        defs.append(sym_key(code, dst) if tracked_kind(code, dst, escaped) else None)
+
+    # upward exposed uses and definitions of each block
+    gen, kill = {}, {}
+    for block in cfg.blocks:
+        gen[block], kill[block] = set(), set()
+        for idx in reversed(range(block.start, block.end)):
+            gen[block] = uses[idx] | (gen[block] - {defs[idx]})
+            kill[block].add(defs[idx])
+
+    live_in = {block: set() for block in cfg.blocks}
+    live_out = {block: set() for block in cfg.blocks}
+    changed = True
+    while changed:
+        changed = False
+        for block in reversed(cfg.blocks):
+            out = set().union(*(live_in[succ] for succ in block.succs))
+            live = gen[block] | (out - kill[block])
+            if live != live_in[block] or out != live_out[block]:
+                live_in[block], live_out[block] = live, out
+                changed = True
+
+    instr_out = [None] * len(codes)
+    for block in cfg.blocks:
+        live = set(live_out[block])
+        for idx in reversed(range(block.start, block.end)):
+            instr_out[idx] = set(live)
+            live = uses[idx] | (live - {defs[idx]})
+    return instr_out
+
+def next_uses(cfg):
+    """ for each instruction, the next instruction of its basic block reading
+    each symbol (by sym_key) that is read again before the block ends """
+    codes = cfg.codes
+    instr_next = [None] * len(codes)
+    for block in cfg.blocks:
+        ahead = {}
+        for idx in reversed(range(block.start, block.end)):
+            code = codes[idx]
+            instr_next[idx] = dict(ahead)
+            # the value read after a redefinition is another one
+            ahead.pop(sym_key(code, defined(code)), None)
+            for e in operands(code):
+                key = sym_key(code, e)
+                if key is not None:
+                    ahead[key] = idx
+    return instr_next
@@ -0,0 +1,202 @@
+import os, io, tempfile, subprocess
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from cache import CompileCache
+
+# flags changing the generated assembly, part of the cache key
+CODEGEN_FLAGS = ('debug', 'opt', 'sse')
+
+# flags asking for by-products of the pipeline, which a cached assembly
+# cannot provide
+DUMP_FLAGS = ('lex', 'dot', 'png', 'ir', 'sym', 'cfg')
+
+
+def link(asm_files, out):
+    # output of gcc is routed through print so that the compile server
+    # can hand it back to the client along with the diagnostics
+    res = subprocess.run(f"gcc -m32 --no-pie -o {out} {' '.join(asm_files)} -lm", shell=True,
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+    print(res.stdout, end='')
+    return res.returncode
+
+def open_cache(args):
+    if args.no_cache:
+        return None
+    return CompileCache(args.cache_dir, args.cache_size << 20)
+
+def codegen_flags(args):
+    return {flag: getattr(args, flag) for flag in CODEGEN_FLAGS}
+
+def unit_name(args, input):
+    """ base name of the per input outputs (.s, .ir, .dot, ...) """
+    if args.out is None or len(args.input) > 1:
+        return input.split('/')[-1].split('.')[0]
+    # strip the extension of outfile
+    return args.out.split('.')[0]
+
+def compile_unit(args, input, ofile):
+    """ compile a single input down to assembly, returns the assembly (None
+    if the compilation failed) and the diagnostics printed meanwhile """
+    out = io.StringIO()
+    with redirect_stdout(out):
+        asm = gen_unit(args, input, ofile)
+    return asm, out.getvalue()
+
+def gen_unit(args, input, ofile):
+    # the compiler is loaded on first use, so that a build served entirely
+    # from the cache does not pay for importing it
+    import pydot
+    from parser import main_lexer, bcolors
+    from context import CompilerContext
+    from codegen import AssemblyGen
+    from optimizer import optimize
+    from cfg import CFG
+    from prelude import load_prelude
+    import incremental
+
+    with open(input, 'r') as f:
+        in_file = f.read()
+
+    if args.lex:
+        lex_file = ofile + '.lex'
+        with open(lex_file, 'w') as f:
+            with redirect_stdout(f):
+                main_lexer(in_file, CompilerContext(input).lexer)
+
+    # the essential stdlib declarations come precompiled
+    ctx = CompilerContext(input, prelude=load_prelude())
+
+    # try parsing the input file
+    try:
+        syntax_tree = ctx.parse(in_file)
+    except:
+        print(bcolors.BOLD+f'{ctx.filename}:0:0'+bcolors.ENDC,end='')
+        print(bcolors.FAIL+' SyntaxError'+bcolors.ENDC)
+        return None
+
+    # unsuccessful parse will return here
+    if syntax_tree is None or ctx.compilation_err:
+        return None
+
+    # generate DOT file if specified
+    if args.dot or args.png:
+        graph = pydot.Dot('gcc_lite: Abstract Syntax Tree', graph_type='digraph')
+        AST = syntax_tree.gen_dot(graph)
+
+        if args.dot:
+            dot_file = ofile + '.dot'
+            graph.write_raw(dot_file)
+        if args.png:
+            png_file = ofile + '.png'
+            graph.write_png(png_file)
+
+    # functions unchanged since an earlier compilation reuse its code
+    cache = open_cache(args)
+    if cache is not None:
+        keys, calls = incremental.function_keys(ctx, syntax_tree, cache, codegen_flags(args))
+        if not any(getattr(args, flag) for flag in DUMP_FLAGS):
+            ctx.reused = incremental.lookup(cache, keys, calls)
+
+    # try generating IR and symbol table
+    try:
+        ctx.gen(syntax_tree)
+    except:
+        print(bcolors.BOLD+f'{ctx.filename}:0:0'+bcolors.ENDC,end='')
+        print(bcolors.FAIL+' IR Error'+bcolors.ENDC)
+        return None
+
+    optimize(ctx, args.opt)
+
+    if args.sym:
+        sym_file = ofile + '.csv'
+        ctx.symtable.dump_csv(sym_file)
+    if args.ir:
+        ir_file = ofile + '.ir'
+        ctx.tac.dump_code(ir_file)
+    if args.cfg:
+        graph = pydot.Dot('gcc_lite: Control Flow Graph', graph_type='digraph')
+        for codes in ctx.tac.func_code or []:
+            CFG(codes).gen_dot(graph)
+        graph.write_raw(ofile + '.cfg.dot')
+
+    # try generating assembly from IR
+    try:
+        asm = AssemblyGen(ctx, debug=args.debug, opt=args.opt, sse=args.sse)
+        asm.gen_assembly()
+    except:
+        print(bcolors.BOLD+f'{ctx.filename}:0:0'+bcolors.ENDC,end='')
+        print(bcolors.FAIL+' Code Generation Error'+bcolors.ENDC)
+        return None
+
+    if cache is not None and not ctx.compilation_err:
+        incremental.store(cache, keys, ctx, asm)
+
+    return asm.get_code()
+
+def compile_files(args):
+    """ compile the inputs (in parallel with `args.jobs` workers) and link
+    them into a single executable, returns the exit status """
+
+    # if output file is not specified, then
+    # create the default outfile name `a.out`
+    units = [(input, unit_name(args, input)) for input in args.input]
+    if args.out is None:
+        args.out = 'a.out'
+
+    cache = open_cache(args)
+    flags = codegen_flags(args)
+
+    # look up the inputs in the cache, only the misses get compiled
+    results = [None] * len(units)
+    keys = [None] * len(units)
+    if cache is not None:
+        for idx, (input, _) in enumerate(units):
+            with open(input, 'r') as f:
+                keys[idx] = cache.key(f.read(), flags)
+            if not any(getattr(args, flag) for flag in DUMP_FLAGS):
+                asm = cache.get(keys[idx])
+                if asm is not None:
+                    results[idx] = (asm, '')
+
+    misses = [idx for idx, res in enumerate(results) if res is None]
+    todo = [units[idx] for idx in misses]
+    if args.jobs > 1 and len(todo) > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            compiled = list(pool.map(compile_unit, repeat(args), *zip(*todo)))
+    else:
+        compiled = [compile_unit(args, input, ofile) for input, ofile in todo]
+
+    for idx, (asm, output) in zip(misses, compiled):
+        results[idx] = (asm, output)
+        # compilations reporting anything are not cached, a hit could not
+        # reproduce the diagnostics
+        if cache is not None and asm is not None and output == '':
+            cache.put(keys[idx], asm)
+
+    # diagnostics are reported in the order of the inputs whichever worker
+    # finished first
+    for _, output in results:
+        print(output, end='')
+    if any(asm is None for asm, _ in results):
+        return 1
+
+    # dump the assembly!
+
+    # create tmpdir to store assembly if not specified
+    with tempfile.TemporaryDirectory() as tmpdir:
+        asm_files = []
+        for idx, ((_, ofile), (asm, _)) in enumerate(zip(units, results)):
+            if args.asm:
+                asm_file = ofile + '.s'
+            else:
+                asm_file = os.path.join(tmpdir, f'{idx}_{os.path.basename(ofile)}.s')
+            with open(asm_file, 'w') as f:
+                f.write(asm)
+            asm_files.append(asm_file)
+
+        # linking and creating executable by passing through gcc
+        if link(asm_files, args.out):
+            return 1
+
+    return 0
@@ -1,13 +1,11 @@
 #! /usr/bin/env python3
 
-import sys, argparse, pydot
-import os, tempfile
-from contextlib import redirect_stdout
+import os, json, socket, tempfile
 from argparse import ArgumentParser
-from parser import parser, lexer, main_lexer, bcolors
-from helper import symtable, tac
-from codegen import AssemblyGen
-from lib import stdlib
+
+# the client deliberately imports nothing from the compiler itself, the
+# modules (and the PLY tables) are loaded only when there is no server
+# to forward the request to
 
 
 def arg_parser():
@@ -15,8 +13,8 @@ def arg_parser():
     argparser = ArgumentParser(prog='gcc_lite', 
         description='Compiler for C programs')
 
-    argparser.add_argument('input', type=str, 
-        help='C program file to compile')
+    argparser.add_argument('input', type=str, nargs='*',
+        help='C program files to compile')
 
     argparser.add_argument('-d', '--debug', action="store_true", 
         help='Generate assembly with extra information (for debugging purposes)')
@@ -24,6 +22,12 @@ def arg_parser():
     argparser.add_argument('-o', '--out', type=str, 
         help='File name to store generated executable')
 
+    argparser.add_argument('-O', dest='opt', type=int, default=1,
+        help='Optimization level, 0 disables the IR optimizations (default 1)')
+
+    argparser.add_argument('--sse', action="store_true",
+        help='Use SSE2 instead of the x87 FPU for float arithmetic')
+
     argparser.add_argument('-l', '--lex', action="store_true",
         help='Store output of lexer')
     
@@ -38,108 +42,97 @@ def arg_parser():
     
     argparser.add_argument('--sym', action="store_true",
         help='Dump the symbol table')
+
+    argparser.add_argument('--cfg', action="store_true",
+        help='Dump the control flow graph of each function as DOT format')
     
     argparser.add_argument('-S', '--asm', action="store_true",
         help='Store the generated assembly file')
     
     argparser.add_argument('-R', '--exec', action="store_true",
         help='Execute the generated program')
+
+    argparser.add_argument('-j', '--jobs', type=int, default=1,
+        help='Number of files to compile in parallel')
     
+    argparser.add_argument('--no-cache', action="store_true",
+        help='Do not use the compilation cache')
+
+    argparser.add_argument('--cache-dir', type=str, default=default_cache_dir(),
+        help='Directory of the compilation cache')
+
+    argparser.add_argument('--cache-size', type=int, default=64,
+        help='Size limit of the compilation cache (in MB)')
+
+    argparser.add_argument('--server', action="store_true",
+        help='Run as a compile server, keeping the compiler resident')
+
+    argparser.add_argument('--stop-server', action="store_true",
+        help='Stop the running compile server')
+
+    argparser.add_argument('--socket', type=str, default=default_socket(),
+        help='Unix socket of the compile server')
+
+    argparser.add_argument('--no-server', action="store_true",
+        help='Compile in this process even if a server is running')
+
     args = argparser.parse_args()
+    if not args.input and not (args.server or args.stop_server):
+        argparser.error('the following arguments are required: input')
     return args
 
+def default_cache_dir():
+    return os.environ.get('GCC_LITE_CACHE',
+        os.path.join(os.path.expanduser('~'), '.cache', 'gcc_lite'))
+
+def default_socket():
+    return os.environ.get('GCC_LITE_SOCKET',
+        os.path.join(tempfile.gettempdir(), f'gcc_lite-{os.getuid()}.sock'))
+
+def request(sock_path, req):
+    """ send a request to the compile server, returns its response or
+    None if there is no server listening on the socket """
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(sock_path)
+            sock.sendall(json.dumps(req).encode() + b'\n')
+            resp = sock.makefile('rb').readline()
+    except OSError:
+        return None
+    return json.loads(resp) if resp else None
+
+def compile_local(args):
+    from driver import compile_files
+    return compile_files(args)
+
 
 if __name__ == "__main__":
     
     args = arg_parser()
+    sock_path = os.path.abspath(args.socket)
+    args.cache_dir = os.path.abspath(args.cache_dir)
+
+    if args.server:
+        from server import serve
+        serve(sock_path)
+        exit(0)
 
-    # if output file is not specified, then
-    # create the default outfile name `a.out`
-    if args.out is None:
-        ofile = args.input.split('/')[-1].split('.')[0]
-        args.out = 'a.out' 
+    if args.stop_server:
+        exit(0 if request(sock_path, {'cmd': 'shutdown'}) else 1)
+
+    resp = None
+    if not args.no_server:
+        resp = request(sock_path, {'cwd': os.getcwd(), 'args': vars(args)})
+
+    if resp is None:
+        status = compile_local(args)
     else:
-        # strip the extension of outfile
-        ofile = args.out.split('.')[0]
+        print(resp['output'], end='')
+        status = resp['status']
 
-    with open(args.input, 'r') as f:
-        in_file = f.read()
-    
-    if args.lex:
-        lex_file = ofile + '.lex'
-        with open(lex_file, 'w') as f:
-            with redirect_stdout(f):
-                main_lexer(in_file)
-
-    # append the essential stdlib declaration
-    ifile = stdlib + in_file
-    lexer.filename = args.input 
-    lexer.lines = ifile.split("\n")
-
-    # try parsing the input file
-    try:
-        syntax_tree = parser.parse(ifile)
-    except:
-        print(bcolors.BOLD+f'{lexer.filename}:0:0'+bcolors.ENDC,end='')
-        print(bcolors.FAIL+' SyntaxError'+bcolors.ENDC)
-        exit(1)
-
-    # unsuccessful parse will return here
-    if syntax_tree is None or parser.compilation_err:
-        exit(1)
-        
-    # generate DOT file if specified
-    if args.dot or args.png:
-        graph = pydot.Dot('gcc_lite: Abstract Syntax Tree', graph_type='digraph')
-        AST = syntax_tree.gen_dot(graph)
-
-        if args.dot:
-            dot_file = ofile + '.dot'
-            graph.write_raw(dot_file)
-        if args.png:
-            png_file = ofile + '.png'
-            graph.write_png(png_file)
-
-    # try generating IR and symbol table    
-    try:
-        syntax_tree.gen()
-    except:
-        print(bcolors.BOLD+f'{lexer.filename}:0:0'+bcolors.ENDC,end='')
-        print(bcolors.FAIL+' IR Error'+bcolors.ENDC)
-        exit(1)
-
-    if args.sym:    
-        sym_file = ofile + '.csv'
-        symtable.dump_csv(sym_file)
-    if args.ir:
-        ir_file = ofile + '.ir'
-        tac.dump_code(ir_file)
-
-    # try generating assembly from IR
-    try:
-        asm = AssemblyGen(tac.func_code, debug=args.debug)
-        asm.gen_assembly()
-    except:
-        print(bcolors.BOLD+f'{lexer.filename}:0:0'+bcolors.ENDC,end='')
-        print(bcolors.FAIL+' Code Generation Error'+bcolors.ENDC)
-        exit(1)
-
-    # dump the assembly!
-
-    # create tmpdir to store assembly if not specified
-    if not args.asm:
-        with tempfile.TemporaryDirectory() as tmpdir:
-            asm_file = os.path.join(tmpdir, os.path.basename(ofile) + '.s')
-            asm.dump_code(asm_file)
-            # linking and creating executable by passing through gcc
-            os.system(f"gcc -m32 --no-pie -o {args.out} {asm_file} -lm")
-    # else store at specified place
-    else:   
-        asm_file = ofile + '.s'
-        asm.dump_code(asm_file)
-        # linking and creating executable by passing through gcc
-        os.system(f"gcc -m32 --no-pie -o {args.out} {asm_file} -lm")
+    if status:
+        exit(status)
 
     # run the executable if specified
     if args.exec:
-        os.system(f"./{args.out}")
+        os.system(f"./{args.out or 'a.out'}")
@@ -1,12 +1,30 @@
 import csv
-from parser import parser_error
-import re
 import copy
+from enum import Enum
 
 ADDR_SIZE = 4
 ALIGN_SHIFT = 2 # all offset should be 2^2 = 4 bytes aligned (32 bit machine)
 ALIGN_BYTES = 4
 
+def wrap(val):
+    """ value as stored in a 32 bit register (two's complement) """
+    return (val + 2**31) % 2**32 - 2**31
+
+def parse_int(e):
+    """ value of an integer constant operand (`$12`, `$0x1f`, `$017`),
+    None if e is not one """
+    if not isinstance(e, str) or not e.startswith('$'):
+        return None
+    lit = e[1:].rstrip('uUlL')
+    try:
+        if lit[:2] in ('0x', '0X'):
+            return wrap(int(lit, 16))
+        if len(lit) > 1 and lit[0] == '0':
+            return wrap(int(lit, 8))
+        return wrap(int(lit))
+    except ValueError:
+        return None
+
 class ScopeTable:
     def __init__(self, scope_depth=0, parent=None, scope_id=0, scope_type='Other', func=None):
         self.scope_id = scope_id        # scope id
@@ -69,7 +87,14 @@ class ScopeTable:
                 self.size = -offset
 
         else:
-            offset = -(self.parent.size + self.size + vtype.get_size())
+            # below the variables of every enclosing scope of the function,
+            # not only the parent's (a switch scope has none of its own)
+            base = 0
+            scope = self.parent
+            while scope.metadata != 'Global':
+                base += scope.size
+                scope = scope.parent
+            offset = -(base + self.size + vtype.get_size())
             self.size = self.size + vtype.get_size()
             self.parent.child_max_size = max(self.parent.child_max_size, self.size)
 
@@ -84,7 +109,8 @@ class ScopeTable:
         return None
         
 class SymbolTable():
-    def __init__(self):
+    def __init__(self, ctx=None):
+        self.ctx = ctx # owning CompilerContext, used for error reporting
 
         self.function = {} # for function (func can only be declared in global mode)
         self.global_scope = ScopeTable()
@@ -147,6 +173,19 @@ class SymbolTable():
         self.update_scope_size()
         self.scope_stack.pop()
 
+    def skip_scopes(self, scope_id) -> None:
+        # move 3ac generation past scope `scope_id` and the scopes nested in
+        # it, for a function whose code is not generated again
+        idx = scope_id
+        while idx + 1 < len(self.all_scope):
+            scope = self.all_scope[idx + 1].parent
+            while scope is not None and scope.scope_id != scope_id:
+                scope = scope.parent
+            if scope is None:
+                break
+            idx += 1
+        self.tac_scope_idx = idx
+
     def update_scope_size(self) -> None:
         scope = self.cur_scope() 
         if scope.metadata != 'Global':
@@ -221,15 +260,15 @@ class SymbolTable():
         vtype = copy.deepcopy(vtype)
         scope = self.global_scope if is_static else self.cur_scope()
         if scope.lookup_var(name):
-            parser_error('Redeclaration of variable named `{}`'.format(name))
+            self.ctx.error('Redeclaration of variable named `{}`'.format(name))
             return
         
         if scope.lookup_alias(name):
-            parser_error(f'`{name}` redeclared as different kind of symbol')
+            self.ctx.error(f'`{name}` redeclared as different kind of symbol')
             return
 
         if scope == self.global_scope and (name in self.function):
-            parser_error(f'`{name}` redeclared as different kind of symbol')
+            self.ctx.error(f'`{name}` redeclared as different kind of symbol')
             return
 
         if "#" in name and not ret_var:
@@ -241,7 +280,7 @@ class SymbolTable():
     def add_struct(self, name, struct_type):
         scope = self.cur_scope()
         if scope.lookup_struct(name):
-            parser_error('Redeclaration of struct named `{}`'.format(name))
+            self.ctx.error('Redeclaration of struct named `{}`'.format(name))
             return
 
         scope.structs[name] = struct_type
@@ -251,11 +290,11 @@ class SymbolTable():
         lookup_alias = cur_scope.lookup_alias(alias)
         
         if cur_scope.lookup_var(alias):
-            parser_error(f'`{alias}` redeclared as different kind of symbol')
+            self.ctx.error(f'`{alias}` redeclared as different kind of symbol')
             return
 
         if cur_scope == self.global_scope and (alias in self.function):
-            parser_error(f'`{alias}` redeclared as different kind of symbol')
+            self.ctx.error(f'`{alias}` redeclared as different kind of symbol')
             return
             
         if lookup_alias is None:
@@ -264,21 +303,21 @@ class SymbolTable():
             pass
         else:
             # parser_error('Redeclaration of type/alias named {}'.format(alias))
-            parser_error('conflicting types for `{}`'.format(alias))
+            self.ctx.error('conflicting types for `{}`'.format(alias))
         
     def add_func(self, func) -> None:
         if func.name in self.function:
             func_ = self.function[func.name]
 
             if func_.is_declared == func.is_declared == 1:
-                parser_error('Redefinition of function named `{}`'.format(func.name))
+                self.ctx.error('Redefinition of function named `{}`'.format(func.name))
                 return
 
             # if func_.ret_type == func.ret_type and func_.args == func.args:
             if func_ == func:
                 return
 
-            parser_error('Redeclaration of function named {}'.format(func.name))
+            self.ctx.error('Redeclaration of function named {}'.format(func.name))
             return
 
         self.function[func.name] = func
@@ -336,128 +375,120 @@ class SymbolTable():
                     writer.writerow(['======','======','======','======','======','======','======'])
                     # writer.writerow(['','','','','','',''])
 
-symtable = SymbolTable()
+class Op(Enum):
+    """ opcodes of the three address code instructions """
+    IFNZ = 'ifnz'
+    GOTO = 'goto'
+    BINOP = 'binop'
+    MOV = 'mov'
+    UNARYOP = 'unaryop'
+    ARRAY_ACCESS = 'array access'
+    CALL = 'call'
+    TAIL_CALL = 'tail call'
+    PUSH_PARAM = 'push param'
+    MEMORY_UPDATE = 'memory update'
+    BLOCK_COPY = 'block copy'
+    ARRAY_UPDATE = 'array update'
+    IFEQ = 'ifeq'
+    SWITCH = 'switch'
+    RETURN = 'return'
+    FUNC_BEGIN = 'FuncBegin'
+    FUNC_END = 'FuncEnd'
+    CALL_SEQ_BEGIN = 'CallSeqBegin'
+    CALL_SEQ_END = 'CallSeqEnd'
+    PRINTF = 'printf'
+    SCANF = 'scanf'
+
+# text form of each instruction, only used while dumping the IR
+INSTR_FMT = {
+    Op.IFNZ: 'ifnz {e1} goto {label}',
+    Op.GOTO: 'goto {label}',
+    Op.BINOP: '{e3} = {e1} {op} {e2}',
+    Op.MOV: '{e2} = {e1}',
+    Op.UNARYOP: '{e2} = {op} {e1}',
+    Op.ARRAY_ACCESS: '{e3} = {e1} [ {e2}{op} ]',
+    Op.CALL: 'call {e1} {e2}',
+    Op.TAIL_CALL: 'tail call {e1}',
+    Op.PUSH_PARAM: 'param {e1}',
+    Op.MEMORY_UPDATE: '* {e2} = {e1}',
+    Op.BLOCK_COPY: '* {e2} = * {e1} ({op} bytes)',
+    Op.ARRAY_UPDATE: '{e3} [ {e2}{op} ] = {e1}',
+    Op.IFEQ: 'ifeq {e1} {e2} goto {label}',
+    Op.SWITCH: 'switch {e1} - {e2} goto {op} else {label}',
+    Op.RETURN: 'return {e1}',
+    Op.FUNC_BEGIN: 'FuncBegin {e1}',
+    Op.FUNC_END: 'FuncEnd {e1}',
+    Op.CALL_SEQ_BEGIN: 'CallSeqBegin',
+    Op.CALL_SEQ_END: 'CallSeqEnd',
+    Op.PRINTF: 'printf {e1} {e2}',
+    Op.SCANF: 'scanf {e1} {e2}',
+}
+
+JUMP_OPS = (Op.IFNZ, Op.GOTO, Op.IFEQ, Op.SWITCH)
 
 class Instr:
-    def __init__(self, code):
-        self.code = code
-        self.parse_instr(self.code)
-
-    def parse_instr(self, code):
-        self.scope = symtable.cur_scope()
-        if m := re.fullmatch('ifnz (?P<e1>[^ ]*) goto (?P<label>[^ ]*)', code):
-            self.instr = 'ifnz'
-            self.e1 = m.group('e1')
-            self.label = m.group('label')
-
-        elif m := re.fullmatch('goto (?P<label>[^ ]*)', code):
-            self.instr = 'goto'
-            self.label = m.group('label')
-
-        elif m := re.fullmatch('(?P<e3>[^ ]*) = (?P<e1>[^ ]*) (?P<op>[^ ]*) (?P<e2>[^ ]*)', code):
-            self.instr = 'binop'
-            self.e1 = m.group('e1')
-            self.e2 = m.group('e2')
-            self.e3 = m.group('e3')
-            self.op = m.group('op')
-
-        elif m := re.fullmatch('(?P<e2>[^ ]*) = (?P<e1>[^ ]*)', code):
-            self.instr = 'mov'
-            self.e1 = m.group('e1')
-            self.e2 = m.group('e2')
-
-        elif m := re.fullmatch('(?P<e2>[^ ]*) = (?P<op>[^ ]*) (?P<e1>[^ ]*)', code):
-            self.instr = 'unaryop'
-            self.e1 = m.group('e1')
-            self.e2 = m.group('e2')
-            self.op = m.group('op')
-
-        elif m := re.fullmatch('(?P<e3>[^ ]*) = (?P<e1>[^ ]*) \[ (?P<e2>[^ ]*) \]', code):
-            self.instr = 'array access'
-            self.e1 = m.group('e1')
-            self.e2 = m.group('e2')
-            self.e3 = m.group('e3')
-
-        elif m := re.fullmatch('call (?P<e1>[^ ]*) (?P<e2>[^ ]*)', code):
-            self.instr = 'call'
-            self.e1 = m.group('e1')
-            self.e2 = m.group('e2')
-
-        elif m := re.fullmatch('param (?P<e1>[^ ]*)', code):
-            self.instr = 'push param'
-            self.e1 = m.group('e1')
-
-        elif m := re.fullmatch('\* (?P<e2>[^ ]*) = (?P<e1>[^ ]*)', code):
-            self.instr = 'memory update'
-            self.e1 = m.group('e1')
-            self.e2 = m.group('e2')
-
-        elif m := re.fullmatch('(?P<e3>[^ ]*) \[ (?P<e2>[^ ]*) \] = (?P<e1>[^ ]*)', code):
-            self.instr = 'array update'
-            self.e1 = m.group('e1')
-            self.e2 = m.group('e2')
-            self.e3 = m.group('e3')
-
-        elif m := re.fullmatch('ifeq (?P<e1>[^ ]*) (?P<e2>[^ ]*) goto (?P<label>[^ ]*)', code):
-            self.instr = 'ifeq'
-            self.e1 = m.group('e1')
-            self.e2 = m.group('e2')
-            self.label = m.group('label')
-
-        elif m := re.fullmatch('return (?P<e1>[^ ]*)', code):
-            self.instr = 'return'
-            self.e1 = m.group('e1')
-        
-        elif m := re.fullmatch('FuncBegin (?P<e1>[^ ]*)', code):
-            self.instr = 'FuncBegin'
-            self.e1 = m.group('e1')
-        
-        elif m := re.fullmatch('FuncEnd (?P<e1>[^ ]*)', code):
-            self.instr = 'FuncEnd'
-            self.e1 = m.group('e1')
-
-        elif m := re.fullmatch('CallSeqBegin', code):
-            self.instr = 'CallSeqBegin'
-
-        elif m := re.fullmatch('CallSeqEnd', code):
-            self.instr = 'CallSeqEnd'
+    __slots__ = ('instr', 'e1', 'e2', 'e3', 'op', 'label', 'scope')
+
+    def __init__(self, instr, e1=None, e2=None, e3=None, op=None, label=None, scope=None):
+        self.instr = instr  # opcode (Op)
+        self.e1 = e1
+        self.e2 = e2
+        self.e3 = e3
+        self.op = op        # operator of binop / unaryop, (scale, displacement) of array accesses,
+                            # jump table of switch, size of block copy
+        self.label = label  # target quad of jumps (default of switch), None till backpatched
+        self.scope = scope  # scope in which the instruction was generated
+
+    def is_jump(self):
+        return self.instr in JUMP_OPS
+
+    def targets(self):
+        """ quads a jump may go to """
+        if self.instr == Op.SWITCH:
+            return [self.label] + self.op
+        return [self.label]
+
+    def relabel(self, new_label):
+        """ retarget a jump, new_label maps each old target to the new one """
+        self.label = new_label(self.label)
+        if self.instr == Op.SWITCH:
+            self.op = [new_label(label) for label in self.op]
 
-        elif m := re.fullmatch('printf (?P<e1>[^ ]*) (?P<e2>[^ ]*)', code):
-            self.instr = 'printf'
-            self.e1 = m.group('e1')
-            self.e2 = m.group('e2')
-
-        elif m := re.fullmatch('scanf (?P<e1>[^ ]*) (?P<e2>[^ ]*)', code):
-            self.instr = 'scanf'
-            self.e1 = m.group('e1')
-            self.e2 = m.group('e2')
-        else:
-            raise Exception(f'regex not handled! {code}')
-    
     def __str__(self):
-        return self.code
+        label = '' if self.label is None else self.label
+        op = self.op
+        if self.instr in (Op.ARRAY_ACCESS, Op.ARRAY_UPDATE):
+            scale, displ = op or (1, 0)
+            op = (f' * {scale}' if scale != 1 else '') + (f' + {displ}' if displ else '')
+        return INSTR_FMT[self.instr].format(e1=self.e1, e2=self.e2, e3=self.e3, op=op, label=label)
 
 class IRHelper:
 
-    def __init__(self):
+    def __init__(self, symtable):
+        self.symtable = symtable
         self.tmpCount = 0
         self.labelCount = 0
         self.code = []
         self.func_code = None
+        self.func_name = ''
         self.fmtCount = 0
 
     def fmt_string(self,):
-        label = f'FMT{self.fmtCount}'
+        # labels are local to the function, so that the prelude and each
+        # function can be compiled independently of the others
+        label = f'FMT_{self.func_name}_{self.fmtCount}'
         self.fmtCount += 1
         return label
 
-    def push_func_code(self):
+    def push_func_code(self, name):
         self.code = []
         if self.func_code is None:
             self.func_code = [self.code]
         else:
             self.func_code.append(self.code)
+        self.func_name = name
         self.tmpCount = 0
+        self.fmtCount = 0
 
     def newtmp(self):
         #get a new symtable temporary, may put in symbol table
@@ -470,16 +501,83 @@ class IRHelper:
         self.labelCount += 1
         return label
 
-    def emit(self, code):
-        self.code.append(Instr(code))
-        # print(len(self.code))
+    def emit(self, instr, **fields):
+        self.code.append(Instr(instr, scope=self.symtable.cur_scope(), **fields))
+
+    # helpers for building each kind of instruction
+
+    def emit_mov(self, dst, src):
+        # dst = src
+        self.emit(Op.MOV, e1=src, e2=dst)
+
+    def emit_binop(self, dst, lhs, op, rhs):
+        # dst = lhs op rhs
+        self.emit(Op.BINOP, e1=lhs, e2=rhs, e3=dst, op=op)
+
+    def emit_unaryop(self, dst, op, src):
+        # dst = op src
+        self.emit(Op.UNARYOP, e1=src, e2=dst, op=op)
+
+    def emit_array_access(self, dst, base, offset):
+        # dst = base [ offset ]
+        self.emit(Op.ARRAY_ACCESS, e1=base, e2=offset, e3=dst)
+
+    def emit_array_update(self, base, offset, src):
+        # base [ offset ] = src
+        self.emit(Op.ARRAY_UPDATE, e1=src, e2=offset, e3=base)
+
+    def emit_memory_update(self, addr, src):
+        # * addr = src
+        self.emit(Op.MEMORY_UPDATE, e1=src, e2=addr)
+
+    def emit_block_copy(self, dst, src, size):
+        # size bytes from the address src to the address dst (structs)
+        self.emit(Op.BLOCK_COPY, e1=src, e2=dst, op=size)
+
+    def emit_ifnz(self, cond, label=None):
+        self.emit(Op.IFNZ, e1=cond, label=label)
+
+    def emit_ifeq(self, lhs, rhs, label=None):
+        self.emit(Op.IFEQ, e1=lhs, e2=rhs, label=label)
+
+    def emit_switch(self, value, low, table, label):
+        # goto table[value - low] if it is in the table, else goto label
+        self.emit(Op.SWITCH, e1=value, e2=low, op=table, label=label)
+
+    def emit_goto(self, label=None):
+        self.emit(Op.GOTO, label=label)
+
+    def emit_param(self, arg):
+        self.emit(Op.PUSH_PARAM, e1=arg)
+
+    def emit_call(self, func, dst):
+        # dst is `#` when return value is not used
+        self.emit(Op.CALL, e1=func, e2=dst)
+
+    def emit_stdio(self, func, args_size, dst):
+        # printf / scanf with variable number of args
+        self.emit(Op(func), e1=str(args_size), e2=dst)
+
+    def emit_return(self, value):
+        self.emit(Op.RETURN, e1=value)
+
+    def emit_func_begin(self, name):
+        self.emit(Op.FUNC_BEGIN, e1=name)
+
+    def emit_func_end(self, name):
+        self.emit(Op.FUNC_END, e1=name)
+
+    def emit_call_seq_begin(self):
+        self.emit(Op.CALL_SEQ_BEGIN)
+
+    def emit_call_seq_end(self):
+        self.emit(Op.CALL_SEQ_END)
 
     def backpatch(self,st_list,target_label):
         #set the target label for the statements in the list
         for x in st_list:
-            if self.code[x].label == '':
-                self.code[x].label = str(target_label)
-                self.code[x].code += str(target_label)
+            if self.code[x].label is None:
+                self.code[x].label = target_label
     
     def nextquad(self):
         return len(self.code)
@@ -490,7 +588,3 @@ class IRHelper:
                 for idx, instr in enumerate(func):
                     f.write(str(idx) + "\t" + str(instr) + "\n")
                 f.write('\n')
-
-tac = IRHelper()
-
-compilation_err = []
@@ -0,0 +1,100 @@
+import re, json, hashlib
+from parser_class import FuncDef
+
+# attributes which are bookkeeping of the compiler rather than part of the
+# program, or numbering that shifts when other functions change
+IGNORED_ATTRS = ('ctx', 'attr_ignore', 'scope_id')
+
+def _walk(obj, h, names, path):
+    if obj is None or isinstance(obj, (str, int, float, bool)):
+        h.update(repr(obj).encode())
+        if isinstance(obj, str):
+            names.add(obj)
+    elif isinstance(obj, (list, tuple)):
+        h.update(b'[')
+        for child in obj:
+            _walk(child, h, names, path)
+        h.update(b']')
+    elif isinstance(obj, dict):
+        h.update(b'{')
+        for key in sorted(obj, key=repr):
+            _walk(key, h, names, path)
+            _walk(obj[key], h, names, path)
+        h.update(b'}')
+    elif id(obj) in path:
+        # self referencing types, e.g. struct with pointer to itself
+        h.update(b'<cycle>')
+    else:
+        path.add(id(obj))
+        h.update(type(obj).__name__.encode())
+        _walk({k: v for k, v in vars(obj).items() if k not in IGNORED_ATTRS}, h, names, path)
+        path.discard(id(obj))
+
+def fingerprint(ctx, func, names=None):
+    """ fingerprint of a function definition: its syntax tree plus the global
+    symbols (variables, functions, types) it names (collected into names) """
+    h = hashlib.sha256()
+    names = set() if names is None else names
+    _walk(func, h, names, set())
+
+    symtable = ctx.symtable
+    scope = symtable.global_scope
+    for name in sorted(names):
+        for table in (scope.variables, scope.aliases, scope.structs, symtable.function):
+            if name in table:
+                h.update(name.encode())
+                _walk(table[name], h, set(), set())
+    return h.hexdigest()
+
+def function_keys(ctx, syntax_tree, cache, flags):
+    """ cache key of every function defined in the syntax tree, and the
+    functions of the syntax tree each one calls. Calls may be inlined, the
+    key of a function covers the ones it calls (directly or not) too """
+    funcs = [unit for unit in syntax_tree.units if isinstance(unit, FuncDef)]
+    prints, calls = {}, {}
+    for unit in funcs:
+        names = set()
+        prints[unit.name] = fingerprint(ctx, unit, names)
+        calls[unit.name] = names & {func.name for func in funcs}
+
+    keys = {}
+    for name in prints:
+        # the function itself first, mutually recursive functions call
+        # the same set of functions
+        h = hashlib.sha256(prints[name].encode())
+        seen, todo = set(), [name]
+        while todo:
+            func = todo.pop()
+            if func not in seen:
+                seen.add(func)
+                todo.extend(calls[func])
+        for func in sorted(seen):
+            h.update(prints[func].encode())
+        keys[name] = cache.key(h.hexdigest(), flags)
+    return keys, calls
+
+def lookup(cache, keys, calls):
+    """ cached code of the functions that did not change. A function called
+    from one compiled again is compiled along with it, so that the code of
+    the caller comes out the same whichever functions were cached """
+    reused = {}
+    for name, key in keys.items():
+        entry = cache.get(key, '.json')
+        if entry is not None:
+            reused[name] = json.loads(entry)
+
+    todo = [name for name in keys if name not in reused]
+    while todo:
+        for callee in calls[todo.pop()]:
+            if reused.pop(callee, None) is not None:
+                todo.append(callee)
+    return reused
+
+def store(cache, keys, ctx, asm):
+    """ cache the code of the functions generated in this compilation """
+    for name, text in asm.func_text.items():
+        fmt = [
+            (label, fmt_str) for label, fmt_str in ctx.symtable.fmt_var.items()
+            if re.fullmatch(f'FMT_{re.escape(name)}_[0-9]+', label)
+        ]
+        cache.put(keys[name], json.dumps({'text': text, 'fmt': fmt}), '.json')
@@ -155,7 +155,7 @@ struct_kw = False
 def t_IDENTIFIER(t):
     t.type = keywords.get(t.value, 'IDENTIFIER')
 
-    if t.type == 'IDENTIFIER' and not t.lexer.struct_kw and symtable.lookup_alias(t.value):
+    if t.type == 'IDENTIFIER' and not t.lexer.struct_kw and t.lexer.ctx.symtable.lookup_alias(t.value):
         # Do not convert identifier after struct keyword into typename
         t.type = 'TYPE_NAME'
 
@@ -218,15 +218,16 @@ def find_column(input, token):
 # Build the lexer
 lexer = lex.lex(debug = 0)
 lexer.struct_kw = False
+lexer.ctx = None
 
-def main_lexer(ifile):
+def main_lexer(ifile, lexer=lexer):
     lexer.input(ifile)
     tokenList = []
     while True:
         tok = lexer.token()
         if tok:
             lineno = str(tok.lineno)
-            columnno = str(find_column(inp, tok))
+            columnno = str(find_column(ifile, tok))
             # columnno = str(tok.lexpos - lexer.pos_newline) #TODO: failing
             tokenList.append([tok.type,tok.value,lineno,columnno])
         else:
@@ -238,7 +239,6 @@ def main_lexer(ifile):
 if __name__ == "__main__":
     with open(sys.argv[1], "r") as f:
         inp = f.read()
-    main_lexer(inp)
+    from context import CompilerContext
+    main_lexer(inp, CompilerContext(sys.argv[1]).lexer)
 
-# from parser import symtable
-from helper import symtable
@@ -48,3 +48,4 @@ void* bufcpy(void * d, void* s, int cnt){
 void* malloc(int size);
 void free(void *ptr);
 '''
+
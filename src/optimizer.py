@@ -0,0 +1,1380 @@
+import math, copy
+from helper import Op, Instr, ScopeTable, ALIGN_BYTES, wrap, parse_int
+from cfg import CFG
+from dataflow import scalar_kind, sym_key, defined, operands, escaped_vars, tracked_kind, liveness
+from codegen import binary, binary2float
+
+# #############################################################################
+# Constants
+# #############################################################################
+
+def parse_float(e):
+    """ value of a float constant operand, floats are kept as the hex of
+    their single precision bits (`$0x3fc00000`) """
+    if not isinstance(e, str) or not e[1:3] in ('0x', '0X'):
+        return None
+    return binary2float(e[1:])
+
+def int_const(val):
+    return f'${wrap(val)}'
+
+def float_const(val):
+    # rounded to single precision like fstp does, None if it overflows
+    try:
+        return f'${binary(val)}'
+    except OverflowError:
+        return None
+
+def _div(a, b):
+    # idivl rounds towards zero
+    if b == 0:
+        return None
+    q = abs(a) // abs(b) * (1 if (a < 0) == (b < 0) else -1)
+    if wrap(q) != q:
+        # quotient overflow faults at run time, leave it there
+        return None
+    return q
+
+def _mod(a, b):
+    q = _div(a, b)
+    return None if q is None else a - q * b
+
+# integer binops as lowered by codegen, shifts use the count in %cl
+INT_BINOPS = {
+    'int+': lambda a, b: a + b,
+    'int-': lambda a, b: a - b,
+    'int*': lambda a, b: a * b,
+    'int/': _div,
+    '%': _mod,
+    '<<': lambda a, b: a << (b & 31),
+    '>>': lambda a, b: (a & 0xffffffff) >> (b & 31),  # shr, not sar
+    '|': lambda a, b: a | b,
+    '&': lambda a, b: a & b,
+    '^': lambda a, b: a ^ b,
+    'int==': lambda a, b: int(a == b),
+    'int!=': lambda a, b: int(a != b),
+    'int<': lambda a, b: int(a < b),
+    'int<=': lambda a, b: int(a <= b),
+    'int>': lambda a, b: int(a > b),
+    'int>=': lambda a, b: int(a >= b),
+}
+
+FLOAT_BINOPS = {
+    'float+': lambda a, b: a + b,
+    'float-': lambda a, b: a - b,
+    'float*': lambda a, b: a * b,
+    'float/': lambda a, b: a / b if b != 0 else None,
+}
+
+INT_UNOPS = {
+    '~': lambda a: ~a,
+    'int-': lambda a: -a,
+    'int2char': lambda a: a & 0xff,
+    'char2int': lambda a: a,
+}
+
+def _float2int(f):
+    # fistpl (x87) rounds to nearest even while cvttss2si (--sse) truncates,
+    # only values both agree on are folded. Out of range gives the integer
+    # indefinite
+    if not math.isfinite(f) or wrap(round(f)) != round(f) or round(f) != math.trunc(f):
+        return None
+    return round(f)
+
+def fold_binop(op, e1, e2):
+    """ constant operand of `e1 op e2` with both operands constant, None if
+    it can not be computed at compile time """
+    if op in INT_BINOPS:
+        a, b = parse_int(e1), parse_int(e2)
+        if a is None or b is None:
+            return None
+        val = INT_BINOPS[op](a, b)
+        return None if val is None else int_const(val)
+    if op in FLOAT_BINOPS:
+        a, b = parse_float(e1), parse_float(e2)
+        if a is None or b is None:
+            return None
+        val = FLOAT_BINOPS[op](a, b)
+        return None if val is None else float_const(val)
+    # float comparisons are left to the fpu
+    return None
+
+def fold_unaryop(op, e1):
+    """ constant operand of `op e1` with e1 constant, None if it can not be
+    computed at compile time """
+    if op in INT_UNOPS:
+        a = parse_int(e1)
+        return None if a is None else int_const(INT_UNOPS[op](a))
+    if op == 'int2float':
+        a = parse_int(e1)
+        return None if a is None else float_const(float(a))
+    if op == 'float2int':
+        f = parse_float(e1)
+        val = None if f is None else _float2int(f)
+        return None if val is None else int_const(val)
+    if op == 'float-':
+        f = parse_float(e1)
+        return None if f is None else float_const(-f)
+    return None
+
+# #############################################################################
+# Passes
+# #############################################################################
+
+def compact(codes, keep):
+    """ drop the instructions not in `keep`, jumps to a dropped instruction
+    go to the first kept one after it """
+    new_idx = [0] * (len(codes) + 1)
+    count = len(keep)
+    for idx in reversed(range(len(codes))):
+        if idx in keep:
+            count -= 1
+        new_idx[idx] = count
+    new_idx[len(codes)] = len(keep)
+
+    kept = [code for idx, code in enumerate(codes) if idx in keep]
+    for code in kept:
+        if code.is_jump():
+            code.relabel(lambda label: new_idx[label])
+    codes[:] = kept
+
+def promote_scalars(codes):
+    """ every assignment goes through the address of its target (`t = & x`,
+    `* t = v`), which hides the variable from the other passes. Scalar
+    locals whose address is only ever used right there are read and
+    written directly instead (`x = v`) """
+
+    defs = {}
+    for code in codes:
+        dst = defined(code)
+        if dst is not None:
+            defs[dst] = defs.get(dst, 0) + 1
+
+    # pointer temp => info of the variable it points to
+    addr_of = {}
+    blocked = set()
+    for code in codes:
+        if code.instr == Op.UNARYOP and code.op == '&':
+            info = code.scope.lookup_info(code.e1)
+            key = sym_key(code, code.e1)
+            if (info is None or info['scope_id'] == 0 or scalar_kind(info) is None
+                    or defs.get(code.e2) != 1):
+                blocked.add(key)
+            else:
+                addr_of[code.e2] = info
+
+    # the pointer must not be used for anything but loads and stores
+    rewrites = []
+    for idx, code in enumerate(codes):
+        ptr = None
+        if code.instr == Op.MEMORY_UPDATE and code.e2 in addr_of:
+            ptr = code.e2
+        elif code.instr == Op.UNARYOP and code.op == '*' and code.e1 in addr_of:
+            ptr = code.e1
+        uses = operands(code)
+        if ptr is not None:
+            uses.remove(ptr)
+        for e in uses:
+            if e in addr_of:
+                blocked.add((addr_of[e]['scope_id'], addr_of[e]['name']))
+        if ptr is None:
+            continue
+        info = addr_of[ptr]
+        if code.scope.lookup_info(info['name']) is not info:
+            # shadowed at the point of use
+            blocked.add((info['scope_id'], info['name']))
+        other = code.scope.lookup_info(code.e1 if code.instr == Op.MEMORY_UPDATE else code.e2)
+        if other is not None and (scalar_kind(other) == 'char') != (scalar_kind(info) == 'char'):
+            # a move between char and a word sized symbol is not an extension
+            blocked.add((info['scope_id'], info['name']))
+        rewrites.append((idx, code, info))
+
+    for idx, code, info in rewrites:
+        if (info['scope_id'], info['name']) in blocked:
+            continue
+        if code.instr == Op.MEMORY_UPDATE:
+            codes[idx] = Instr(Op.MOV, e1=code.e1, e2=info['name'], scope=code.scope)
+        else:
+            codes[idx] = Instr(Op.MOV, e1=info['name'], e2=code.e2, scope=code.scope)
+
+def fold_constants(codes):
+    """ constant folding and propagation within basic blocks.
+
+    Symbols are tracked only if nothing but their own assignments can
+    change them: temporaries and the locals left with no pointer to them.
+    Values are computed the way codegen would compute them at run time
+    (32 bit wraparound, single precision floats). """
+
+    escaped = escaped_vars(codes)
+
+    def kind(key, code, name):
+        return tracked_kind(code, name, escaped)
+
+    def value(code, e):
+        # constant e stands for, if e is a tracked int / char symbol
+        if isinstance(e, str) and e.startswith('$'):
+            return e if parse_int(e) is not None else None
+        key = sym_key(code, e)
+        if kind(key, code, e) in ('int', 'char'):
+            return known.get(key)
+        return None
+
+    def float_value(code, e):
+        key = sym_key(code, e)
+        if kind(key, code, e) == 'float':
+            return known.get(key)
+        return None
+
+    known = {}
+    starts = {block.start for block in CFG(codes).blocks}
+    for idx, code in enumerate(codes):
+        if idx in starts:
+            known.clear()
+
+        if code.instr == Op.BINOP:
+            if code.op in INT_BINOPS:
+                e1 = value(code, code.e1) or code.e1
+                e2 = value(code, code.e2) or code.e2
+            else:
+                e1 = float_value(code, code.e1) or code.e1
+                e2 = float_value(code, code.e2) or code.e2
+            const = fold_binop(code.op, e1, e2)
+            if const is not None:
+                code = codes[idx] = Instr(Op.MOV, e1=const, e2=code.e3, scope=code.scope)
+            elif code.op in INT_BINOPS:
+                code.e1, code.e2 = e1, e2
+
+        elif code.instr == Op.UNARYOP and code.op not in ('&', '*'):
+            e1 = value(code, code.e1) or float_value(code, code.e1) or code.e1
+            const = fold_unaryop(code.op, e1)
+            if const is not None:
+                code = codes[idx] = Instr(Op.MOV, e1=const, e2=code.e2, scope=code.scope)
+
+        elif code.instr == Op.MOV:
+            key = sym_key(code, code.e2)
+            if kind(key, code, code.e2) == 'float':
+                code.e1 = float_value(code, code.e1) or code.e1
+            else:
+                code.e1 = value(code, code.e1) or code.e1
+
+        elif code.instr == Op.IFNZ:
+            # a branch on a constant is either always taken or a jump to the
+            # next instruction (codegen can not compare two immediates)
+            e1 = value(code, code.e1)
+            f = parse_float(float_value(code, code.e1))
+            if e1 is not None:
+                label = code.label if parse_int(e1) != 0 else idx + 1
+            elif f is not None and f == f:
+                label = code.label if f != 0 else idx + 1
+            else:
+                label = None
+            if label is not None:
+                code = codes[idx] = Instr(Op.GOTO, label=label, scope=code.scope)
+
+        elif code.instr == Op.IFEQ:
+            code.e2 = value(code, code.e2) or code.e2
+
+        elif code.instr == Op.SWITCH:
+            # a switch on a constant goes straight to its case
+            e1 = parse_int(value(code, code.e1))
+            if e1 is not None:
+                pos = e1 - parse_int(code.e2)
+                label = code.op[pos] if 0 <= pos < len(code.op) else code.label
+                code = codes[idx] = Instr(Op.GOTO, label=label, scope=code.scope)
+
+        elif code.instr in (Op.PUSH_PARAM, Op.RETURN):
+            code.e1 = value(code, code.e1) or code.e1
+
+        elif code.instr == Op.ARRAY_ACCESS:
+            code.e2 = value(code, code.e2) or code.e2
+
+        elif code.instr == Op.ARRAY_UPDATE:
+            code.e1 = value(code, code.e1) or code.e1
+            code.e2 = value(code, code.e2) or code.e2
+
+        elif code.instr == Op.MEMORY_UPDATE:
+            e1 = value(code, code.e1)
+            info = code.scope.lookup_info(code.e2)
+            if e1 is not None and info is not None:
+                # a byte store takes the constant as an 8 bit immediate
+                if not info['type'].get_ref_type().is_char() or 0 <= parse_int(e1) <= 0xff:
+                    code.e1 = e1
+
+        # record the value of the symbol written
+        dst = defined(code)
+        key = sym_key(code, dst)
+        dst_kind = kind(key, code, dst)
+        if dst_kind is None:
+            continue
+        known.pop(key, None)
+        if code.instr != Op.MOV:
+            continue
+        if dst_kind == 'float':
+            if parse_float(code.e1) is not None:
+                known[key] = code.e1
+        elif parse_int(code.e1) is not None:
+            val = parse_int(code.e1)
+            # a char is stored as a single byte
+            known[key] = int_const(val & 0xff if dst_kind == 'char' else val)
+
+# index scales the x86 addressing modes can take
+SCALES = (1, 2, 4, 8)
+
+# instructions that may write memory behind the names of the symbols
+STORES = (Op.CALL, Op.TAIL_CALL, Op.PRINTF, Op.SCANF, Op.MEMORY_UPDATE, Op.ARRAY_UPDATE, Op.BLOCK_COPY)
+
+def fold_addressing(codes):
+    """ array subscripts are computed into temporaries: the index scaled by
+    the element size (`t = i int* $4`), the address as the base plus the
+    scaled index or a struct field offset (`p = b int+ $8`). Where such a
+    temporary is used once, in the same basic block, the scale and the
+    constant offset are moved into the access itself, codegen turns them
+    into a single `displ(base, index, scale)` operand. Loads and stores
+    through such an address (`* p`) become array accesses. The ops of the
+    array accesses hold (scale, displacement) """
+
+    escaped = escaped_vars(codes)
+    uses, defs = {}, {}
+    for code in codes:
+        for e in operands(code):
+            uses[e] = uses.get(e, 0) + 1
+        dst = defined(code)
+        if dst is not None:
+            defs[dst] = defs.get(dst, 0) + 1
+
+    def info(code, e):
+        return code.scope.lookup_info(e) if isinstance(e, str) else None
+
+    def is_address(code, e):
+        vinfo = info(code, e)
+        return vinfo is not None and (vinfo['type'].is_pointer() or vinfo['type'].is_array())
+
+    def source(code, e):
+        """ the binop defining temporary e in this block if it is its only
+        use and its operands still hold the same values at code """
+        if not (isinstance(e, str) and e.startswith('t#') and uses.get(e) == 1 and defs.get(e) == 1):
+            return None
+        idx = local_def.get(e)
+        if idx is None or codes[idx].instr != Op.BINOP:
+            return None
+        src = codes[idx]
+        for x in (src.e1, src.e2):
+            if x.startswith('$'):
+                continue
+            if last_def.get(x, -1) > idx or sym_key(src, x) != sym_key(code, x):
+                return None
+            if tracked_kind(src, x, escaped) is None and last_store > idx:
+                return None
+        return src
+
+    def split_const(src, ops, values):
+        # operand of src other than a constant in values, and the constant
+        if src is None or src.op not in ops:
+            return None, None
+        for x, c in ((src.e1, src.e2), (src.e2, src.e1)):
+            val = parse_int(c)
+            if val is not None and val in values and parse_int(x) is None:
+                return x, val
+        return None, None
+
+    def scaled(code, e):
+        # index e as (index, scale)
+        x, scale = split_const(source(code, e), ('int*',), SCALES)
+        if x is not None and scalar_kind(info(code, x)) == 'int':
+            return x, scale
+        return e, 1
+
+    def same_width(code, old, new):
+        # stores take their width from the type the base points to
+        return (is_address(code, new)
+            and info(code, old)['type'].get_ref_type().is_char() == info(code, new)['type'].get_ref_type().is_char())
+
+    def split_address(code, e):
+        # address e as (base, index, scale), None if it is not a sum
+        src = source(code, e)
+        if src is None or src.op != 'int+':
+            return None
+        for b, i in ((src.e1, src.e2), (src.e2, src.e1)):
+            if not same_width(code, e, b):
+                continue
+            if parse_int(i) is not None:
+                return b, i, 1
+            if scalar_kind(info(code, i)) == 'int' and not is_address(code, i):
+                return (b, *scaled(code, i))
+        return None
+
+    starts = {block.start for block in CFG(codes).blocks}
+    for idx, code in enumerate(codes):
+        if idx in starts:
+            local_def, last_def, last_store = {}, {}, -1
+
+        new = None
+        if code.instr == Op.UNARYOP and code.op == '*' and info(code, code.e2) is not None \
+                and not info(code, code.e2)['type'].is_array():
+            addr = split_address(code, code.e1)
+            if addr is not None:
+                new = Instr(Op.ARRAY_ACCESS, e1=addr[0], e2=addr[1], e3=code.e2, op=(addr[2], 0), scope=code.scope)
+        elif code.instr == Op.MEMORY_UPDATE:
+            addr = split_address(code, code.e2)
+            if addr is not None:
+                new = Instr(Op.ARRAY_UPDATE, e1=code.e1, e2=addr[1], e3=addr[0], op=(addr[2], 0), scope=code.scope)
+        elif code.instr in (Op.ARRAY_ACCESS, Op.ARRAY_UPDATE) and code.op is None:
+            index, scale = scaled(code, code.e2)
+            new = Instr(code.instr, e1=code.e1, e2=index, e3=code.e3, op=(scale, 0), scope=code.scope)
+
+        if new is not None:
+            # constant offset added to the base
+            base = new.e1 if new.instr == Op.ARRAY_ACCESS else new.e3
+            b, displ = split_const(source(code, base), ('int+',), range(-2**31, 2**31))
+            if b is not None and (new.instr == Op.ARRAY_ACCESS or same_width(code, base, b)):
+                if new.instr == Op.ARRAY_ACCESS:
+                    new.e1 = b
+                else:
+                    new.e3 = b
+                new.op = (new.op[0], displ)
+            code = codes[idx] = new
+
+        dst = defined(code)
+        if dst is not None:
+            local_def[dst] = last_def[dst] = idx
+        if code.instr in STORES:
+            last_store = idx
+
+# binops whose operands can be swapped
+COMMUTATIVE = ('int+', 'int*', '|', '&', '^', 'int==', 'int!=', 'float+', 'float*', 'float==', 'float!=')
+
+def eliminate_common_subexpressions(codes):
+    """ value numbering over the dominator tree. A temporary computing what
+    an earlier one already holds (same operation on the same values) is
+    dropped and its uses read the earlier one.
+
+    Within a basic block any symbol takes part, its value changing with its
+    assignments, and loads (`* p`, `a [ i ]`) with the stores and calls in
+    between. Across blocks only constants and symbols assigned once, by an
+    instruction dominating the use, are known to keep their value. Returns
+    the number of instructions removed """
+
+    cfg = CFG(codes)
+    escaped = escaped_vars(codes)
+    defs, def_idx = {}, {}
+    for idx, code in enumerate(codes):
+        dst = defined(code)
+        if dst is not None:
+            defs[dst] = defs.get(dst, 0) + 1
+            def_idx[dst] = idx
+
+    children = {block: [] for block in cfg.blocks}
+    for block in cfg.reachable()[1:]:
+        children[block.idom].append(block)
+
+    rename = {}
+    removed = set()
+
+    def number(block, idx, code, e, local):
+        """ value number of operand e, local numbers are only valid in
+        this block """
+        if e.startswith('$'):
+            return e
+        key = sym_key(code, e)
+        if key is None:
+            return None
+        if key in versions:
+            local[0] = True
+            return ('v', key, versions[key])
+        if defs.get(e) == 1 and sym_key(codes[def_idx[e]], e) == key:
+            home = cfg.block_of[def_idx[e]]
+            if home is not block and cfg.dominates(home, block) or home is block and def_idx[e] < idx:
+                return ('s', key)
+        local[0] = True
+        if tracked_kind(code, e, escaped) is not None:
+            return ('in', key)
+        return ('mem', key, epoch)
+
+    def expression(block, idx, code):
+        """ hashable form of the value computed by code, and if it is only
+        valid in this block; None if it is not a pure computation """
+        dst = defined(code)
+        if not (isinstance(dst, str) and dst.startswith('t#') and defs[dst] == 1):
+            return None, False
+        local = [False]
+        if code.instr == Op.UNARYOP and code.op == '&':
+            key = sym_key(code, code.e1)
+            return (None if key is None else ('&', key)), False
+        if code.instr == Op.BINOP:
+            args = [number(block, idx, code, e, local) for e in (code.e1, code.e2)]
+            if code.op in COMMUTATIVE:
+                args.sort(key=repr)
+        elif code.instr in (Op.UNARYOP, Op.ARRAY_ACCESS):
+            args = [number(block, idx, code, e, local) for e in operands(code)]
+            info = code.scope.lookup_info(dst)
+            if code.op == '*' or (code.instr == Op.ARRAY_ACCESS and not info['type'].is_array()):
+                # a load, the stores in between change it
+                args.append(('load', epoch))
+                local[0] = True
+        else:
+            return None, False
+        if None in args:
+            return None, False
+        return (code.instr, repr(code.op), *args), local[0]
+
+    def same_type(code, a, b):
+        ta = code.scope.lookup_info(a)['type']
+        tb = codes[def_idx[b]].scope.lookup_info(b)['type']
+        return ta == tb and ta.get_size() == tb.get_size()
+
+    # dominator tree walk, every block starts with what its dominators
+    # computed from values that stay the same
+    stack = [(cfg.entry, {})]
+    while stack:
+        block, known = stack.pop()
+        table = dict(known)
+        versions, epoch = {}, 0
+        for idx in range(block.start, block.end):
+            code = codes[idx]
+            for attr in ('e1', 'e2', 'e3'):
+                e = getattr(code, attr)
+                if e in rename:
+                    setattr(code, attr, rename[e])
+            expr, local = expression(block, idx, code)
+            dst = defined(code)
+            if expr is not None:
+                prev = table.get(expr)
+                if prev is not None and same_type(code, dst, prev):
+                    rename[dst] = prev
+                    removed.add(idx)
+                    continue
+                table[expr] = dst
+                if not local:
+                    known = {**known, expr: dst}
+            key = sym_key(code, dst)
+            if key is not None:
+                versions[key] = idx
+            if code.instr in STORES or key is not None and tracked_kind(code, dst, escaped) is None:
+                # memory changed
+                epoch += 1
+        for child in children[block]:
+            stack.append((child, known))
+
+    if not removed:
+        return 0
+
+    # the earlier temporaries are read where the dropped ones were
+    for code in codes:
+        for attr in ('e1', 'e2', 'e3'):
+            e = getattr(code, attr)
+            if e in rename:
+                setattr(code, attr, rename[e])
+                widen_scope(codes[def_idx[rename[e]]].scope, rename[e],
+                    common_scope(codes[def_idx[rename[e]]].scope, code.scope))
+    compact(codes, set(range(len(codes))) - removed)
+    return len(removed)
+
+def eliminate_dead_code(codes):
+    """ drop unreachable instructions, jumps to the next instruction and
+    assignments to tracked symbols that are never read, till none is left """
+    while True:
+        cfg = CFG(codes)
+        reach = set()
+        for block in cfg.reachable():
+            reach.update(range(block.start, block.end))
+        # FuncEnd holds the epilogue, it is kept even if no path returns
+        reach.add(len(codes) - 1)
+
+        escaped = escaped_vars(codes)
+        live_out = liveness(cfg, escaped)
+        keep = set()
+        for idx in sorted(reach):
+            code = codes[idx]
+            dst = defined(code)
+            dst_kind = tracked_kind(code, dst, escaped)
+            if code.is_jump() and set(code.targets()) == {idx + 1}:
+                continue
+            if code.instr == Op.MOV and code.e1 == code.e2:
+                continue
+            if dst_kind is not None and sym_key(code, dst) not in live_out[idx]:
+                if code.instr in (Op.MOV, Op.BINOP, Op.UNARYOP, Op.ARRAY_ACCESS):
+                    continue
+                if dst_kind != 'float':
+                    # results of calls come in %eax, floats in st(0) still
+                    # have to be popped
+                    code.e2 = '#'
+            keep.add(idx)
+
+        if len(keep) == len(codes):
+            return
+        compact(codes, keep)
+
+def encloses(outer, scope):
+    """ if scope is outer or nested in it """
+    while scope is not None:
+        if scope is outer:
+            return True
+        scope = scope.parent
+    return False
+
+def widen_scope(scope, name, target):
+    """ make the symbol `name` seen from scope visible from target (a scope
+    enclosing it) too, by moving it to target. Stack slots are laid out
+    afterwards, an enclosing scope never shares its slots """
+    owner = scope
+    while name not in owner.variables:
+        owner = owner.parent
+    if encloses(owner, target):
+        return
+    info = owner.variables.pop(name)
+    target.variables[name] = info
+    info['scope_id'] = target.scope_id
+
+def common_scope(a, b):
+    """ innermost scope enclosing both a and b """
+    while not encloses(a, b):
+        a = a.parent
+    return a
+
+def insert_preheader(codes, header, body, new):
+    """ insert the instructions `new` right before the loop header, entries
+    into the loop (falling or jumping into the header from outside) go
+    through them, the back edges skip them """
+    pos = header.start
+    inside = {idx for block in body for idx in range(block.start, block.end)}
+    for idx, code in enumerate(codes):
+        if code.is_jump():
+            code.relabel(lambda label: label + len(new)
+                if label > pos or (label == pos and idx in inside) else label)
+    codes[pos:pos] = new
+
+def hoist_invariants(codes):
+    """ loop invariant code motion. Temporaries computed in a loop from
+    operands the loop never changes (address of a variable, scaled index
+    of an outer loop, ...) are computed once before the loop instead.
+    Only arithmetic that can not fault is moved, it runs even if the loop
+    or the branch of it holding the computation does not. Inner loops go
+    first, what they hoist may move out of the outer loop next """
+
+    # pure int operations, division may fault
+    movable_binops = set(INT_BINOPS) - {'int/', '%'}
+    movable_unaryops = ('&', 'int-', '~')
+
+    while True:
+        defs = {}
+        for code in codes:
+            dst = defined(code)
+            if dst is not None:
+                defs[dst] = defs.get(dst, 0) + 1
+
+        cfg = CFG(codes)
+        escaped = escaped_vars(codes)
+        for header, body in sorted(cfg.loops.items(), key=lambda loop: len(loop[1])):
+            if header.start == 0 or (cfg.block_of[header.start - 1] in body
+                    and codes[header.start - 1].instr != Op.GOTO):
+                # no place before the header only the entries pass
+                continue
+            target = codes[header.start].scope
+            loop_idx = sorted(idx for block in body for idx in range(block.start, block.end))
+            changed_keys = {sym_key(codes[idx], defined(codes[idx])) for idx in loop_idx}
+            stores = any(codes[idx].instr in STORES for idx in loop_idx)
+
+            def movable(code):
+                dst = defined(code)
+                if not (isinstance(dst, str) and dst.startswith('t#') and defs[dst] == 1):
+                    return False
+                if not encloses(target, code.scope):
+                    return False
+                if code.instr == Op.BINOP:
+                    return code.op in movable_binops
+                if code.instr == Op.UNARYOP:
+                    return code.op in movable_unaryops
+                if code.instr == Op.ARRAY_ACCESS:
+                    # lea of a row of a multi-dimensional array
+                    info = code.scope.lookup_info(dst)
+                    return info is not None and info['type'].is_array()
+                return False
+
+            def invariant(code, e):
+                if e.startswith('$'):
+                    return True
+                key = sym_key(code, e)
+                if key is None or target.lookup_info(e) is not code.scope.lookup_info(e):
+                    # the instruction would see another symbol (or none) in
+                    # the scope of the header
+                    return key in hoisted
+                if key in hoisted:
+                    return True
+                if code.instr == Op.UNARYOP and code.op == '&':
+                    # the address, not the value
+                    return True
+                if key in changed_keys:
+                    return False
+                return e.startswith('t#') or tracked_kind(code, e, escaped) is not None or not stores
+
+            hoisted = set()
+            moved = []
+            found = True
+            while found:
+                found = False
+                for idx in loop_idx:
+                    code = codes[idx]
+                    if idx in moved or not movable(code):
+                        continue
+                    if all(invariant(code, e) for e in operands(code)):
+                        hoisted.add(sym_key(code, defined(code)))
+                        moved.append(idx)
+                        found = True
+            if not moved:
+                continue
+
+            # the temporaries now live in the scope of the header
+            new = []
+            for idx in sorted(moved):
+                code = codes[idx]
+                widen_scope(code.scope, defined(code), target)
+                code.scope = target
+                new.append(code)
+            keep = set(range(len(codes))) - set(moved)
+            compact(codes, keep)
+            cfg = CFG(codes)
+            header = cfg.block_of[header.start - sum(1 for idx in moved if idx < header.start)]
+            insert_preheader(codes, header, cfg.loops[header], new)
+            break
+        else:
+            return
+
+def slot_ranges(codes):
+    """ instructions over which each local symbol of the function holds a
+    value, from the first to the last one naming it or it is live after.
+    Symbols liveness does not track (arrays, structs, variables with a
+    pointer to them) keep it over the whole scope declaring them """
+    cfg = CFG(codes)
+    escaped = escaped_vars(codes)
+    live_out = liveness(cfg, escaped)
+
+    ranges, spans, untracked = {}, {}, set()
+    def extend(table, key, lo, hi):
+        old = table.get(key, (lo, hi))
+        table[key] = (min(old[0], lo), max(old[1], hi))
+
+    for idx, code in enumerate(codes):
+        scope = code.scope
+        while scope is not None:
+            extend(spans, scope.scope_id, idx, idx)
+            scope = scope.parent
+        for e in (code.e1, code.e2, code.e3):
+            key = sym_key(code, e)
+            if key is None or key[0] == 0:
+                continue
+            extend(ranges, key, idx, idx)
+            if tracked_kind(code, e, escaped) is None:
+                untracked.add(key)
+        for key in live_out[idx]:
+            extend(ranges, key, idx, idx)
+
+    for key in untracked:
+        extend(ranges, key, *spans[key[0]])
+    return ranges
+
+def slot_align(vtype):
+    # chars (and char arrays shorter than a word) go at any byte
+    return ALIGN_BYTES if vtype.get_size() >= ALIGN_BYTES else 1
+
+def align_up(size, align):
+    return (size + align - 1) // align * align
+
+def layout_frame(symtable, codes):
+    """ give stack slots only to the symbols the function still names.
+    Symbols whose slot ranges do not overlap share the bytes of the frame
+    (first fit, in the order the ranges start), slots are aligned to their
+    size up to a word. All of them belong to the frame of the function
+    scope, the nested scopes take no space of their own """
+    func = symtable.lookup_func(codes[0].e1)
+    root = symtable.all_scope[func.scope_id]
+
+    # scopes of the function follow its own scope
+    scopes = {root.scope_id: root}
+    for scope in symtable.all_scope[func.scope_id + 1:]:
+        if scope.parent is None or scope.parent.scope_id not in scopes:
+            # scopes of inlined calls come after the other functions
+            continue
+        scopes[scope.scope_id] = scope
+
+    ranges = slot_ranges(codes)
+    for scope in scopes.values():
+        for name, info in list(scope.variables.items()):
+            if info['offset'] <= 0 and (scope.scope_id, name) not in ranges:
+                del scope.variables[name]
+        scope.size = scope.child_max_size = 0
+
+    # (end of the range, lowest and highest byte below ebp) of the slots
+    # taken by the ranges started so far
+    active = []
+    frame = 0
+    for key in sorted(ranges, key=lambda key: (ranges[key][0], key)):
+        info = scopes[key[0]].variables[key[1]]
+        if info['offset'] > 0:
+            # params live in the frame of the caller
+            continue
+        start, end = ranges[key]
+        active = [slot for slot in active if slot[0] >= start]
+        size, align = info['type'].get_size(), slot_align(info['type'])
+        top = align_up(size, align)
+        moved = True
+        while moved:
+            moved = False
+            for _, low, high in active:
+                if top - size < high and low < top:
+                    top = align_up(high + size, align)
+                    moved = True
+        active.append((end, top - size, top))
+        info['offset'] = -top
+        frame = max(frame, top)
+    root.size = frame
+
+# #############################################################################
+# Inlining
+# #############################################################################
+
+# callees of up to INLINE_SIZE instructions are inlined at every call (twice
+# that inside a loop), the ones called only once up to INLINE_ONCE
+INLINE_SIZE = 16
+INLINE_ONCE = 64
+
+def body_size(codes):
+    # the call sequence markers emit nothing
+    return sum(1 for code in codes[1:-1] if code.instr not in (Op.CALL_SEQ_BEGIN, Op.CALL_SEQ_END))
+
+def func_root(codes):
+    """ scope holding the parameters of the function, None if its body is
+    empty """
+    for code in codes[1:-1]:
+        scope = code.scope
+        while scope is not None and scope.metadata != 'Function':
+            scope = scope.parent
+        return scope
+    return None
+
+def func_params(root):
+    """ parameters of the function in the order of the arguments """
+    return sorted((info for info in root.variables.values() if info['offset'] > 0),
+        key=lambda info: info['offset'])
+
+def next_temp(codes):
+    """ first temporary number the function does not use """
+    return 1 + max((int(e[2:]) for code in codes for e in (code.e1, code.e2, code.e3)
+        if isinstance(e, str) and e.startswith('t#') and e[2:].isdigit()), default=-1)
+
+def arg_kind(info):
+    """ scalar_kind of an argument or parameter, float parameters included
+    and temporaries holding the address of an array (what an array passed
+    as argument decays to) count as int """
+    if info is None:
+        return None
+    vtype = info['type']
+    if vtype.is_array():
+        return 'int' if vtype.is_tmp and not vtype.is_param else None
+    if vtype.is_float() and vtype.is_param:
+        return 'float'
+    return scalar_kind(info)
+
+def symbol_fields(code):
+    """ fields of the instruction naming symbols """
+    if code.instr in (Op.CALL, Op.PRINTF, Op.SCANF):
+        # e1 is the function, or the size of the arguments
+        return ('e2',)
+    return ('e1', 'e2', 'e3')
+
+def call_sequence(codes, idx):
+    """ start of the call sequence (CallSeqBegin, params, call, CallSeqEnd)
+    of the call at idx and its arguments, first first. None if the
+    sequence is not plain or a jump enters it past its start """
+    begin = idx - 1
+    while begin > 0 and codes[begin].instr == Op.PUSH_PARAM:
+        begin -= 1
+    if codes[begin].instr != Op.CALL_SEQ_BEGIN or codes[idx + 1].instr != Op.CALL_SEQ_END:
+        return None
+    if any(code.is_jump() and begin < label <= idx + 1 for code in codes for label in code.targets()):
+        return None
+    # arguments are pushed last first
+    return begin, [code.e1 for code in reversed(codes[begin + 1:idx])]
+
+def splice(codes, begin, end, new):
+    """ replace codes[begin:end] by the instructions new, jumps past them
+    keep their target """
+    shift = len(new) - (end - begin)
+    for code in codes:
+        if code.is_jump():
+            code.relabel(lambda label: label + shift if label >= end else label)
+    codes[begin:end] = new
+
+def inline_call(symtable, codes, idx, callee, func, tag, temps):
+    """ replace the call sequence of the call at idx by a copy of the body
+    of callee (func its signature): the arguments are moved into the
+    parameters and every return into the result of the call. Scopes of
+    the callee are copied into symtable nested in the scope of the call,
+    its variables get `.tag` appended and its temporaries are numbered
+    from `temps` on. Returns the next free temporary number, None if the
+    call can not be inlined """
+    call = codes[idx]
+    site = call.scope
+    root = func_root(callee)
+    if root is None or func.ret_type.is_struct_type() or func.ret_type.is_array():
+        return None
+
+    params = func_params(root)
+    seq = call_sequence(codes, idx)
+    if seq is None or len(seq[1]) != len(params):
+        return None
+    begin, args = seq
+
+    for info, arg in zip(params, args):
+        kind = arg_kind(info)
+        const = parse_int(arg)
+        if kind is None:
+            return None
+        if arg.startswith('$'):
+            # number or address (string literals)
+            if not (kind == 'int' or kind == 'char' and const is not None and 0 <= const <= 0xff):
+                return None
+        elif arg_kind(site.lookup_info(arg)) != kind:
+            return None
+
+    def owner(code, e):
+        scope = code.scope
+        while scope is not None and e not in scope.variables:
+            scope = scope.parent
+        return scope
+
+    # the callee must see the same globals from the call, float params
+    # (passed as double) are only ever converted, and the value returned
+    # must fit the result of the call
+    dst_kind = None if call.e2 == '#' else scalar_kind(site.lookup_info(call.e2))
+    float_params = {info['name'] for info in params if arg_kind(info) == 'float'}
+    for code in callee[1:-1]:
+        for attr in symbol_fields(code):
+            e = getattr(code, attr)
+            if not isinstance(e, str) or e.startswith('$') or e == '#':
+                continue
+            scope = owner(code, e)
+            if scope is None:
+                continue
+            if not encloses(root, scope):
+                if site.lookup_info(e) is not scope.variables[e]:
+                    return None
+            elif scope is root and e in float_params and not (
+                    code.instr == Op.UNARYOP and code.op == 'double2float' and attr == 'e1'):
+                return None
+        if code.instr == Op.RETURN and call.e2 != '#':
+            if parse_int(code.e1) is not None:
+                if dst_kind != 'int':
+                    return None
+            elif dst_kind is None or arg_kind(code.scope.lookup_info(code.e1)) != dst_kind:
+                return None
+
+    # copies of the scopes of the callee, made on first use
+    scopes = {}
+    names = {}
+
+    def clone(scope):
+        nonlocal temps
+        if id(scope) in scopes:
+            return scopes[id(scope)]
+        parent = site if scope is root else clone(scope.parent)
+        new = ScopeTable(parent.scope_depth + 1, parent, len(symtable.all_scope))
+        symtable.all_scope.append(new)
+        scopes[id(scope)] = new
+        for name, info in scope.variables.items():
+            vtype = info['type']
+            if vtype.is_param:
+                vtype = copy.copy(vtype)
+                vtype.is_param = False
+            if name.startswith('t#'):
+                new_name = f't#{temps}'
+                temps += 1
+            else:
+                new_name = f'{name}.{tag}'
+            names[(id(scope), name)] = new_name
+            new.variables[new_name] = {'name': new_name, 'type': vtype, 'offset': 0, 'scope_id': new.scope_id}
+        return new
+
+    def rename(code, e):
+        if not isinstance(e, str) or e.startswith('$') or e == '#':
+            return e
+        scope = owner(code, e)
+        if scope is None or not encloses(root, scope):
+            return e
+        clone(scope)
+        return names[(id(scope), e)]
+
+    # index of every callee instruction in the copy, the end of the callee
+    # is the instruction after the call sequence
+    top = clone(root)
+    pos = {}
+    end = begin + len(params)
+    for idx_callee, code in enumerate(callee[1:-1], 1):
+        pos[idx_callee] = end
+        if code.instr == Op.TAIL_CALL:
+            end += 3
+        else:
+            end += 1 + (code.instr == Op.RETURN and call.e2 != '#')
+    pos[len(callee) - 1] = end
+
+    new = []
+    for info, arg in zip(params, args):
+        new.append(Instr(Op.MOV, e1=arg, e2=names[(id(root), info['name'])], scope=top))
+    for code in callee[1:-1]:
+        scope = clone(code.scope)
+        if code.instr == Op.RETURN:
+            if call.e2 != '#':
+                new.append(Instr(Op.MOV, e1=rename(code, code.e1), e2=call.e2, scope=scope))
+            new.append(Instr(Op.GOTO, label=end, scope=scope))
+            continue
+        if code.instr == Op.TAIL_CALL:
+            # a plain call again, its result is the one of the copy
+            new.append(Instr(Op.CALL, e1=code.e1, e2=call.e2, scope=scope))
+            new.append(Instr(Op.CALL_SEQ_END, scope=scope))
+            new.append(Instr(Op.GOTO, label=end, scope=scope))
+            continue
+        copied = Instr(code.instr, e1=code.e1, e2=code.e2, e3=code.e3, op=code.op,
+            label=code.label, scope=scope)
+        if code.is_jump():
+            copied.relabel(lambda label: pos[label])
+        for attr in symbol_fields(code):
+            setattr(copied, attr, rename(code, getattr(code, attr)))
+        if code.instr == Op.UNARYOP and code.op == 'double2float' and code.e1 in float_params and owner(code, code.e1) is root:
+            # the parameter is a float of the caller's now
+            copied = Instr(Op.MOV, e1=copied.e1, e2=copied.e2, scope=scope)
+        new.append(copied)
+
+    splice(codes, begin, idx + 2, new)
+    return temps
+
+def inline_calls(symtable, func_code, library=()):
+    """ replace calls to small functions, and to functions called only
+    once, by a copy of the callee's body. Callees are done before their
+    callers, so a copy comes with the calls inlined into the callee
+    already. A function is never inlined into one it calls (recursion).
+    `library` is the IR of the prelude helpers, inlined the same way but
+    never as called once. Returns the number of calls inlined """
+    bodies = {codes[0].e1: codes for codes in library}
+    bodies.update((codes[0].e1, codes) for codes in func_code)
+    own = [codes[0].e1 for codes in func_code]
+
+    calls = {name: {code.e1 for code in codes if code.instr == Op.CALL} for name, codes in bodies.items()}
+    count = {}
+    for codes in func_code:
+        for code in codes:
+            if code.instr == Op.CALL:
+                count[code.e1] = count.get(code.e1, 0) + 1
+
+    def reaches(src, dst):
+        seen, todo = set(), [src]
+        while todo:
+            name = todo.pop()
+            if name == dst:
+                return True
+            if name not in seen and name in calls:
+                seen.add(name)
+                todo.extend(calls[name])
+        return False
+
+    # callees first
+    order, seen = [], set()
+    def visit(name):
+        seen.add(name)
+        for callee in sorted(calls[name]):
+            if callee in own and callee not in seen:
+                visit(callee)
+        order.append(name)
+    for name in own:
+        if name not in seen:
+            visit(name)
+
+    inlined = 0
+    for caller in order:
+        codes = bodies[caller]
+        cfg = CFG(codes)
+        temps = next_temp(codes)
+        tag = 0
+        # from the last call up, the code before a call stays where it is
+        for idx in reversed(range(len(codes))):
+            code = codes[idx]
+            if code.instr != Op.CALL or code.e1 not in bodies or reaches(code.e1, caller):
+                continue
+            limit = INLINE_SIZE * (2 if cfg.block_of[idx].loop_depth else 1)
+            if code.e1 in own and count[code.e1] == 1:
+                limit = max(limit, INLINE_ONCE)
+            if body_size(bodies[code.e1]) > limit:
+                continue
+            res = inline_call(symtable, codes, idx, bodies[code.e1],
+                symtable.lookup_func(code.e1), tag + 1, temps)
+            if res is not None:
+                temps = res
+                tag += 1
+                inlined += 1
+    return inlined
+
+# #############################################################################
+# Tail calls
+# #############################################################################
+
+def tail_position(codes, idx):
+    """ if the call at idx is in tail position: past its CallSeqEnd only
+    moves of its result into locals, jumps and the return of the result
+    lead to the end of the function """
+    value = codes[idx].e2
+    returned = False
+    pos = idx + 2
+    seen = set()
+    while pos not in seen:
+        seen.add(pos)
+        code = codes[pos]
+        if code.instr == Op.GOTO:
+            pos = code.label
+        elif code.instr == Op.MOV and code.e1 == value and not returned:
+            key = sym_key(code, code.e2)
+            if key is None or key[0] == 0:
+                return False
+            value = code.e2
+            pos += 1
+        elif code.instr == Op.RETURN and code.e1 == value and value != '#' and not returned:
+            returned = True
+            pos += 1
+        elif code.instr == Op.FUNC_END:
+            return returned or value == '#'
+        else:
+            return False
+    return False
+
+def ret_kind(vtype):
+    if vtype.is_float():
+        return 'float'
+    if vtype.is_char():
+        return 'char'
+    return 'int'
+
+def arg_space(func):
+    """ bytes the callers of func push for its arguments and pop after the
+    call, None if the two differ (char params) """
+    size = 0
+    for _, vtype in func.args:
+        if vtype.is_float():
+            size += 8
+        elif vtype.is_struct_type():
+            size += vtype.get_size()
+        else:
+            # chars and arrays are pushed as a word
+            size += 4
+    return size if size == func.param_size() else None
+
+def loop_back(codes, idx, args, root, params, temps):
+    """ instructions moving the arguments of the call at idx into the
+    parameters and jumping back to the start of the function, and the next
+    free temporary number. Arguments a move before would overwrite, or not
+    visible from the scope of the parameters, are copied first """
+    site = codes[idx].scope
+    copies, moves = [], []
+    for pos, (info, arg) in enumerate(zip(params, args)):
+        value = arg
+        if not arg.startswith('$'):
+            arg_info = site.lookup_info(arg)
+            overwritten = any(arg_info is param for param in params[:pos])
+            visible = root.lookup_info(arg) is arg_info
+            if not overwritten and not visible and arg.startswith('t#'):
+                widen_scope(site, arg, root)
+            elif overwritten or not visible:
+                value = f't#{temps}'
+                temps += 1
+                vtype = copy.copy(info['type'])
+                vtype.is_param = False
+                root.variables[value] = {'name': value, 'type': vtype, 'offset': 0, 'scope_id': root.scope_id}
+                copies.append(Instr(Op.MOV, e1=arg, e2=value, scope=site))
+        moves.append(Instr(Op.MOV, e1=value, e2=info['name'], scope=root))
+    return copies + moves + [Instr(Op.GOTO, label=1, scope=root)], temps
+
+def eliminate_tail_calls(symtable, codes):
+    """ calls whose result is returned right away. A call of the function
+    itself moves the arguments into the parameters and jumps back to its
+    start, the recursion becomes a loop. A call of another function taking
+    no more argument space becomes a tail call (codegen puts the arguments
+    in place of the function's own and leaves its frame before jumping to
+    the callee, which returns to our caller). Functions with a pointer to
+    one of their locals are left alone, every call needs its own locals.
+    Returns the number of calls rewritten """
+    for code in codes:
+        if code.instr == Op.UNARYOP and code.op == '&':
+            key = sym_key(code, code.e1)
+            if key is not None and key[0] != 0:
+                return 0
+
+    name = codes[0].e1
+    func = symtable.lookup_func(name)
+    root = func_root(codes)
+    if root is None or func.ret_type.is_struct_type():
+        return 0
+    params = func_params(root)
+    # float params are passed as double, only a call can set them
+    loops = all(arg_kind(info) in ('int', 'char') for info in params)
+    space = arg_space(func)
+
+    temps = next_temp(codes)
+    count = 0
+    for idx in reversed(range(len(codes))):
+        code = codes[idx]
+        if code.instr != Op.CALL or not tail_position(codes, idx):
+            continue
+        seq = call_sequence(codes, idx)
+        if seq is None:
+            continue
+        begin, args = seq
+        callee = symtable.lookup_func(code.e1)
+        if code.e1 == name and loops and len(args) == len(params):
+            new, temps = loop_back(codes, idx, args, root, params, temps)
+        elif (callee is not None and not callee.ret_type.is_struct_type() and space is not None
+                and arg_space(callee) is not None and arg_space(callee) <= space
+                and (code.e2 == '#' or ret_kind(callee.ret_type) == ret_kind(func.ret_type))):
+            new = codes[begin:idx] + [Instr(Op.TAIL_CALL, e1=code.e1, scope=code.scope)]
+        else:
+            continue
+        splice(codes, begin, idx + 2, new)
+        count += 1
+    return count
+
+# #############################################################################
+# Register allocation
+# #############################################################################
+
+# registers codegen hands to whole live ranges, the others stay scratch
+# registers for the per instruction getreg (eax / edx are taken by idivl,
+# ecx by the shift count, and the byte stores need a byte register)
+HOME_REGS = ('ebx', 'esi', 'edi')
+
+class Interval:
+    """ live range of a symbol over the instruction indices start..end """
+
+    def __init__(self, name, key):
+        self.name = name
+        self.key = key
+        self.start = None
+        self.end = None
+        self.weight = 0         # uses and defs, 10x for every loop around them
+        self.reg = None
+
+    def extend(self, idx):
+        self.start = idx if self.start is None else min(self.start, idx)
+        self.end = idx if self.end is None else max(self.end, idx)
+
+    def spill_cost(self):
+        return self.weight / (self.end - self.start + 1)
+
+    def __repr__(self):
+        return f'{self.name}[{self.start}:{self.end}]@{self.reg}'
+
+def byte_operands(code):
+    """ int operands codegen moves in or out of a byte register (int and
+    float comparison results), or of a fixed register (division, call
+    results) """
+    relops = ('==', '!=', '<', '<=', '>', '>=')
+    if code.instr == Op.BINOP and (code.op[:3] == 'int' and code.op[3:] in relops
+            or code.op[:5] == 'float' and code.op[5:] in relops
+            or code.op in ('int/', '%')):
+        return [code.e3]
+    if code.instr == Op.UNARYOP and code.op in ('int2char', 'int2float'):
+        return [code.e1]
+    if code.instr == Op.UNARYOP and code.op == 'float2int':
+        return [code.e2]
+    if code.instr in (Op.CALL, Op.PRINTF, Op.SCANF):
+        return [code.e2]
+    if code.instr == Op.MEMORY_UPDATE:
+        info = code.scope.lookup_info(code.e2)
+        if info is not None and info['type'].get_ref_type().is_char():
+            return [code.e1]
+    if code.instr == Op.ARRAY_UPDATE:
+        info = code.scope.lookup_info(code.e3)
+        if info is not None and info['type'].get_ref_type().is_char():
+            return [code.e1]
+    return []
+
+def allocate_registers(codes, regs=HOME_REGS):
+    """ linear scan over the live ranges of the tracked int symbols of the
+    function. A symbol given a register lives there for its whole range,
+    across labels and calls; when the registers run out the range with the
+    fewest (loop weighted) uses per instruction stays in memory """
+    cfg = CFG(codes)
+    escaped = escaped_vars(codes)
+    live_out = liveness(cfg, escaped)
+
+    intervals = {}
+    keys_of = {}
+    blocked = set()
+    for idx, code in enumerate(codes):
+        depth = cfg.block_of[idx].loop_depth
+        names = [e for e in operands(code) + [defined(code)] if isinstance(e, str)]
+        for name in names:
+            key = sym_key(code, name)
+            if key is None:
+                continue
+            keys_of.setdefault(name, set()).add(key)
+            if tracked_kind(code, name, escaped) != 'int':
+                blocked.add(key)
+                continue
+            interval = intervals.setdefault(key, Interval(name, key))
+            interval.extend(idx)
+            interval.weight += 10 ** min(depth, 6)
+        blocked.update(sym_key(code, e) for e in byte_operands(code))
+        for key in live_out[idx]:
+            if key in intervals:
+                intervals[key].extend(idx)
+
+    # symbols live on entry (params, or locals read before set) are held
+    # from the start of the function
+    for key in live_out[0]:
+        if key in intervals:
+            intervals[key].start = 0
+
+    candidates = sorted(
+        (interval for key, interval in intervals.items()
+            if key not in blocked and len(keys_of[interval.name]) == 1),
+        key=lambda interval: (interval.start, interval.name))
+
+    active = []
+    free = list(regs)
+    for cur in candidates:
+        for interval in list(active):
+            # a range ending at the instruction another one starts at still
+            # reads its register there
+            if interval.end < cur.start:
+                active.remove(interval)
+                free.append(interval.reg)
+        if free:
+            free.sort(key=regs.index)
+            cur.reg = free.pop(0)
+            active.append(cur)
+            continue
+        victim = min(active, key=Interval.spill_cost)
+        if victim.spill_cost() < cur.spill_cost():
+            cur.reg, victim.reg = victim.reg, None
+            active.remove(victim)
+            active.append(cur)
+
+    return [interval for interval in candidates if interval.reg is not None]
+
+def optimize(ctx, level=1):
+    """ run the IR passes enabled at `level` (0 disables them all) over every
+    function generated in ctx """
+    if level < 1 or ctx.tac.func_code is None:
+        return
+    library = ctx.prelude.func_code if ctx.prelude is not None else []
+    ctx.ir_stats['inline'] = inline_calls(ctx.symtable, ctx.tac.func_code, library)
+    for codes in ctx.tac.func_code:
+        promote_scalars(codes)
+        fold_constants(codes)
+        fold_addressing(codes)
+        eliminate_dead_code(codes)
+        tail_calls = eliminate_tail_calls(ctx.symtable, codes)
+        ctx.ir_stats['tail calls'] = ctx.ir_stats.get('tail calls', 0) + tail_calls
+        if tail_calls:
+            # the code after them is left unreachable
+            eliminate_dead_code(codes)
+        hoist_invariants(codes)
+        removed = eliminate_common_subexpressions(codes)
+        ctx.ir_stats['cse'] = ctx.ir_stats.get('cse', 0) + removed
+        layout_frame(ctx.symtable, codes)
+        ctx.homes[codes[0].e1] = allocate_registers(codes)
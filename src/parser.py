@@ -1,19 +1,7 @@
 #! /usr/bin/env python3
 
+import re
 from ply import yacc
-from lib import stdlib
-
-def parser_error(error_str=None):
-    # subtracting stdlib offset for correct position info
-    stdlib_offset = len(stdlib.split('\n')) - 1
-
-    parser.compilation_err = True
-    print(bcolors.BOLD+f'{lexer.filename}:{lexer.lineno - stdlib_offset}:0'+bcolors.ENDC,end='')
-    if error_str == None:
-        error_str = parser.error
-    print(bcolors.FAIL+' Error:'+bcolors.ENDC, error_str)
-    print('     {} |{}'.format(lexer.lineno - stdlib_offset,lexer.lines[lexer.lineno - 1]))
-
 
 class bcolors:
     HEADER = '\033[95m'
@@ -51,28 +39,29 @@ def p_empty(p):
 def p_push_scope(p):
     ''' push_scope : empty
     '''
+    ctx = p.lexer.ctx
     if isinstance(p[-2], ScopeName):
-        symtable.push_scope(p[-2].name)
+        ctx.symtable.push_scope(p[-2].name)
     elif isinstance(p[-2], tuple):
         _, _, func_name, args = p[-2]
-        func = symtable.lookup_func(func_name)
-        symtable.push_scope('Function', func=func)
-        func.scope_id = len(symtable.all_scope) - 1
+        func = ctx.symtable.lookup_func(func_name)
+        ctx.symtable.push_scope('Function', func=func)
+        func.scope_id = len(ctx.symtable.all_scope) - 1
         if func.ret_type.is_struct_type():
             # return address of struct is stored in ret@ symbol
-            symtable.add_var("ret@", func.ret_type.get_pointer_type(), is_param=True)
+            ctx.symtable.add_var("ret@", func.ret_type.get_pointer_type(), is_param=True)
 
         for name, _type in args:
-            symtable.add_var(name, _type, is_param=True)
+            ctx.symtable.add_var(name, _type, is_param=True)
     else:
-        symtable.push_scope()
+        ctx.symtable.push_scope()
 
     p[0] = None
 
 def p_pop_scope(p):
     ''' pop_scope : empty
     '''
-    symtable.pop_scope()
+    p.lexer.ctx.symtable.pop_scope()
     p[0] = None
 
 def p_func_scope(p):
@@ -91,18 +80,15 @@ def p_switch_scope(p):
     p[0] = ScopeName('Switch')
 
 def p_error(p):
-    # subtracting stdlib offset for correct position info
-    stdlib_offset = len(stdlib.split('\n')) - 1
-
     position = (
         p.lexer.lexpos
         - sum(map(lambda line: len(line) + 1, p.lexer.lines[: p.lineno - 1]))
         - len(p.value)
         + 1
     )
-    print(f'{bcolors.BOLD}{p.lexer.filename}:{p.lineno - stdlib_offset}:{position}:{bcolors.ENDC}',end='')
+    print(f'{bcolors.BOLD}{p.lexer.filename}:{p.lineno}:{position}:{bcolors.ENDC}',end='')
     print(f'{bcolors.FAIL} SyntaxError: {bcolors.ENDC}Unexpected token {p.value}')
-    print(f'     {p.lineno - stdlib_offset} |{p.lexer.lines[p.lineno - 1][:position-1]}',end='')
+    print(f'     {p.lineno} |{p.lexer.lines[p.lineno - 1][:position-1]}',end='')
     print(bcolors.WARNING + bcolors.UNDERLINE + '{}'.format(
         p.lexer.lines[p.lineno - 1][position-1:position-1+len(p.value)]
         )+bcolors.ENDC+bcolors.ENDC,end='')
@@ -390,28 +376,29 @@ def p_declaration_specifiers(p):
     ''' declaration_specifiers : storage_class_specifier type_specifier
             | type_specifier
     '''
+    ctx = p.lexer.ctx
     if len(p) == 2:
         p[0] = DeclarationSpecifier(None, p[1])
         if isinstance(p[1], StructUnionSpecifier):
-            parser.type = p[1].get_struct_type()
+            ctx.type = p[1].get_struct_type()
         else:
             if re.fullmatch('typedef@(?P<type_name>[^ ]*)', p[1]):
-                parser.type = parser.typedef_type
+                ctx.type = ctx.typedef_type
             else:
-                parser.type = p[1]
-        parser.is_typedef = False
-        parser.is_static = False
+                ctx.type = p[1]
+        ctx.is_typedef = False
+        ctx.is_static = False
     else:
         p[0] = DeclarationSpecifier(p[1], p[2])
         if isinstance(p[2], StructUnionSpecifier):
-            parser.type = p[2].get_struct_type()
+            ctx.type = p[2].get_struct_type()
         else:
             if re.fullmatch('typedef@(?P<type_name>[^ ]*)', p[2]):
-                parser.type = parser.typedef_type
+                ctx.type = ctx.typedef_type
             else:
-                parser.type = p[2]
-        parser.is_typedef = (p[1] == 'typedef')
-        parser.is_static = (p[1] == 'static')
+                ctx.type = p[2]
+        ctx.is_typedef = (p[1] == 'typedef')
+        ctx.is_static = (p[1] == 'static')
 
 def p_init_declarator_list(p):
     ''' init_declarator_list : init_declarator
@@ -450,10 +437,11 @@ def p_type_specifier(p):
 def p_type_specifier_typedef(p):
     ''' type_specifier : TYPE_NAME
     '''
+    ctx = p.lexer.ctx
     p[0] = 'typedef@' + p[1]
     # print(p[1], symtable.cur_scope().aliases)
-    lookup_alias = symtable.lookup_alias(p[1])
-    parser.typedef_type = lookup_alias
+    lookup_alias = ctx.symtable.lookup_alias(p[1])
+    ctx.typedef_type = lookup_alias
     
     # TODO: handle typedef with pointer types e.g. typedef int *ab, **xyz (by using something like p.ref_type)
 
@@ -797,21 +785,18 @@ def p_function_definition(p):
     ''' function_definition : declaration_specifiers IDENTIFIER param_list func_scope
         | declaration_specifiers pointer IDENTIFIER param_list func_scope
     '''
+    ctx = p.lexer.ctx
     if len(p) == 5:
         p[0] = (p[1], 0, p[2], p[3])
         vartype = VarType(0, p[1].type_spec)    
-        symtable.add_func(Function(vartype, p[2], p[3]))
+        ctx.symtable.add_func(Function(vartype, p[2], p[3]))
     else:
         p[0] = (p[1], p[2], p[3], p[4])
         vartype = VarType(p[2], p[1].type_spec)    
-        symtable.add_func(Function(vartype, p[3], p[4]))
+        ctx.symtable.add_func(Function(vartype, p[3], p[4]))
 
 from lexer import lexer, tokens, main_lexer
 
 parser = yacc.yacc()
-parser.type = None
-parser.is_typedef = False
-parser.error = ''
-parser.compilation_err = False
 
 from parser_class import *
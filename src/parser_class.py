@@ -1,8 +1,9 @@
 from typing import Union, List
 import pydot
-from parser import parser, parser_error
 from helper import *
+from context import active_context
 import copy
+import re
 import struct
 from collections import OrderedDict
 
@@ -13,6 +14,14 @@ FLOAT_SIZE = 4
 ALIGN_SHIFT = 2 # all offset should be 2^2 = 4 bytes aligned (32 bit machine)
 ALIGN_BYTES = 4
 
+# lowering of switch: a jump table for at least JUMP_TABLE_CASES cases
+# filling at least 1 / JUMP_TABLE_SPREAD of the values between the lowest
+# and the highest, compares otherwise (a binary search down to
+# LINEAR_CASES cases tested one by one)
+JUMP_TABLE_CASES = 4
+JUMP_TABLE_SPREAD = 3
+LINEAR_CASES = 3
+
 def binary(num):
     return hex(struct.unpack('<I', struct.pack('<f', num))[0])
 
@@ -22,7 +31,8 @@ def binary(num):
 
 class _BASENODE:
     def __init__(self):
-        self.attr_ignore = ['attr_ignore']
+        self.ctx = active_context()
+        self.attr_ignore = ['attr_ignore', 'ctx']
         self.nextlist = []
         self.breaklist = []
         self.continuelist = []
@@ -30,6 +40,17 @@ class _BASENODE:
         self.falselist = []
         self.returnlist = []
 
+    def __getstate__(self):
+        # context is not pickled along (precompiled prelude), the node is
+        # bound to the context it gets loaded into instead
+        state = self.__dict__.copy()
+        state['ctx'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.ctx = active_context()
+
     @staticmethod
     def _gen_dot(obj):
         """Get a list of node and edge declarations."""
@@ -115,7 +136,7 @@ class StructType(_BASENODE):
         if self.variables is not None:
             return True
         
-        sym_type = symtable.lookup_struct(self.name)
+        sym_type = self.ctx.symtable.lookup_struct(self.name)
         if sym_type is not None:
             self.variables = sym_type.variables
             # create offsets for each variable
@@ -165,6 +186,8 @@ class Function(_BASENODE):
         self.args = args                # list
         self.is_declared = is_declared  # declaration or definition 
         self.scope_id = 0               # scope id of function
+        self.returned = []              # locals returned (struct return type)
+        self.ret_local = None           # the one built right in ret@, if any
     
     def param_size(self):
         size = 0
@@ -434,6 +457,30 @@ class BaseExpr(_BASENODE) :
         else:
             return False
 
+    def storage(self):
+        # symbol table entry of the local variable this expression is part of
+        # (the variable, one of its members or array elements), None otherwise
+        expr = self
+        while isinstance(expr, PostfixExpr) and (expr.ops == '.'
+                or expr.ops == '[' and expr.lhs.expr_type.is_array()):
+            expr = expr.lhs
+        if not isinstance(expr, Identifier):
+            return None
+        info = self.ctx.symtable.cur_scope().lookup_info(expr.name)
+        if info is None or info['scope_id'] == 0 or (info['type'].is_param and info['type'].is_array()):
+            # globals (and statics) are seen by every function, an array
+            # param is the caller's array
+            return None
+        return info
+
+    def escape(self, count=1):
+        # counts the expressions that can let the address of the variable out
+        # (`&`, an array not subscripted right away), a function returning a
+        # struct can only be handed a variable none of them let out
+        info = self.storage()
+        if info is not None:
+            info['escapes'] = info.get('escapes', 0) + count
+
 class Const(BaseExpr):
     def __init__(self, const, dvalue):
         super().__init__("Constant")
@@ -446,19 +493,19 @@ class Const(BaseExpr):
         # in case of constant we store the trimmed constant
         # val as the place
         if self.dvalue == 'float':
-            self.place = tac.newtmp()
-            symtable.add_var(self.place, self.expr_type)
-            tac.emit(f'{self.place} = ${binary(float(self.const))}')
+            self.place = self.ctx.tac.newtmp()
+            self.ctx.symtable.add_var(self.place, self.expr_type)
+            self.ctx.tac.emit_mov(self.place, f'${binary(float(self.const))}')
         elif self.expr_type == VarType(1, 'char'):   
-            self.fmt_sym = tac.fmt_string()
-            symtable.add_fmt(self.fmt_sym, self.const)
+            self.fmt_sym = self.ctx.tac.fmt_string()
+            self.ctx.symtable.add_fmt(self.fmt_sym, self.const)
 
             self.place = '$' + self.fmt_sym
             # symtable.add_var(self.place, self.expr_type)
 
             # tac.emit(f'param ${self.fmt_sym}')
             # tac.emit(f'param {self.place}')
-            # tac.emit(f'call strcpy #')
+            # tac.emit_call('strcpy', '#')
 
         else:
             # in case of constant we store the trimmed constant
@@ -466,10 +513,10 @@ class Const(BaseExpr):
             self.place = '$'+self.const
         
         if getattr(self, 'bool', False):
-            self.truelist = [tac.nextquad()]
-            self.falselist = [tac.nextquad() + 1]
-            tac.emit(f"ifnz {self.place} goto ")
-            tac.emit(f"goto ")
+            self.truelist = [self.ctx.tac.nextquad()]
+            self.falselist = [self.ctx.tac.nextquad() + 1]
+            self.ctx.tac.emit_ifnz(self.place)
+            self.ctx.tac.emit_goto()
 
     def get_type(self):
         if self.dvalue == 'int':
@@ -483,7 +530,7 @@ class Const(BaseExpr):
         elif self.dvalue == 'STRING_LITERAL':
             self.expr_type = VarType(1, 'char', [Const(str(len(self.const.encode('utf-8').decode('unicode_escape'))-1), 'int')])
         else:
-            parser_error('Unknown Constant type')
+            self.ctx.error('Unknown Constant type')
 
     @staticmethod
     def _gen_dot(obj):
@@ -496,48 +543,55 @@ class Identifier(BaseExpr):
         super().__init__("Identifier")
         self.name = name
         self.get_type()
-    
+        if self.expr_type.is_array():
+            self.escape()
+
     def gen(self, lvalue = False):
         if self.expr_type.is_array():
             # store starting addr of struct/array
-            self.place = tac.newtmp()
-            symtable.add_var(self.place, self.expr_type)
+            self.place = self.ctx.tac.newtmp()
+            self.ctx.symtable.add_var(self.place, self.expr_type)
             if self.expr_type.is_param:
                 if lvalue:
-                    tac.emit(f"{self.place} = & {self.name}")
+                    self.ctx.tac.emit_unaryop(self.place, '&', self.name)
                 else:
-                    tac.emit(f"{self.place} = {self.name}")
+                    self.ctx.tac.emit_mov(self.place, self.name)
             else:
-                tac.emit(f"{self.place} = & {self.name}")
+                self.ctx.tac.emit_unaryop(self.place, '&', self.name)
         elif self.expr_type.is_struct_type():
             # store starting addr of struct/array
-            self.place = tac.newtmp()
-            symtable.add_var(self.place, self.expr_type)
-            tac.emit(f"{self.place} = & {self.name}")
+            self.place = self.ctx.tac.newtmp()
+            self.ctx.symtable.add_var(self.place, self.expr_type)
+            if self.ctx.symtable.cur_scope().lookup_info(self.name).get('returned'):
+                # the struct every return gives back, it is built right in
+                # the caller's struct
+                self.ctx.tac.emit_mov(self.place, 'ret@')
+            else:
+                self.ctx.tac.emit_unaryop(self.place, '&', self.name)
         else:
             if self.expr_type.is_float() and self.expr_type.is_param:
-                self.place = tac.newtmp()
-                symtable.add_var(self.place, VarType(0, 'float'))
+                self.place = self.ctx.tac.newtmp()
+                self.ctx.symtable.add_var(self.place, VarType(0, 'float'))
                 if not lvalue:
-                    tac.emit(f'{self.place} = double2float {self.name}')
+                    self.ctx.tac.emit_unaryop(self.place, 'double2float', self.name)
             else:
                 if lvalue:
-                    self.place = tac.newtmp()
-                    symtable.add_var(self.place, self.expr_type.get_pointer_type())
-                    tac.emit(f"{self.place} = & {self.name}")
+                    self.place = self.ctx.tac.newtmp()
+                    self.ctx.symtable.add_var(self.place, self.expr_type.get_pointer_type())
+                    self.ctx.tac.emit_unaryop(self.place, '&', self.name)
                 else:
                     self.place = self.name # resolved using symtable during code generation
 
         if getattr(self, 'bool', False):
-            self.truelist = [tac.nextquad()]
-            tac.emit(f"ifnz {self.place} goto ")
-            self.falselist = [tac.nextquad()]
-            tac.emit(f"goto ")
+            self.truelist = [self.ctx.tac.nextquad()]
+            self.ctx.tac.emit_ifnz(self.place)
+            self.falselist = [self.ctx.tac.nextquad()]
+            self.ctx.tac.emit_goto()
 
     def get_type(self):
-        _var = symtable.lookup_var(self.name)
+        _var = self.ctx.symtable.lookup_var(self.name)
         if _var is None:
-            parser_error(f'Undeclared Variable {self.name}')
+            self.ctx.error(f'Undeclared Variable {self.name}')
         else:
             self.expr_type = _var
         # print(self.name, self.expr_type)
@@ -562,15 +616,15 @@ class OpExpr(BaseExpr):
         # self.emit()
 
     def gen(self):
-        self.place = tac.newtmp()
-        symtable.add_var(self.place, self.expr_type)
+        self.place = self.ctx.tac.newtmp()
+        self.ctx.symtable.add_var(self.place, self.expr_type)
         self.nextlist = []
         if self.ops == '||':
             self.lhs.bool = True
             self.rhs.bool = True
 
             self.lhs.gen()
-            tac.backpatch(getattr(self.lhs, 'falselist', []), tac.nextquad())
+            self.ctx.tac.backpatch(getattr(self.lhs, 'falselist', []), self.ctx.tac.nextquad())
             self.rhs.gen()
             self.truelist = self.lhs.truelist + self.rhs.truelist
             self.falselist = self.rhs.falselist
@@ -581,17 +635,22 @@ class OpExpr(BaseExpr):
             self.rhs.bool = True
 
             self.lhs.gen()
-            tac.backpatch(getattr(self.lhs, 'truelist', []), tac.nextquad())
+            self.ctx.tac.backpatch(getattr(self.lhs, 'truelist', []), self.ctx.tac.nextquad())
             self.rhs.gen()
             self.truelist = self.rhs.truelist
             self.falselist = self.lhs.falselist + self.rhs.falselist
         
         else:
             self.lhs.gen()
-            tac.backpatch(getattr(self.lhs, 'nextlist', []), tac.nextquad())
+            self.ctx.tac.backpatch(getattr(self.lhs, 'nextlist', []), self.ctx.tac.nextquad())
             self.rhs.gen()
 
-            if self.expr_type.basic_type() == 'float' and not self.expr_type.is_pointer():
+            # comparisons are done in the type of their operands
+            if self.ops in ['>', '>=', '<', '<=', '==', '!=']:
+                operand_type = self.lhs.expr_type
+            else:
+                operand_type = self.expr_type
+            if operand_type.basic_type() == 'float' and not operand_type.is_pointer():
                 operator = 'float' + self.ops
             elif self.ops in ['<<', '>>', '|', '&', '%', '^']:
                 operator = self.ops
@@ -599,38 +658,40 @@ class OpExpr(BaseExpr):
                 operator = 'int' + self.ops
 
             if self.lhs.expr_type.is_pointer() and not self.rhs.expr_type.is_pointer():
-                tmpvar = tac.newtmp()
-                symtable.add_var(tmpvar, self.rhs.expr_type)
-                tac.emit(f"{tmpvar} = {self.rhs.place} int* ${self.lhs.expr_type.get_ref_size()}")
-                tac.emit(f"{self.place} = {self.lhs.place} {operator} {tmpvar}")
+                tmpvar = self.ctx.tac.newtmp()
+                self.ctx.symtable.add_var(tmpvar, self.rhs.expr_type)
+                self.ctx.tac.emit_binop(tmpvar, self.rhs.place, 'int*', f'${self.lhs.expr_type.get_ref_size()}')
+                self.ctx.tac.emit_binop(self.place, self.lhs.place, operator, tmpvar)
             elif not self.lhs.expr_type.is_pointer() and self.rhs.expr_type.is_pointer():
-                tmpvar = tac.newtmp()
-                symtable.add_var(tmpvar, self.lhs.expr_type)
-                tac.emit(f"{tmpvar} = {self.lhs.place} int* ${self.rhs.expr_type.get_ref_size()}")
-                tac.emit(f"{self.place} = {tmpvar} {operator} {self.rhs.place}")
-            elif self.lhs.expr_type.is_pointer():
-                tmpvar = tac.newtmp()
-                symtable.add_var(tmpvar, VarType(0, 'int'))
-                tac.emit(f"{tmpvar} = {self.lhs.place} {operator} {self.rhs.place}")
-                tac.emit(f"{self.place} = {tmpvar} int/ {self.rhs.expr_type.get_ref_size()}")
+                tmpvar = self.ctx.tac.newtmp()
+                self.ctx.symtable.add_var(tmpvar, self.lhs.expr_type)
+                self.ctx.tac.emit_binop(tmpvar, self.lhs.place, 'int*', f'${self.rhs.expr_type.get_ref_size()}')
+                self.ctx.tac.emit_binop(self.place, tmpvar, operator, self.rhs.place)
+            elif self.lhs.expr_type.is_pointer() and self.ops == '-':
+                # difference of pointers counts elements, pointers are
+                # compared as they are
+                tmpvar = self.ctx.tac.newtmp()
+                self.ctx.symtable.add_var(tmpvar, VarType(0, 'int'))
+                self.ctx.tac.emit_binop(tmpvar, self.lhs.place, operator, self.rhs.place)
+                self.ctx.tac.emit_binop(self.place, tmpvar, 'int/', f'${self.rhs.expr_type.get_ref_size()}')
             else:
-                tac.emit("{} = {} {} {}".format(self.place, self.lhs.place, operator, self.rhs.place))
+                self.ctx.tac.emit_binop(self.place, self.lhs.place, operator, self.rhs.place)
 
             if getattr(self, 'bool', False):
-                self.truelist = [tac.nextquad()]
-                self.falselist = [tac.nextquad()+1]
-                tac.emit(f"ifnz {self.place} goto ")
-                tac.emit(f"goto ")
+                self.truelist = [self.ctx.tac.nextquad()]
+                self.falselist = [self.ctx.tac.nextquad()+1]
+                self.ctx.tac.emit_ifnz(self.place)
+                self.ctx.tac.emit_goto()
         
         if not getattr(self, 'bool', False) and self.ops in ['||', '&&']:
-            self.nextlist = [tac.nextquad() + 1]
+            self.nextlist = [self.ctx.tac.nextquad() + 1]
             
-            tac.backpatch(self.truelist, tac.nextquad())
-            tac.emit(f'{self.place} = 1')
-            tac.emit(f'goto ')
+            self.ctx.tac.backpatch(self.truelist, self.ctx.tac.nextquad())
+            self.ctx.tac.emit_mov(self.place, '1')
+            self.ctx.tac.emit_goto()
 
-            tac.backpatch(self.falselist, tac.nextquad())
-            tac.emit(f'{self.place} = 0')
+            self.ctx.tac.backpatch(self.falselist, self.ctx.tac.nextquad())
+            self.ctx.tac.emit_mov(self.place, '0')
         
         self.nextlist += getattr(self.rhs, 'nextlist', [])
 
@@ -654,15 +715,20 @@ class OpExpr(BaseExpr):
         #     parser_error(f'Invalid operands to ops {self.ops} (have `{self.lhs.expr_type}` and `{self.rhs.expr_type}`)')
 
         if self.ops in ['>', '>=', '<', '<=']:
-            if self.lhs.expr_type.get_caste_type(self.rhs.expr_type):
+            caste_type = self.lhs.expr_type.get_caste_type(self.rhs.expr_type)
+            if caste_type:
+                # an int compared with a float is converted to float
+                if caste_type.is_float():
+                    self.lhs = CastExpr.get_cast(VarType(0, 'float'), self.lhs)
+                    self.rhs = CastExpr.get_cast(VarType(0, 'float'), self.rhs)
                 self.expr_type = VarType(0, 'int')
                 return
             else:
-                parser_error(f'Type not compatible with ops {self.ops}')
+                self.ctx.error(f'Type not compatible with ops {self.ops}')
                 return
         elif self.ops in ['||', '&&']:
             if self.lhs.expr_type.is_struct_type() or self.rhs.expr_type.is_struct_type():
-                parser_error(f'Type not compatible with ops {self.ops}')
+                self.ctx.error(f'Type not compatible with ops {self.ops}')
                 return
             else:
                 self.expr_type = VarType(0, 'int')
@@ -676,7 +742,7 @@ class OpExpr(BaseExpr):
                     inferred_type = 'int'
                     ref_count = 0
                 else:
-                    parser_error('Type not compatible with ops {}'.format(self.ops))
+                    self.ctx.error('Type not compatible with ops {}'.format(self.ops))
                     # compilation_err.append('Type not compatible with ops {}'.format(self.ops))
                     # parser.error = compilation_err[-1]
                     # parser_error()
@@ -686,7 +752,7 @@ class OpExpr(BaseExpr):
                     inferred_type = self.lhs.expr_type._type
                     ref_count = self.lhs.expr_type.ref_count
                 else:
-                    parser_error('Type not compatible with ops {}'.format(self.ops))
+                    self.ctx.error('Type not compatible with ops {}'.format(self.ops))
                     
         # if lhs is not pointer
         else:
@@ -697,10 +763,10 @@ class OpExpr(BaseExpr):
                         inferred_type = self.rhs.expr_type._type
                         ref_count = self.rhs.expr_type.ref_count
                     else:
-                        parser_error('Type not compatible with ops {}'.format(self.ops))
+                        self.ctx.error('Type not compatible with ops {}'.format(self.ops))
                         
                 else:
-                    parser_error('Type not compatible with ops {}'.format(self.ops))
+                    self.ctx.error('Type not compatible with ops {}'.format(self.ops))
                     
             # if lhs and rhs are both NOT pointer
             else:
@@ -709,7 +775,7 @@ class OpExpr(BaseExpr):
                         inferred_type = self.lhs.expr_type._type
                         ref_count = self.lhs.expr_type.ref_count
                     else:
-                        parser_error('Type not compatible with ops {}'.format(self.ops))
+                        self.ctx.error('Type not compatible with ops {}'.format(self.ops))
                         
                 else:
                     if self.rhs.expr_type._type in self.ops_type[self.ops]:
@@ -723,10 +789,14 @@ class OpExpr(BaseExpr):
                             self.lhs = CastExpr.get_cast(VarType(ref_count, inferred_type), self.lhs)
                             self.rhs = CastExpr.get_cast(VarType(ref_count, inferred_type), self.rhs)
                         else:
-                            parser_error('Type not compatible with ops {}'.format(self.ops))
+                            self.ctx.error('Type not compatible with ops {}'.format(self.ops))
                     else:
-                        parser_error('Type not compatible with ops {}'.format(self.ops))
+                        self.ctx.error('Type not compatible with ops {}'.format(self.ops))
 
+        if self.ops in ['==', '!=']:
+            # the operands are converted to their common type, the result is
+            # an int whichever it is
+            inferred_type, ref_count = 'int', 0
         self.expr_type = VarType(ref_count, inferred_type)
 
 class UnaryExpr(OpExpr):
@@ -738,61 +808,63 @@ class UnaryExpr(OpExpr):
         self.ops_type['--'] = ['int', 'char', 'float']
         super().__init__(None, ops, rhs)
         self.get_type()
+        if self.ops == '&':
+            self.rhs.escape()
 
     def gen(self, lvalue=False):
-        self.place = tac.newtmp()
+        self.place = self.ctx.tac.newtmp()
         
         # if self.expr_type.is_struct_type():
         #     # value of struct in 3ac == addr of starting position of struct
         #     symtable.add_var(self.place, VarType(1, self.expr_type._type))
         # else:
-        symtable.add_var(self.place, self.expr_type)
+        self.ctx.symtable.add_var(self.place, self.expr_type)
 
         if self.ops == 'sizeof':
-            tac.emit(f"{self.place} = ${self.rhs.get_size()}")
+            self.ctx.tac.emit_mov(self.place, f'${self.rhs.get_size()}')
         elif self.ops == '++':
             self.rhs.gen(lvalue=True)
-            tac.backpatch(getattr(self.rhs, 'nextlist', []), tac.nextquad())
+            self.ctx.tac.backpatch(getattr(self.rhs, 'nextlist', []), self.ctx.tac.nextquad())
             
-            tmpvar = tac.newtmp()
-            symtable.add_var(tmpvar, self.expr_type)
+            tmpvar = self.ctx.tac.newtmp()
+            self.ctx.symtable.add_var(tmpvar, self.expr_type)
 
-            tmpvar2 = tac.newtmp()
-            symtable.add_var(tmpvar2, self.rhs.expr_type)
+            tmpvar2 = self.ctx.tac.newtmp()
+            self.ctx.symtable.add_var(tmpvar2, self.rhs.expr_type)
             
-            tac.emit(f"{tmpvar2} = * {self.rhs.place}")
+            self.ctx.tac.emit_unaryop(tmpvar2, '*', self.rhs.place)
 
             if self.expr_type.is_float():
-                tac.emit(f"{tmpvar} = int2float $1")
+                self.ctx.tac.emit_unaryop(tmpvar, 'int2float', '$1')
 
-                tac.emit(f"{tmpvar} = {tmpvar2} float+ {tmpvar}")
+                self.ctx.tac.emit_binop(tmpvar, tmpvar2, 'float+', tmpvar)
             else:
-                tac.emit(f"{tmpvar} = {tmpvar2} int+ $1")
+                self.ctx.tac.emit_binop(tmpvar, tmpvar2, 'int+', '$1')
 
-            tac.emit(f"* {self.rhs.place} = {tmpvar}")
-            tac.emit(f"{self.place} = {tmpvar}")
+            self.ctx.tac.emit_memory_update(self.rhs.place, tmpvar)
+            self.ctx.tac.emit_mov(self.place, tmpvar)
 
         elif self.ops == '--':
             self.rhs.gen(lvalue=True)
-            tac.backpatch(getattr(self.rhs, 'nextlist', []), tac.nextquad())
+            self.ctx.tac.backpatch(getattr(self.rhs, 'nextlist', []), self.ctx.tac.nextquad())
             
-            tmpvar = tac.newtmp()
-            symtable.add_var(tmpvar, self.expr_type)
+            tmpvar = self.ctx.tac.newtmp()
+            self.ctx.symtable.add_var(tmpvar, self.expr_type)
 
-            tmpvar2 = tac.newtmp()
-            symtable.add_var(tmpvar2, self.rhs.expr_type)
+            tmpvar2 = self.ctx.tac.newtmp()
+            self.ctx.symtable.add_var(tmpvar2, self.rhs.expr_type)
             
-            tac.emit(f"{tmpvar2} = * {self.rhs.place}")
+            self.ctx.tac.emit_unaryop(tmpvar2, '*', self.rhs.place)
 
             if self.expr_type.is_float():
-                tac.emit(f"{tmpvar} = int2float $1")
+                self.ctx.tac.emit_unaryop(tmpvar, 'int2float', '$1')
 
-                tac.emit(f"{tmpvar} = {tmpvar2} float- {tmpvar}")
+                self.ctx.tac.emit_binop(tmpvar, tmpvar2, 'float-', tmpvar)
             else:
-                tac.emit(f"{tmpvar} = {tmpvar2} int- $1")
+                self.ctx.tac.emit_binop(tmpvar, tmpvar2, 'int-', '$1')
 
-            tac.emit(f"* {self.rhs.place} = {tmpvar}")
-            tac.emit(f"{self.place} = {tmpvar}")
+            self.ctx.tac.emit_memory_update(self.rhs.place, tmpvar)
+            self.ctx.tac.emit_mov(self.place, tmpvar)
 
         elif self.ops in ['&', '*', '-', '~']:
             if self.ops == '&' and (not isinstance(self.rhs, Identifier)):
@@ -802,30 +874,32 @@ class UnaryExpr(OpExpr):
                     self.rhs.gen(lvalue=True)
                 else:
                     raise Exception("Invalid class {}", type(self.rhs))
-                tac.emit(f"{self.place} = {self.rhs.place}")
+                self.ctx.tac.emit_mov(self.place, self.rhs.place)
                 return
             self.rhs.gen()
-            tac.backpatch(getattr(self.rhs, 'nextlist', []), tac.nextquad())
+            self.ctx.tac.backpatch(getattr(self.rhs, 'nextlist', []), self.ctx.tac.nextquad())
             if self.ops == '-':
                 # TODO: in semantics, negation of pointer is syntax error
                 self.ops = self.expr_type.basic_type() + self.ops
             
             if self.rhs.expr_type.is_struct_type() and self.ops == '&':
                 # address of struct == addr of starting position of struct
-                tac.emit(f"{self.place} = {self.rhs.place}")
+                self.ctx.tac.emit_mov(self.place, self.rhs.place)
             elif self.expr_type.is_struct_type() and self.ops == '*':
                 # value of struct == addr of starting position of struct == address of struct
-                tac.emit(f"{self.place} = {self.rhs.place}")
+                self.ctx.tac.emit_mov(self.place, self.rhs.place)
             else:
                 if lvalue and self.ops == '*':
-                    tac.emit(f"{self.place} = {self.rhs.place}")
+                    # the address itself, a copy into self.place would take
+                    # the type of the value
+                    self.place = self.rhs.place
                 else:
-                    tac.emit("{} = {} {}".format(self.place, self.ops, self.rhs.place))
+                    self.ctx.tac.emit_unaryop(self.place, self.ops, self.rhs.place)
         elif self.ops == '+':
             self.rhs.gen()
-            tac.backpatch(getattr(self.rhs, 'nextlist', []), tac.nextquad())
+            self.ctx.tac.backpatch(getattr(self.rhs, 'nextlist', []), self.ctx.tac.nextquad())
 
-            tac.emit(f"{self.place} = {self.rhs.place}")
+            self.ctx.tac.emit_mov(self.place, self.rhs.place)
         elif self.ops == '!':
             
             self.rhs.bool = True
@@ -835,14 +909,14 @@ class UnaryExpr(OpExpr):
             self.falselist = self.rhs.truelist
 
             if not getattr(self, 'bool', False):
-                tac.backpatch(getattr(self, 'truelist', []), tac.nextquad())
-                tac.emit(f'{self.place} = $1')
+                self.ctx.tac.backpatch(getattr(self, 'truelist', []), self.ctx.tac.nextquad())
+                self.ctx.tac.emit_mov(self.place, '$1')
 
-                self.nextlist = getattr(self, 'nextlist', []) + [tac.nextquad()]
-                tac.emit(f'goto ')
+                self.nextlist = getattr(self, 'nextlist', []) + [self.ctx.tac.nextquad()]
+                self.ctx.tac.emit_goto()
 
-                tac.backpatch(getattr(self, 'falselist', []), tac.nextquad())
-                tac.emit(f'{self.place} = $0')
+                self.ctx.tac.backpatch(getattr(self, 'falselist', []), self.ctx.tac.nextquad())
+                self.ctx.tac.emit_mov(self.place, '$0')
 
     def get_type(self):
 
@@ -860,7 +934,7 @@ class UnaryExpr(OpExpr):
         # arithmetic ops
         if self.ops in ['--', '++']:
             if not self.rhs.has_lvalue():
-                parser_error("lvalue required as increment/decrement operand")
+                self.ctx.error("lvalue required as increment/decrement operand")
                 self.expr_type = self.rhs.expr_type
                 return
             else:
@@ -870,7 +944,7 @@ class UnaryExpr(OpExpr):
         elif self.ops in ['+', '-']:
             if self.rhs.expr_type.ref_count == 0:
                 if self.rhs.expr_type._type not in self.ops_type[self.ops]:
-                    parser_error('Type not compatible with ops {}'.format(self.ops))
+                    self.ctx.error('Type not compatible with ops {}'.format(self.ops))
                     self.expr_type = self.rhs.expr_type
                     return
                 
@@ -879,13 +953,13 @@ class UnaryExpr(OpExpr):
 
             else:
                 if self.ops in ['-', '+']:
-                    parser_error('wrong type argument to unary minus')
+                    self.ctx.error('wrong type argument to unary minus')
                 inferred_type = self.rhs.expr_type._type
                 ref_count = self.rhs.expr_type.ref_count
         # bool ops
         elif self.ops in ['!', '~']:
             if self.rhs.expr_type._type not in self.ops_type[self.ops]:
-                parser_error('Type not compatible with ops {}'.format(self.ops))
+                self.ctx.error('Type not compatible with ops {}'.format(self.ops))
             
             inferred_type = 'int'
             ref_count = 0
@@ -895,13 +969,13 @@ class UnaryExpr(OpExpr):
                 inferred_type = self.rhs.expr_type._type
                 ref_count = self.rhs.expr_type.ref_count - 1
             else:
-                parser_error('Can not dereference a non pointer')
+                self.ctx.error('Can not dereference a non pointer')
         elif self.ops == '&':
             # if not isinstance(self.rhs, Identifier) and \
             #     (not (isinstance(self.rhs, PostfixExpr) and self.rhs.ops in ['.', '->'])) and \
             #     (not (isinstance(self.rhs, UnaryExpr) and self.rhs.ops in ['*'])):
             if not self.rhs.has_lvalue():
-                parser_error(f'lvalue required as unary `{self.ops}` operand')
+                self.ctx.error(f'lvalue required as unary `{self.ops}` operand')
             else:
                 ref_count = self.rhs.expr_type.ref_count + 1
                 inferred_type = self.rhs.expr_type._type
@@ -916,69 +990,75 @@ class PostfixExpr(OpExpr):
         self.ops_type['++'] = ['int', 'char', 'float']
         self.ops_type['--'] = ['int', 'char', 'float']
         super().__init__(lhs, ops, rhs)
+        if self.ops == '[' and self.lhs.expr_type.is_array():
+            # subscripted right away, the array's address is not let out
+            self.lhs.escape(-1)
+        if self.ops in ('[', '.') and self.expr_type.is_array():
+            self.escape()
 
     def gen(self, lvalue=False):
         self.place = '#'
         # populate self.place when it is not void
         if self.expr_type != VarType(0, 'void'):
-            self.place = tac.newtmp()
+            self.place = self.ctx.tac.newtmp()
             # if self.expr_type.is_struct_type() or lvalue:
                 # tac variables of struct points to the starting of struct
             if lvalue:
-                symtable.add_var(self.place, VarType(1 + self.expr_type.ref_count, self.expr_type._type, self.expr_type.arr_offset))
+                self.ctx.symtable.add_var(self.place, VarType(1 + self.expr_type.ref_count, self.expr_type._type, self.expr_type.arr_offset))
             else:
-                symtable.add_var(self.place, self.expr_type)
+                self.ctx.symtable.add_var(self.place, self.expr_type)
 
         if self.ops == '++':
             self.lhs.gen(lvalue=True)
-            tac.backpatch(getattr(self.lhs, 'nextlist', []), tac.nextquad())
+            self.ctx.tac.backpatch(getattr(self.lhs, 'nextlist', []), self.ctx.tac.nextquad())
 
-            tac.emit(f"{self.place} = * {self.lhs.place}")
+            self.ctx.tac.emit_unaryop(self.place, '*', self.lhs.place)
 
-            tmpvar = tac.newtmp()
-            symtable.add_var(tmpvar, self.expr_type)
+            tmpvar = self.ctx.tac.newtmp()
+            self.ctx.symtable.add_var(tmpvar, self.expr_type)
 
             if self.expr_type.is_float():
-                tac.emit(f"{tmpvar} = int2float $1")
-                tac.emit(f"{tmpvar} = {self.place} float+ {tmpvar}")
+                self.ctx.tac.emit_unaryop(tmpvar, 'int2float', '$1')
+                self.ctx.tac.emit_binop(tmpvar, self.place, 'float+', tmpvar)
             else:
-                tac.emit(f"{tmpvar} = {self.place} int+ $1")
+                self.ctx.tac.emit_binop(tmpvar, self.place, 'int+', '$1')
             
-            tac.emit(f"* {self.lhs.place} = {tmpvar}")
+            self.ctx.tac.emit_memory_update(self.lhs.place, tmpvar)
             
         elif self.ops == '--':
             self.lhs.gen(lvalue=True)
-            tac.backpatch(getattr(self.lhs, 'nextlist', []), tac.nextquad())
+            self.ctx.tac.backpatch(getattr(self.lhs, 'nextlist', []), self.ctx.tac.nextquad())
             
-            tac.emit(f"{self.place} = * {self.lhs.place}")
+            self.ctx.tac.emit_unaryop(self.place, '*', self.lhs.place)
 
-            tmpvar = tac.newtmp()
-            symtable.add_var(tmpvar, self.expr_type)
+            tmpvar = self.ctx.tac.newtmp()
+            self.ctx.symtable.add_var(tmpvar, self.expr_type)
 
             if self.expr_type.is_float():
-                tac.emit(f"{tmpvar} = int2float $1")
-                tac.emit(f"{tmpvar} = {self.place} float- {tmpvar}")
+                self.ctx.tac.emit_unaryop(tmpvar, 'int2float', '$1')
+                self.ctx.tac.emit_binop(tmpvar, self.place, 'float-', tmpvar)
             else:
-                tac.emit(f"{tmpvar} = {self.place} int- $1")
+                self.ctx.tac.emit_binop(tmpvar, self.place, 'int-', '$1')
             
-            tac.emit(f"* {self.lhs.place} = {tmpvar}")
+            self.ctx.tac.emit_memory_update(self.lhs.place, tmpvar)
             
 
         elif self.ops == '[':
             self.lhs.gen()
-            tac.backpatch(getattr(self.lhs, 'nextlist', []), tac.nextquad())
+            self.ctx.tac.backpatch(getattr(self.lhs, 'nextlist', []), self.ctx.tac.nextquad())
             
             self.rhs.gen()
-            tac.backpatch(getattr(self.rhs, 'nextlist', []), tac.nextquad())
+            self.ctx.tac.backpatch(getattr(self.rhs, 'nextlist', []), self.ctx.tac.nextquad())
             
-            tmpvar = tac.newtmp()
-            symtable.add_var(tmpvar, self.rhs.expr_type)
-            tac.emit(f"{tmpvar} = {self.rhs.place} int* ${self.lhs.expr_type.get_ref_size()}")
+            tmpvar = self.ctx.tac.newtmp()
+            self.ctx.symtable.add_var(tmpvar, self.rhs.expr_type)
+            self.ctx.tac.emit_binop(tmpvar, self.rhs.place, 'int*', f'${self.lhs.expr_type.get_ref_size()}')
             
-            if lvalue:
-                tac.emit(f"{self.place} = {self.lhs.place} int+ {tmpvar}")
+            if lvalue or self.expr_type.is_struct_type():
+                # a struct element, like a struct variable, is its address
+                self.ctx.tac.emit_binop(self.place, self.lhs.place, 'int+', tmpvar)
             else:
-                tac.emit(f"{self.place} = {self.lhs.place} [ {tmpvar} ]")
+                self.ctx.tac.emit_array_access(self.place, self.lhs.place, tmpvar)
         elif self.ops == '(':
             # stdio function (special as it contain variable number of args)
             if self.lhs.name in ['printf', 'scanf']:
@@ -987,23 +1067,27 @@ class PostfixExpr(OpExpr):
                 # generate code for parameters other than first one
                 for param in self.rhs:
                     param.gen()
-                    tac.backpatch(getattr(param, 'nextlist', []), tac.nextquad())
+                    self.ctx.tac.backpatch(getattr(param, 'nextlist', []), self.ctx.tac.nextquad())
 
                 args_size = 0
-                tac.emit(f'CallSeqBegin')
+                self.ctx.tac.emit_call_seq_begin()
 
                 # push parameters other than the first one
                 for param in reversed(self.rhs):
-                    if param.expr_type.is_array():
-                        args_size += ADDR_SIZE
-                    else:
+                    if param.expr_type.is_float():
+                        # floats are pushed as double
+                        args_size += 2 * ADDR_SIZE
+                    elif param.expr_type.is_struct_type():
                         args_size += param.expr_type.get_size()
-                    tac.emit(f"param {param.place}")
+                    else:
+                        # chars and arrays (decayed to pointers) are pushed as a word
+                        args_size += ADDR_SIZE
+                    self.ctx.tac.emit_param(param.place)
 
                 # call the function
-                tac.emit(f"{self.lhs.name} {args_size} {self.place}")
+                self.ctx.tac.emit_stdio(self.lhs.name, args_size, self.place)
 
-                tac.emit(f'CallSeqEnd')
+                self.ctx.tac.emit_call_seq_end()
 
             # standard function call
             else:
@@ -1012,34 +1096,37 @@ class PostfixExpr(OpExpr):
                 # generate code for parameters
                 for param in args:
                     param.gen()
-                    tac.backpatch(getattr(param, 'nextlist', []), tac.nextquad())
+                    self.ctx.tac.backpatch(getattr(param, 'nextlist', []), self.ctx.tac.nextquad())
 
                 # if return type is struct
                 if self.expr_type.is_struct_type():
-                    ret_var = tac.newtmp()
-                    symtable.add_var(ret_var, self.expr_type, ret_var=True)
-
-                    pret_var = tac.newtmp()
-                    symtable.add_var(pret_var, self.expr_type.get_pointer_type())
-                    tac.emit(f"{pret_var} = & {ret_var}")
+                    pret_var = self.ctx.tac.newtmp()
+                    self.ctx.symtable.add_var(pret_var, self.expr_type.get_pointer_type())
+                    if getattr(self, 'ret_dest', None) is not None:
+                        # address of the struct the result is assigned to
+                        self.ctx.tac.emit_mov(pret_var, self.ret_dest)
+                    else:
+                        ret_var = self.ctx.tac.newtmp()
+                        self.ctx.symtable.add_var(ret_var, self.expr_type, ret_var=True)
+                        self.ctx.tac.emit_unaryop(pret_var, '&', ret_var)
 
-                tac.emit(f'CallSeqBegin')
+                self.ctx.tac.emit_call_seq_begin()
 
                 # push parameters 
                 for param in reversed(args):
-                    tac.emit(f"param {param.place}")
+                    self.ctx.tac.emit_param(param.place)
 
                 if self.expr_type.is_struct_type():
-                    tac.emit(f"param {pret_var}")
+                    self.ctx.tac.emit_param(pret_var)
 
                 # call the function
-                tac.emit(f"call {self.lhs.name} {self.place}")
+                self.ctx.tac.emit_call(self.lhs.name, self.place)
                 
-                tac.emit(f'CallSeqEnd')
+                self.ctx.tac.emit_call_seq_end()
                 
         elif self.ops in ['.', '->']:
             self.lhs.gen()
-            tac.backpatch(getattr(self.lhs, 'nextlist', []), tac.nextquad())
+            self.ctx.tac.backpatch(getattr(self.lhs, 'nextlist', []), self.ctx.tac.nextquad())
 
             offset = self.lhs.expr_type._type.get_offset(self.rhs)
             
@@ -1047,16 +1134,16 @@ class PostfixExpr(OpExpr):
 
             if var_type.is_struct_type() or var_type.is_array():
                 # store only addr of struct
-                tac.emit(f"{self.place} = {self.lhs.place} int+ ${offset}")
+                self.ctx.tac.emit_binop(self.place, self.lhs.place, 'int+', f'${offset}')
             else:
                 if lvalue:
-                    tac.emit(f"{self.place} = {self.lhs.place} int+ ${offset}")
+                    self.ctx.tac.emit_binop(self.place, self.lhs.place, 'int+', f'${offset}')
                 else:
-                    var_addr = tac.newtmp()
-                    symtable.add_var(var_addr, VarType(1 + var_type.ref_count, var_type._type, var_type.arr_offset))
+                    var_addr = self.ctx.tac.newtmp()
+                    self.ctx.symtable.add_var(var_addr, VarType(1 + var_type.ref_count, var_type._type, var_type.arr_offset))
 
-                    tac.emit(f"{var_addr} = {self.lhs.place} int+ ${offset}")
-                    tac.emit(f"{self.place} = * {var_addr}")
+                    self.ctx.tac.emit_binop(var_addr, self.lhs.place, 'int+', f'${offset}')
+                    self.ctx.tac.emit_unaryop(self.place, '*', var_addr)
 
     def get_type(self):
         
@@ -1071,7 +1158,7 @@ class PostfixExpr(OpExpr):
         # arithmetic ops
         if self.ops in ['--', '++']:
             if not self.lhs.has_lvalue():
-                parser_error("lvalue required as increment/decrement operand")
+                self.ctx.error("lvalue required as increment/decrement operand")
                 self.expr_type = self.lhs.expr_type # for error recovery
                 return
             else:
@@ -1084,13 +1171,13 @@ class PostfixExpr(OpExpr):
                 if self.lhs.expr_type._type.is_defined():
                     struct_var = self.lhs.expr_type._type.variables.get(self.rhs, None)
                     if struct_var is None:
-                        parser_error('{} has no member named {}'.format(self.lhs.expr_type._type.name, self.rhs))
+                        self.ctx.error('{} has no member named {}'.format(self.lhs.expr_type._type.name, self.rhs))
                     inferred_type = struct_var._type
                     ref_count = struct_var.ref_count
                 else:
-                    parser_error('Incomplete struct {}'.format(self.lhs.expr_type._type.name))
+                    self.ctx.error('Incomplete struct {}'.format(self.lhs.expr_type._type.name))
             else:
-                parser_error('Dereferencing invalid struct type')
+                self.ctx.error('Dereferencing invalid struct type')
 
         # struct deferencing child
         elif self.ops == '->':
@@ -1099,32 +1186,32 @@ class PostfixExpr(OpExpr):
                     # print(self.lhs.expr_type)
                     struct_var = self.lhs.expr_type._type.variables.get(self.rhs, None)
                     if struct_var is None:
-                        parser_error('{} has no member named {}'.format(self.lhs.expr_type._type.name, self.rhs))
+                        self.ctx.error('{} has no member named {}'.format(self.lhs.expr_type._type.name, self.rhs))
                     inferred_type = struct_var._type
                     ref_count = struct_var.ref_count
                 else:
-                    parser_error('Incomplete struct {}'.format(self.lhs.expr_type._type.name))
+                    self.ctx.error('Incomplete struct {}'.format(self.lhs.expr_type._type.name))
             else:
-                parser_error('Dereferencing invalid struct type')
+                self.ctx.error('Dereferencing invalid struct type')
         # function calling
         elif self.ops == '(':
             arg_list = [] if self.rhs is None else self.rhs
 
-            _var = symtable.lookup_func(self.lhs)
+            _var = self.ctx.symtable.lookup_func(self.lhs)
             if isinstance(_var, Function):
                 func = self.lhs = _var
                 if func is None:
-                    parser_error('{} is not callable'.format(self.lhs))
+                    self.ctx.error('{} is not callable'.format(self.lhs))
 
                 if func.name in ['printf', 'scanf']:
                     if len(arg_list) < 1:
-                        parser_error('too few/many arguments to function {}'.format(func.name))
+                        self.ctx.error('too few/many arguments to function {}'.format(func.name))
                     # check if first arg is list
                     elif isinstance(arg_list[0], Const) and arg_list[0].expr_type == VarType(1, 'char'):
                         inferred_type = func.ret_type._type
                         ref_count = func.ret_type.ref_count
                     else:
-                        parser_error(f'expected string as first arguments to function {func.name}')
+                        self.ctx.error(f'expected string as first arguments to function {func.name}')
                 elif len(arg_list) == len(func.args):
                     inferred_type = func.ret_type._type
                     ref_count = func.ret_type.ref_count
@@ -1137,14 +1224,14 @@ class PostfixExpr(OpExpr):
                             # if expected.get_caste_type(given) is None:
                             if not given.castable_to(expected):
                                 # print(expected, given)
-                                parser_error(f'incompatible type for argument {i+1} of `{func.name}`')
+                                self.ctx.error(f'incompatible type for argument {i+1} of `{func.name}`')
                             else:
                                 casted_args.append(CastExpr.get_cast(expected, arg))
                         self.rhs = casted_args
                 else:
-                    parser_error('too few/many arguments to function {}'.format(func.name))
+                    self.ctx.error('too few/many arguments to function {}'.format(func.name))
             else:
-                parser_error(f'called object {self.lhs} is not a function')
+                self.ctx.error(f'called object {self.lhs} is not a function')
 
         # array reference
         elif self.ops == '[':
@@ -1161,9 +1248,9 @@ class PostfixExpr(OpExpr):
                     else:
                         ref_count = self.lhs.expr_type.ref_count - 1
                 else:
-                    parser_error('Subscripted value is neither array nor pointer')
+                    self.ctx.error('Subscripted value is neither array nor pointer')
             else:
-                parser_error('Array subscript is not an integer')
+                self.ctx.error('Array subscript is not an integer')
         
         self.expr_type = VarType(ref_count, inferred_type, arr_offset)
             
@@ -1177,27 +1264,27 @@ class CastExpr(BaseExpr):
     def gen(self):
         
         self.expr.gen()
-        tac.backpatch(getattr(self.expr, 'nextlist', []), tac.nextquad())
+        self.ctx.tac.backpatch(getattr(self.expr, 'nextlist', []), self.ctx.tac.nextquad())
         
-        self.place = tac.newtmp()
-        symtable.add_var(self.place, self.expr_type)
+        self.place = self.ctx.tac.newtmp()
+        self.ctx.symtable.add_var(self.place, self.expr_type)
 
         if self.expr.expr_type.is_pointer():
             if self.expr_type.is_pointer() or self.expr_type == VarType(0,'int'):
-                tac.emit(f"{self.place} = {self.expr.place}") # type of self.place and self.expr.place is different
+                self.ctx.tac.emit_mov(self.place, self.expr.place) # type of self.place and self.expr.place is different
             else:
-                tac.emit(f"{self.place} = int2{self.expr_type.basic_type()} {self.expr.place}")
+                self.ctx.tac.emit_unaryop(self.place, f'int2{self.expr_type.basic_type()}', self.expr.place)
         else:
             if self.expr_type.is_pointer() or self.expr_type.basic_type() == 'int':
                 if self.expr.expr_type.basic_type() == 'int':
-                    tac.emit(f"{self.place} = {self.expr.place}")
+                    self.ctx.tac.emit_mov(self.place, self.expr.place)
                 else:
-                    tac.emit(f"{self.place} = {self.expr.expr_type.basic_type()}2int {self.expr.place}")
+                    self.ctx.tac.emit_unaryop(self.place, f'{self.expr.expr_type.basic_type()}2int', self.expr.place)
             else:
                 if self.expr.expr_type.basic_type() == self.expr_type.basic_type():
-                    tac.emit(f"{self.place} = {self.expr.place}")
+                    self.ctx.tac.emit_mov(self.place, self.expr.place)
                 else:
-                    tac.emit(f"{self.place} = {self.expr.expr_type.basic_type()}2{self.expr_type.basic_type()} {self.expr.place}")
+                    self.ctx.tac.emit_unaryop(self.place, f'{self.expr.expr_type.basic_type()}2{self.expr_type.basic_type()}', self.expr.place)
 
     def get_type(self):
         if self.expr.expr_type.is_pointer():
@@ -1212,7 +1299,7 @@ class CastExpr(BaseExpr):
                     self.expr_type = self.type
                 else:
                     # target is float
-                    parser_error(f'Cannot convert pointer to {self.expr.expr_type._type}')
+                    self.ctx.error(f'Cannot convert pointer to {self.expr.expr_type._type}')
         else:
             # source is not pointer
             if self.type.is_pointer():
@@ -1222,7 +1309,7 @@ class CastExpr(BaseExpr):
                     self.expr_type = self.type
                 else:
                     # source is float
-                    parser_error(f'Cannot convert {self.expr.expr_type._type} to pointer')
+                    self.ctx.error(f'Cannot convert {self.expr.expr_type._type} to pointer')
             else:
                 # target is int/char/float, and source is also int/char/float
                 self.expr_type = self.type
@@ -1245,40 +1332,41 @@ class AssignExpr(OpExpr):
 
     def gen(self):
 
-        self.place = tac.newtmp()
-        symtable.add_var(self.place, self.expr_type)
+        self.place = self.ctx.tac.newtmp()
+        self.ctx.symtable.add_var(self.place, self.expr_type)
 
         self.lhs.gen(lvalue=True)
-        tac.backpatch(getattr(self.lhs, 'nextlist', []), tac.nextquad())
+        self.ctx.tac.backpatch(getattr(self.lhs, 'nextlist', []), self.ctx.tac.nextquad())
+
+        # a function returning a struct writes it straight into the lhs, when
+        # the lhs is a local the function has no way to read or write
+        storage = self.lhs.storage()
+        returned = (self.expr_type.is_struct_type() and isinstance(self.rhs, PostfixExpr)
+            and self.rhs.ops == '(' and self.rhs.lhs.name not in ['printf', 'scanf']
+            and storage is not None and storage.get('escapes', 0) == 0)
+        if returned:
+            self.rhs.ret_dest = self.lhs.place
 
         self.rhs.gen()
-        tac.backpatch(getattr(self.rhs, 'nextlist', []), tac.nextquad())
+        self.ctx.tac.backpatch(getattr(self.rhs, 'nextlist', []), self.ctx.tac.nextquad())
 
-        # tac.emit(f"* {self.lhs.place} = {self.rhs.place}")
+        # tac.emit_memory_update(self.lhs.place, self.rhs.place)
         if self.expr_type.is_struct_type():
-            tmpsrc = tac.newtmp()
-            symtable.add_var(tmpsrc, self.rhs.expr_type.get_pointer_type())
-            tmpdst = tac.newtmp()
-            symtable.add_var(tmpdst, self.lhs.expr_type.get_pointer_type())
-            tac.emit(f'{tmpsrc} = {self.rhs.place}') # type of tmpsrc and self.rhs.place is different
-            tac.emit(f'{tmpdst} = {self.lhs.place}')
-            tac.emit(f"param ${self.expr_type.get_size()}")
-            tac.emit(f"param {tmpsrc}")
-            tac.emit(f"param {tmpdst}")
-            tac.emit(f"call bufcpy #")
+            if not returned:
+                self.ctx.tac.emit_block_copy(self.lhs.place, self.rhs.place, self.expr_type.get_size())
         else:
-            tac.emit(f"* {self.lhs.place} = {self.rhs.place}")
+            self.ctx.tac.emit_memory_update(self.lhs.place, self.rhs.place)
         
-        tac.emit(f"{self.place} = {self.rhs.place}")
+        self.ctx.tac.emit_mov(self.place, self.rhs.place)
 
     def get_type(self):
         
         if self.lhs.expr_type.is_array():
-            parser_error("assignment to expression with array type")
+            self.ctx.error("assignment to expression with array type")
             return
 
         if not self.lhs.has_lvalue():
-            parser_error("lvalue required as left operand of assignment")
+            self.ctx.error("lvalue required as left operand of assignment")
             self.expr_type = self.lhs.expr_type
             return
         
@@ -1302,30 +1390,30 @@ class CondExpr(BaseExpr):
 
         self.cond.gen()
         
-        tac.backpatch(getattr(self.cond, 'truelist', []), tac.nextquad())
+        self.ctx.tac.backpatch(getattr(self.cond, 'truelist', []), self.ctx.tac.nextquad())
         
-        self.place = tac.newtmp()
-        symtable.add_var(self.place, self.expr_type)
+        self.place = self.ctx.tac.newtmp()
+        self.ctx.symtable.add_var(self.place, self.expr_type)
         
         self.if_expr.gen()
-        tac.backpatch(getattr(self.if_expr, 'nextlist', []), tac.nextquad())
+        self.ctx.tac.backpatch(getattr(self.if_expr, 'nextlist', []), self.ctx.tac.nextquad())
 
-        tac.emit(f"{self.place} = {self.if_expr.place}")
+        self.ctx.tac.emit_mov(self.place, self.if_expr.place)
 
-        self.nextlist = [tac.nextquad()]
-        tac.emit(f"goto ")
-        tac.backpatch(getattr(self.cond, 'falselist', []), tac.nextquad())
+        self.nextlist = [self.ctx.tac.nextquad()]
+        self.ctx.tac.emit_goto()
+        self.ctx.tac.backpatch(getattr(self.cond, 'falselist', []), self.ctx.tac.nextquad())
         
         self.else_expr.gen()
-        tac.backpatch(getattr(self.else_expr, 'nextlist', []), tac.nextquad())
+        self.ctx.tac.backpatch(getattr(self.else_expr, 'nextlist', []), self.ctx.tac.nextquad())
         
-        tac.emit(f"{self.place} = {self.else_expr.place}")
+        self.ctx.tac.emit_mov(self.place, self.else_expr.place)
 
     def get_type(self, ):
         # check type mismatch between if_expr and else_expr
         self.expr_type = self.if_expr.expr_type.get_caste_type(self.else_expr)
         if self.expr_type is None:
-            parser_error("Types not compatible with ternary operator")
+            self.ctx.error("Types not compatible with ternary operator")
 
 # class CommaExpr(BaseExpr):
 #     def __init__(self, *expr):
@@ -1364,21 +1452,21 @@ class InitDeclarator(_BaseDecl):
         super().__init__('TODO')
         self.declarator = declarator
         self.initializer = initializer
-        self.is_typedef = parser.is_typedef
-        self.is_static = parser.is_static
+        self.is_typedef = self.ctx.is_typedef
+        self.is_static = self.ctx.is_static
 
-        if isinstance(parser.type, VarType):
+        if isinstance(self.ctx.type, VarType):
             # declarator is initialized using alias which is stored
-            self.expr_type = VarType(self.declarator.ref_count + parser.type.ref_count, parser.type._type, self.declarator.arr_offset)
+            self.expr_type = VarType(self.declarator.ref_count + self.ctx.type.ref_count, self.ctx.type._type, self.declarator.arr_offset)
             if self.expr_type.arr_offset == None:
-                self.expr_type.arr_offset = parser.type.arr_offset
+                self.expr_type.arr_offset = self.ctx.type.arr_offset
             else:
-                self.expr_type.arr_offset = parser.type.arr_offset + self.expr_type.arr_offset
+                self.expr_type.arr_offset = self.ctx.type.arr_offset + self.expr_type.arr_offset
         else:
-            self.expr_type = VarType(self.declarator.ref_count, parser.type, self.declarator.arr_offset)
+            self.expr_type = VarType(self.declarator.ref_count, self.ctx.type, self.declarator.arr_offset)
 
-        if self.initializer is not None and parser.is_typedef:
-            parser_error('can not initialize typedef {}', self.declarator.name)
+        if self.initializer is not None and self.ctx.is_typedef:
+            self.ctx.error('can not initialize typedef {}', self.declarator.name)
 
         if not self.check_semantics():
             return
@@ -1393,10 +1481,10 @@ class InitDeclarator(_BaseDecl):
             
             elif isinstance(self.initializer, Const) and self.initializer.expr_type.is_string():
                 if not self.expr_type.is_string():
-                    parser_error(f"Can not assign string to non string symbol {self.declarator.name}")
+                    self.ctx.error(f"Can not assign string to non string symbol {self.declarator.name}")
                     return
                 if self.expr_type.get_size() < self.initializer.expr_type.get_size():
-                    parser_error(f"initializer-string for array of chars is too long")
+                    self.ctx.error(f"initializer-string for array of chars is too long")
                     return
                 # symtable.add_var(self.declarator.name, self.expr_type, is_static=parser.is_static)
             else:
@@ -1405,8 +1493,8 @@ class InitDeclarator(_BaseDecl):
                 self.initializer = AssignExpr(Identifier(self.declarator.name), '=', self.initializer)
 
     def check_semantics(self, ):
-        if self.initializer != None and symtable.is_global_scope():
-            parser_error(f'cannot initialize global variables')
+        if self.initializer != None and self.ctx.symtable.is_global_scope():
+            self.ctx.error(f'cannot initialize global variables')
             return False
 
         # storing aliases
@@ -1416,18 +1504,18 @@ class InitDeclarator(_BaseDecl):
 
             # Function declaration !
             if isinstance(decl, FuncDirectDecl):    
-                parser_error('Function typedefs not supported')
+                self.ctx.error('Function typedefs not supported')
                 return False
 
             vartype = self.expr_type
             
             # Sanity checking of arr offset
             if not all(map(lambda x: isinstance(x, Const) and (x.expr_type.is_int() or x.expr_type.is_char()), decl.arr_offset)):
-                parser_error('Size of array `{}` has non-integer type'.format(decl.name))
+                self.ctx.error('Size of array `{}` has non-integer type'.format(decl.name))
                 return False
 
             # Add declaration in symtab
-            symtable.add_typedef(decl.name, vartype)
+            self.ctx.symtable.add_typedef(decl.name, vartype)
             return True
         else:
 
@@ -1436,59 +1524,63 @@ class InitDeclarator(_BaseDecl):
             # Function declaration !
             if isinstance(decl, FuncDirectDecl):    
                 vartype = self.expr_type
-                symtable.add_func(Function(vartype, decl.name, decl.param_list))
+                self.ctx.symtable.add_func(Function(vartype, decl.name, decl.param_list))
                 return True
 
             vartype = self.expr_type
             
             # Sanity checking of arr offset
             if not all(map(lambda x: isinstance(x, Const) and (x.expr_type.is_int() or x.expr_type.is_char()), decl.arr_offset)):
-                parser_error('Size of array `{}` has non-integer type'.format(decl.name))
+                self.ctx.error('Size of array `{}` has non-integer type'.format(decl.name))
                 return False
 
             # Sanity checking of void declartion
             if self.expr_type._type == 'void' and vartype.ref_count==0:
-                parser_error('Variable `{}` declared void'.format(decl.name))
+                self.ctx.error('Variable `{}` declared void'.format(decl.name))
                 return False
             
             # struct declaration checking
             if self.expr_type.is_struct_type() and not self.expr_type._type.is_defined() and self.expr_type.ref_count==0:
-                parser_error('storage of struct named `{}` not avaiable'.format(self._type.name))
+                self.ctx.error('storage of struct named `{}` not avaiable'.format(self._type.name))
                 return False
 
             # Add declaration in symtab
-            symtable.add_var(decl.name, vartype, self.is_static)
+            self.ctx.symtable.add_var(decl.name, vartype, self.is_static)
         return True
 
     def gen(self):
         if self.initializer is not None:
             if isinstance(self.initializer, Initializers):
-                addr = tac.newtmp()
+                addr = self.ctx.tac.newtmp()
                 if self.expr_type.is_array() or self.expr_type.is_struct_type():
-                    symtable.add_var(addr, self.expr_type)
+                    self.ctx.symtable.add_var(addr, self.expr_type)
+                else:
+                    self.ctx.symtable.add_var(addr, VarType(1+self.expr_type.ref_count, self.expr_type._type, self.expr_type.arr_offset))
+                if self.ctx.symtable.cur_scope().lookup_info(self.declarator.name).get('returned'):
+                    # initialized right in the caller's struct (see Identifier)
+                    self.ctx.tac.emit_mov(addr, 'ret@')
                 else:
-                    symtable.add_var(addr, VarType(1+self.expr_type.ref_count, self.expr_type._type, self.expr_type.arr_offset))
-                tac.emit(f"{addr} = & {self.declarator.name}")
+                    self.ctx.tac.emit_unaryop(addr, '&', self.declarator.name)
                 self.initializer.gen_init(addr, self.expr_type)
                 self.nextlist = getattr(self.initializer, 'nextlist', [])
             elif isinstance(self.initializer, Const) and self.initializer.expr_type.is_string():
                 self.initializer.gen()
                 self.nextlist = getattr(self.initializer, 'nextlist', [])
                 
-                addr = tac.newtmp()
+                addr = self.ctx.tac.newtmp()
                 if self.expr_type.is_array() or self.expr_type.is_struct_type():
-                    symtable.add_var(addr, self.expr_type)
+                    self.ctx.symtable.add_var(addr, self.expr_type)
                 else:
-                    symtable.add_var(addr, VarType(1+self.expr_type.ref_count, self.expr_type._type, self.expr_type.arr_offset))
-                tac.emit(f"{addr} = & {self.declarator.name}")
+                    self.ctx.symtable.add_var(addr, VarType(1+self.expr_type.ref_count, self.expr_type._type, self.expr_type.arr_offset))
+                self.ctx.tac.emit_unaryop(addr, '&', self.declarator.name)
                 
-                tac.emit(f'param {self.initializer.place}')
-                tac.emit(f'param {addr}')
-                tac.emit(f'call strcpy #')
+                self.ctx.tac.emit_param(self.initializer.place)
+                self.ctx.tac.emit_param(addr)
+                self.ctx.tac.emit_call('strcpy', '#')
                 # tac.emit(f'add $0x8, %esp')
             else:
                 self.initializer.gen()
-                tac.backpatch(getattr(self.initializer, 'nextlist', []), tac.nextquad())
+                self.ctx.tac.backpatch(getattr(self.initializer, 'nextlist', []), self.ctx.tac.nextquad())
 
                 # tac.emit(f"{self.declarator.name} = {self.initializer.place}")
         else:
@@ -1521,7 +1613,7 @@ class StructUnionSpecifier(Specifier):
         # and check for redeclaration error 
         if self.decls_list is not None and self.name is not None:
             struct_type = StructType(self.name, self.variables)
-            symtable.add_struct(self.name, struct_type)
+            self.ctx.symtable.add_struct(self.name, struct_type)
 
         # lambda structs => give name as None in StructType
         elif self.decls_list is not None and self.name is None:
@@ -1531,7 +1623,7 @@ class StructUnionSpecifier(Specifier):
         # found then give only name in hope it gets resolved later 
         # (case of LinkedList struct!)
         elif self.decls_list is None and self.name is not None:
-            lookup_type = symtable.lookup_struct(self.name)
+            lookup_type = self.ctx.symtable.lookup_struct(self.name)
             if lookup_type is None:
                 struct_type = StructType(self.name, None)
             else:
@@ -1557,19 +1649,19 @@ class StructUnionSpecifier(Specifier):
 
                 # Sanity checking of arr offset
                 if not all(map(lambda x: isinstance(x, Const) and x.dvalue=='int', decl.arr_offset)):
-                    parser_error('Size of array ‘{}’ has non-integer type'.format(decl.name))
+                    self.ctx.error('Size of array ‘{}’ has non-integer type'.format(decl.name))
 
                 # void declaration checking
                 if is_void and vartype.ref_count==0:
-                    parser_error('Variable `{}` declared void inside struct'.format(decl.name))
+                    self.ctx.error('Variable `{}` declared void inside struct'.format(decl.name))
                 
                 # struct declaration checking
                 if is_struct and not d_type.is_defined() and vartype.ref_count==0:
-                    parser_error('Storage of struct named `{}` not avaiable'.format(d_type.name))
+                    self.ctx.error('Storage of struct named `{}` not avaiable'.format(d_type.name))
 
                 # Add declaration in variables
                 if decl.name in self.variables:
-                    parser_error('Redeclaration of variable named `{}` inside struct'.format(decl.name))
+                    self.ctx.error('Redeclaration of variable named `{}` inside struct'.format(decl.name))
 
                 self.variables[decl.name] = vartype
     
@@ -1595,9 +1687,9 @@ class DeclarationSpecifier(Specifier):
         self.arr_offset = []
 
         if isinstance(type_spec, str) and re.fullmatch('typedef@(?P<type_name>[^ ]*)', type_spec):
-            self.ref_count = parser.typedef_type.ref_count
-            self.type_spec = parser.typedef_type._type
-            self.arr_offset = parser.typedef_type.arr_offset
+            self.ref_count = self.ctx.typedef_type.ref_count
+            self.type_spec = self.ctx.typedef_type._type
+            self.arr_offset = self.ctx.typedef_type.arr_offset
 
         if isinstance(self.type_spec, StructUnionSpecifier):
             self.type_spec = self.type_spec.struct_type
@@ -1747,7 +1839,7 @@ class Declaration(_BaseDecl):
     def gen(self):
         for idx, init in enumerate(self.init_list):
             init.gen()
-            tac.backpatch(getattr(init, 'nextlist', []), tac.nextquad())
+            self.ctx.tac.backpatch(getattr(init, 'nextlist', []), self.ctx.tac.nextquad())
         
         if len(self.init_list) > 0:
             self.nextlist = getattr(self.init_list[-1], 'nextlist', [])
@@ -1773,12 +1865,12 @@ class Initializers(_BASENODE):
     def gen(self):
         for init in self.init_list:
             init.gen()
-            tac.backpatch(getattr(init, 'nextlist', []), tac.nextquad())
+            self.ctx.tac.backpatch(getattr(init, 'nextlist', []), self.ctx.tac.nextquad())
     
     def check_not_string(self):
         for e in self.init_list:
             if isinstance(e, Const) and e.expr_type.is_string():
-                parser_error("string is not allowed in initializer")
+                self.ctx.error("string is not allowed in initializer")
                 return
                 
     def compatible_with(self, vartype : VarType, error=False):
@@ -1788,7 +1880,7 @@ class Initializers(_BASENODE):
             
             if len(self.init_list) > vartype.get_array_len():
                 if error:
-                    parser_error(f"too many initializers")
+                    self.ctx.error(f"too many initializers")
                 return False
             
             if not self.check_array_init(vartype, error=error):
@@ -1800,7 +1892,7 @@ class Initializers(_BASENODE):
 
             if len(self.init_list) > len(structtype.variables):
                 if error:
-                    parser_error(f"too many initializers")
+                    self.ctx.error(f"too many initializers")
                 return False
             
             if not self.check_struct_init(structtype, error=error):
@@ -1810,12 +1902,12 @@ class Initializers(_BASENODE):
             # lhs is of a basic type
             if len(self.init_list) != 1:
                 if error:
-                    parser_error(f"too many/few initializers")
+                    self.ctx.error(f"too many/few initializers")
                 return False
             
             if not isinstance(self.init_list[0], BaseExpr):
                 if error:
-                    parser_error(f"too many braces around scalar initializer for type {vartype}")
+                    self.ctx.error(f"too many braces around scalar initializer for type {vartype}")
                 return False
             
             if not self.check_basic_init(self.init_list[0].expr_type, vartype, error=error):
@@ -1865,7 +1957,7 @@ class Initializers(_BASENODE):
         if not init.castable_to(element_type):
             # print(init, element_type)
             if error:
-                parser_error(f"Can not caste {init} into {element_type}")
+                self.ctx.error(f"Can not caste {init} into {element_type}")
             return False
         return True
 
@@ -1890,13 +1982,13 @@ class Initializers(_BASENODE):
         for init_idx, init in enumerate(self.init_list):
             element_type = vartype.get_array_element_type()
 
-            tmpvar = tac.newtmp()
+            tmpvar = self.ctx.tac.newtmp()
             if element_type.is_array() or element_type.is_struct_type():
-                symtable.add_var(tmpvar, element_type)
+                self.ctx.symtable.add_var(tmpvar, element_type)
             else:
-                symtable.add_var(tmpvar, VarType(1 + element_type.ref_count, element_type._type, element_type.arr_offset))
+                self.ctx.symtable.add_var(tmpvar, VarType(1 + element_type.ref_count, element_type._type, element_type.arr_offset))
             
-            tac.emit(f"{tmpvar} = {arr_addr} int+ ${init_idx * vartype.get_ref_size()}")
+            self.ctx.tac.emit_binop(tmpvar, arr_addr, 'int+', f'${init_idx * vartype.get_ref_size()}')
             
             if isinstance(init, Initializers):    
                 init.gen_init(tmpvar, element_type)
@@ -1904,7 +1996,7 @@ class Initializers(_BASENODE):
                 self.gen_basic_init(init, tmpvar, element_type)
                     
             if init_idx < init_len-1:
-                tac.backpatch(getattr(init, 'nextlist', []), tac.nextquad())
+                self.ctx.tac.backpatch(getattr(init, 'nextlist', []), self.ctx.tac.nextquad())
             else:
                 self.nextlist = getattr(init, 'nextlist', [])
 
@@ -1915,14 +2007,14 @@ class Initializers(_BASENODE):
             if init_idx >= len(self.init_list):
                 return
             
-            tmpvar = tac.newtmp()
+            tmpvar = self.ctx.tac.newtmp()
             if vartype.is_struct_type() or vartype.is_array():
                 # addr == object
-                symtable.add_var(tmpvar, vartype)
+                self.ctx.symtable.add_var(tmpvar, vartype)
             else:
-                symtable.add_var(tmpvar, VarType(1 + vartype.ref_count, vartype._type, vartype.arr_offset))
+                self.ctx.symtable.add_var(tmpvar, VarType(1 + vartype.ref_count, vartype._type, vartype.arr_offset))
 
-            tac.emit(f"{tmpvar} = {struct_addr} int+ ${structtype.get_offset(vname)}")
+            self.ctx.tac.emit_binop(tmpvar, struct_addr, 'int+', f'${structtype.get_offset(vname)}')
             init = self.init_list[init_idx]
             
             if isinstance(init, Initializers):
@@ -1931,7 +2023,7 @@ class Initializers(_BASENODE):
                 self.gen_basic_init(init, tmpvar, vartype)
             
             if init_idx < init_len-1:
-                tac.backpatch(getattr(init, 'nextlist', []), tac.nextquad())
+                self.ctx.tac.backpatch(getattr(init, 'nextlist', []), self.ctx.tac.nextquad())
             else:
                 self.nextlist = getattr(init, 'nextlist', [])
                 
@@ -1940,7 +2032,7 @@ class Initializers(_BASENODE):
         # no need for while loop as addr is already addr of first element
         
         init.gen()
-        tac.backpatch(getattr(init, 'nextlist', []), tac.nextquad())
+        self.ctx.tac.backpatch(getattr(init, 'nextlist', []), self.ctx.tac.nextquad())
 
         while(element_type.is_array() or element_type.is_struct_type()):
             if element_type.is_array():
@@ -1951,11 +2043,11 @@ class Initializers(_BASENODE):
                 element_type = element_type._type.get_first_element_type()
         
         ref_type = VarType(1 + element_type.ref_count, element_type._type, element_type.arr_offset)
-        tmpvar = tac.newtmp()
-        symtable.add_var(tmpvar, ref_type)
-        tac.emit(f'{tmpvar} = {addr}') # types of tmpvar and addr are different
+        tmpvar = self.ctx.tac.newtmp()
+        self.ctx.symtable.add_var(tmpvar, ref_type)
+        self.ctx.tac.emit_mov(tmpvar, addr) # types of tmpvar and addr are different
         
-        tac.emit(f"* {tmpvar} = {init.place}")
+        self.ctx.tac.emit_memory_update(tmpvar, init.place)
 
 # #############################################################################
 # Statements            
@@ -1973,14 +2065,15 @@ class LabeledStmt(Statement):
         self.case = case
         self.stmt = stmt
 
-        if not symtable.check_case_scope():
-            parser_error('`{}` label not within a switch statement'.format(self.case[0]))
+        if not self.ctx.symtable.check_case_scope():
+            self.ctx.error('`{}` label not within a switch statement'.format(self.case[0]))
 
     def gen(self):
         self.stmt.gen()
         self.breaklist = getattr(self.stmt, 'breaklist', [])
         self.nextlist = getattr(self.stmt, 'nextlist', [])
         self.returnlist = getattr(self.stmt, 'returnlist', [])
+        self.continuelist = getattr(self.stmt, 'continuelist', [])
 
 class CompoundStmt(Statement):
     def __init__(
@@ -1993,11 +2086,11 @@ class CompoundStmt(Statement):
         self.stmt_list = stmts
 
     def gen(self):
-        symtable.push_scope(exists=True)
+        self.ctx.symtable.push_scope(exists=True)
         if self.decl_list:
             for decl in self.decl_list:
                 decl.gen()
-                tac.backpatch(getattr(decl, 'nextlist', []), tac.nextquad())
+                self.ctx.tac.backpatch(getattr(decl, 'nextlist', []), self.ctx.tac.nextquad())
         
         self.breaklist = []
         self.continuelist = []
@@ -2006,7 +2099,7 @@ class CompoundStmt(Statement):
         if self.stmt_list:
             for idx, stmt in enumerate(self.stmt_list):
                 stmt.gen()
-                tac.backpatch(getattr(stmt, 'nextlist', []), tac.nextquad())
+                self.ctx.tac.backpatch(getattr(stmt, 'nextlist', []), self.ctx.tac.nextquad())
 
                 self.breaklist += getattr(stmt, 'breaklist', [])
                 self.continuelist += getattr(stmt, 'continuelist', [])
@@ -2017,7 +2110,7 @@ class CompoundStmt(Statement):
             else:
                 self.nextlist = getattr(self.stmt_list[-1], 'nextlist', [])
         
-        symtable.pop_scope()
+        self.ctx.symtable.pop_scope()
         # symtable.update_scope_size()
     
     @staticmethod
@@ -2066,14 +2159,14 @@ class SelectionStmt(Statement):
                 self.select_expr.bool = True
 
                 self.select_expr.gen()
-                tac.backpatch(getattr(self.select_expr, 'truelist', []), tac.nextquad())
+                self.ctx.tac.backpatch(getattr(self.select_expr, 'truelist', []), self.ctx.tac.nextquad())
 
                 self.if_stmt.gen()
 
-                self.nextlist = [tac.nextquad()]
-                tac.emit(f'goto ')
+                self.nextlist = [self.ctx.tac.nextquad()]
+                self.ctx.tac.emit_goto()
 
-                tac.backpatch(getattr(self.select_expr, 'falselist', []), tac.nextquad())
+                self.ctx.tac.backpatch(getattr(self.select_expr, 'falselist', []), self.ctx.tac.nextquad())
                 self.else_stmt.gen()
 
                 self.nextlist += getattr(self.if_stmt, 'nextlist', []) + getattr(self.else_stmt, 'nextlist', [])
@@ -2085,7 +2178,7 @@ class SelectionStmt(Statement):
                 self.select_expr.bool = True
 
                 self.select_expr.gen()
-                tac.backpatch(getattr(self.select_expr, 'truelist', []), tac.nextquad())
+                self.ctx.tac.backpatch(getattr(self.select_expr, 'truelist', []), self.ctx.tac.nextquad())
 
                 self.if_stmt.gen()
 
@@ -2095,62 +2188,107 @@ class SelectionStmt(Statement):
                 self.continuelist += getattr(self.if_stmt, 'continuelist', []) + getattr(self.else_stmt, 'continuelist', [])
         # switch
         else:
+            # the statements are generated in the enclosing scope, the one
+            # of the compound statement is only stepped over so that the
+            # scopes nested in it are entered in order
+            self.ctx.symtable.push_scope(exists=True)
+            self.ctx.symtable.pop_scope()
+
             if len(self.stmt_list) == 0:
                 # no statements in switch statement
                 return
             
             self.select_expr.gen()
-            tac.backpatch(getattr(self.select_expr, 'nextlist', []), tac.nextquad())
+            self.ctx.tac.backpatch(getattr(self.select_expr, 'nextlist', []), self.ctx.tac.nextquad())
             
             case_list = []
             case_stmts = self.stmt_list # self.stmt_list is created during check_semantics
             
-            testlist = [tac.nextquad()]
-            tac.emit(f'goto ')
+            testlist = [self.ctx.tac.nextquad()]
+            self.ctx.tac.emit_goto()
 
             case_labels = []
             self.breaklist = []
             self.returnlist = []
 
             for idx, case_stmt in enumerate(case_stmts):
-                
-                if isinstance(case_stmt, LabeledStmt):
-                    # collect start of each case/default
-                    case_labels.append(tac.nextquad())
+
+                # collect start and case of each case/default
+                labels = self.labels_of(case_stmt)
+                case_labels += [self.ctx.tac.nextquad()] * len(labels)
+                case_list += labels
 
                 if idx < len(case_stmts) - 1:
                     case_stmt.gen()
-                    tac.backpatch(getattr(case_stmt, 'nextlist', []), tac.nextquad())
+                    self.ctx.tac.backpatch(getattr(case_stmt, 'nextlist', []), self.ctx.tac.nextquad())
                     
                 else:
                     case_stmt.gen()
-                    self.nextlist = [tac.nextquad()]
-                    tac.emit(f'goto ')
+                    self.nextlist = [self.ctx.tac.nextquad()]
+                    self.ctx.tac.emit_goto()
                     
                 self.breaklist += getattr(case_stmt, 'breaklist', [])
                 self.returnlist += getattr(case_stmt, 'returnlist', [])
+                # continue belongs to the enclosing loop
+                self.continuelist += getattr(case_stmt, 'continuelist', [])
 
-                if isinstance(case_stmt, LabeledStmt):
-                    # collect case of each case/default
-                    case_list.append(case_stmt.case)
-            
-            tac.backpatch(testlist, tac.nextquad())
+            self.ctx.tac.backpatch(testlist, self.ctx.tac.nextquad())
+
+            # without a default the switch is left through the goto closing
+            # the last case
+            cases = {}
+            default = self.nextlist[0]
             for idx, case in enumerate(case_list):
                 if isinstance(case, tuple):
-                    case[1].gen()
-                    tac.backpatch(getattr(case[1], 'nextlist', []), tac.nextquad())
-
-                    tac.emit(f'ifeq {self.select_expr.place} {case[1].place} goto {case_labels[idx]}')
+                    cases.setdefault(parse_int(f'${case[1].const}'), case_labels[idx])
                 else:
-                    tac.emit(f'goto {case_labels[idx]}')
-            
-            tac.backpatch(self.breaklist, tac.nextquad()) # can be shifted to upper productions
+                    default = case_labels[idx]
+            self.gen_dispatch(sorted(cases.items()), default)
+
+            self.ctx.tac.backpatch(self.breaklist, self.ctx.tac.nextquad()) # can be shifted to upper productions
+
+    @staticmethod
+    def labels_of(stmt):
+        """ case / default labels of a statement of a switch, `case 1:
+        case 2: stmt` nests one labeled statement in the other """
+        labels = []
+        while isinstance(stmt, LabeledStmt):
+            labels.append(stmt.case)
+            stmt = stmt.stmt
+        return labels
+
+    def gen_dispatch(self, cases, default):
+        """ jump to the case (cases are sorted (value, quad) pairs) the value
+        of the switch selects, to default if there is none. Dense cases go
+        through a jump table, sparse ones are split by comparing with the
+        middle case """
+        value = self.select_expr.place
+        if len(cases) >= JUMP_TABLE_CASES and cases[-1][0] - cases[0][0] < JUMP_TABLE_SPREAD * len(cases):
+            low, quads = cases[0][0], dict(cases)
+            table = [quads.get(low + pos, default) for pos in range(cases[-1][0] - low + 1)]
+            self.ctx.tac.emit_switch(value, f'${low}', table, default)
+        elif len(cases) > LINEAR_CASES:
+            mid = len(cases) // 2
+            below = self.ctx.tac.newtmp()
+            self.ctx.symtable.add_var(below, VarType(0, 'int'))
+            self.ctx.tac.emit_binop(below, value, 'int<', f'${cases[mid][0]}')
+            jump = self.ctx.tac.nextquad()
+            self.ctx.tac.emit_ifnz(below)
+            self.gen_dispatch(cases[mid:], default)
+            self.ctx.tac.backpatch([jump], self.ctx.tac.nextquad())
+            self.gen_dispatch(cases[:mid], default)
+        else:
+            for case_value, quad in cases:
+                self.ctx.tac.emit_ifeq(value, f'${case_value}', quad)
+            self.ctx.tac.emit_goto(default)
 
     def check_semantics(self):
         if self.select_type == 'switch':
             if not (self.select_expr.expr_type.is_char() or self.select_expr.expr_type.is_int()):
-                parser_error("switch quantity not an integer")
+                self.ctx.error("switch quantity not an integer")
                 return
+            # the cases are compared with the value as an int
+            self.select_expr = CastExpr.get_cast(VarType(0, 'int'), self.select_expr)
 
             self.stmt_list = []
             default_cnt = 0
@@ -2159,17 +2297,17 @@ class SelectionStmt(Statement):
                 first_case = False
                 for stmt in self.if_stmt.stmt_list:
                     
-                    if isinstance(stmt, LabeledStmt):
+                    for case in self.labels_of(stmt):
                         first_case = True
-                        if isinstance(stmt.case, tuple):
+                        if isinstance(case, tuple):
                             # check case statement is labeled with constant
-                            if not (isinstance(stmt.case[1], Const) and (stmt.case[1].expr_type.is_char() or stmt.case[1].expr_type.is_int())):
-                                parser_error(f"Case label is not a constant")
+                            if not (isinstance(case[1], Const) and (case[1].expr_type.is_char() or case[1].expr_type.is_int())):
+                                self.ctx.error(f"Case label is not a constant")
                                 return
                         else:
                             default_cnt += 1
                             if default_cnt > 1:
-                                parser_error(f"multiple default labels in one switch")
+                                self.ctx.error(f"multiple default labels in one switch")
                                 return
 
                     if first_case:
@@ -2178,7 +2316,7 @@ class SelectionStmt(Statement):
                 
             else:
                 # not a compound statement
-                parser_error("Switch statement must have compound statement")
+                self.ctx.error("Switch statement must have compound statement")
 
 class IterStmt(Statement):
     def __init__(self, iter_type, iter_expr, stmt):
@@ -2193,18 +2331,18 @@ class IterStmt(Statement):
         if self.iter_type == 'while':
             
 
-            begin = tac.nextquad()
+            begin = self.ctx.tac.nextquad()
 
             self.iter_expr.bool = True
             
             self.iter_expr.gen()
-            tac.backpatch(getattr(self.iter_expr, 'truelist', []), tac.nextquad())
+            self.ctx.tac.backpatch(getattr(self.iter_expr, 'truelist', []), self.ctx.tac.nextquad())
             self.stmt.gen()
 
             
-            tac.emit(f'goto {begin}')
+            self.ctx.tac.emit_goto(begin)
 
-            tac.backpatch(getattr(self.stmt, 'nextlist', []) + getattr(self.stmt, 'continuelist', []), begin)
+            self.ctx.tac.backpatch(getattr(self.stmt, 'nextlist', []) + getattr(self.stmt, 'continuelist', []), begin)
 
             self.nextlist = getattr(self.iter_expr, 'falselist', []) + getattr(self.stmt, 'breaklist', [])
 
@@ -2213,7 +2351,7 @@ class IterStmt(Statement):
             e1, e2, e3 = self.iter_expr
             if e1:
                 e1.gen()
-                tac.backpatch(getattr(e1, 'nextlist', []), tac.nextquad())
+                self.ctx.tac.backpatch(getattr(e1, 'nextlist', []), self.ctx.tac.nextquad())
 
             
             # if `e3` is None then it is equiv to `while` loop
@@ -2223,26 +2361,28 @@ class IterStmt(Statement):
                 self.gen()
             else:
             
-                begin = tac.nextquad()
+                begin = self.ctx.tac.nextquad()
                 if e2:
                     e2.bool = True
 
                     e2.gen()
-                    tac.backpatch(getattr(e2, 'truelist', []), tac.nextquad())
+                    self.ctx.tac.backpatch(getattr(e2, 'truelist', []), self.ctx.tac.nextquad())
                 self.stmt.gen()
                 
-                tac.backpatch(getattr(self.stmt, 'nextlist', []), tac.nextquad())
+                self.ctx.tac.backpatch(getattr(self.stmt, 'nextlist', []), self.ctx.tac.nextquad())
 
+                # continue goes on with the increment
+                step = self.ctx.tac.nextquad()
                 if e3:
                     e3.gen()
-                    tac.backpatch(getattr(e3, 'nextlist', []), begin)
+                    self.ctx.tac.backpatch(getattr(e3, 'nextlist', []), begin)
 
-                tac.backpatch(getattr(e3, 'continuelist', []) + getattr(self.stmt, 'continuelist', []), begin)
+                self.ctx.tac.backpatch(getattr(e3, 'continuelist', []) + getattr(self.stmt, 'continuelist', []), step)
 
                 self.nextlist = getattr(e3, 'breaklist', []) + getattr(self.stmt, 'breaklist', []) + getattr(e2, 'falselist', [])
 
 
-                tac.emit(f'goto {begin}')
+                self.ctx.tac.emit_goto(begin)
 
         # return list 
         self.returnlist = getattr(self.stmt, 'returnlist', [])
@@ -2254,43 +2394,47 @@ class JumpStmt(Statement):
         self.jump_type = jump_type
         self.expr = expr
         if self.jump_type == 'break':
-            if not symtable.check_break_scope():
-                parser_error('`break` statement not within loop or switch')
+            if not self.ctx.symtable.check_break_scope():
+                self.ctx.error('`break` statement not within loop or switch')
         elif self.jump_type == 'continue':
-            if not symtable.check_continue_scope():
-                parser_error('`continue` statement not within a loop')
+            if not self.ctx.symtable.check_continue_scope():
+                self.ctx.error('`continue` statement not within a loop')
         elif self.jump_type == 'return':
 
-            func_scope = symtable.get_func_scope()
+            func_scope = self.ctx.symtable.get_func_scope()
             if func_scope is not None and func_scope.func is not None:
                 
                 func = func_scope.func
                 if not self.expr.expr_type.castable_to(func.ret_type):
-                    parser_error(f'incompatible types when returning type `{self.expr.expr_type}` but `{func.ret_type}` was expected')
+                    self.ctx.error(f'incompatible types when returning type `{self.expr.expr_type}` but `{func.ret_type}` was expected')
                 else:
                     self.expr = CastExpr.get_cast(func.ret_type, self.expr)
+                if func.ret_type.is_struct_type():
+                    # local struct returned (params are only a copy of the caller's)
+                    info = self.expr.storage() if isinstance(self.expr, Identifier) else None
+                    func.returned.append(None if info is None or info['type'].is_param else info)
             else:
-                parser_error('`return` statement not within a function')
+                self.ctx.error('`return` statement not within a function')
             
     def gen(self):
         if self.jump_type == 'continue':
-            self.continuelist = [tac.nextquad()]
-            tac.emit(f'goto ')
+            self.continuelist = [self.ctx.tac.nextquad()]
+            self.ctx.tac.emit_goto()
         elif self.jump_type == 'break':
-            self.breaklist = [tac.nextquad()]
-            tac.emit(f'goto ')
+            self.breaklist = [self.ctx.tac.nextquad()]
+            self.ctx.tac.emit_goto()
         elif self.jump_type == 'return':
             if self.expr:
                 self.expr.gen()
-                tac.backpatch(getattr(self.expr, 'nextlist', []), tac.nextquad())
+                self.ctx.tac.backpatch(getattr(self.expr, 'nextlist', []), self.ctx.tac.nextquad())
             
             # only generate return stmt when there is expr to return
             if self.expr is not None:
-                tac.emit(f'return {self.expr.place}')
+                self.ctx.tac.emit_return(self.expr.place)
             
-            self.returnlist = [tac.nextquad()]
+            self.returnlist = [self.ctx.tac.nextquad()]
             # in all return stmt, goto the end of function for call seq cleanup
-            tac.emit(f'goto ')
+            self.ctx.tac.emit_goto()
 
 
 # #############################################################################
@@ -2312,7 +2456,7 @@ class Start(Node):
     def gen(self, ):
         for unit in self.units:
             unit.gen()
-            tac.backpatch(getattr(unit, 'nextlist', []), tac.nextquad())
+            self.ctx.tac.backpatch(getattr(unit, 'nextlist', []), self.ctx.tac.nextquad())
 
     @staticmethod
     def _gen_dot(obj):
@@ -2421,15 +2565,30 @@ class FuncDef(Node):
         else:
             self.vartype.arr_offset = self.specifier.arr_offset + self.vartype.arr_offset
         
-        symtable.add_func(Function(self.vartype, self.name, self.param_list, is_declared=True))
+        self.ctx.symtable.add_func(Function(self.vartype, self.name, self.param_list, is_declared=True))
 
     def gen(self):
-        tac.push_func_code()
-        tac.emit(f'FuncBegin {self.name}')
+        self.ctx.func_order.append(self.name)
+        if self.name in self.ctx.reused:
+            # code comes from the cache, only keep scopes and fmt strings in step
+            self.ctx.symtable.skip_scopes(self.ctx.symtable.function[self.name].scope_id)
+            for label, fmt_str in self.ctx.reused[self.name]['fmt']:
+                self.ctx.symtable.add_fmt(label, fmt_str)
+            return
+
+        func = self.ctx.symtable.lookup_func(self.name)
+        if func.returned and all(info is not None and info is func.returned[0] for info in func.returned):
+            # every return gives back the same local, it lives in the caller's
+            # struct (ret@) instead of being copied there on return
+            func.ret_local = func.returned[0]
+            func.ret_local['returned'] = True
+
+        self.ctx.tac.push_func_code(self.name)
+        self.ctx.tac.emit_func_begin(self.name)
         self.stmt.gen()
         self.nextlist = getattr(self.stmt, 'nextlist', [])
-        tac.backpatch(getattr(self.stmt, 'returnlist', []), tac.nextquad())
-        tac.emit(f'FuncEnd {self.name}')
+        self.ctx.tac.backpatch(getattr(self.stmt, 'returnlist', []), self.ctx.tac.nextquad())
+        self.ctx.tac.emit_func_end(self.name)
 
 
     @staticmethod
@@ -0,0 +1,225 @@
+import re
+
+# #############################################################################
+# Instructions
+# #############################################################################
+
+REGS = ('eax', 'ebx', 'ecx', 'edx', 'esi', 'edi', 'esp', 'ebp')
+
+# jcc => jcc taken in the opposite case
+INVERSE_JUMPS = {
+    'je': 'jne', 'jne': 'je',
+    'jl': 'jge', 'jge': 'jl', 'jle': 'jg', 'jg': 'jle',
+    'jb': 'jae', 'jae': 'jb', 'jbe': 'ja', 'ja': 'jbe',
+    'jp': 'jnp', 'jnp': 'jp',
+}
+
+def is_comment(line):
+    return line.lstrip().startswith('//')
+
+def is_label(line):
+    return line.endswith(':')
+
+def split(line):
+    """ mnemonic and operands of an instruction, commas inside a memory
+    operand (`(%ebx , %ecx, 1)`) do not separate operands """
+    mnemonic, _, rest = line.strip().partition(' ')
+    operands, depth, cur = [], 0, ''
+    for c in rest:
+        if c == ',' and depth == 0:
+            operands.append(cur.strip())
+            cur = ''
+            continue
+        depth += (c == '(') - (c == ')')
+        cur += c
+    if cur.strip():
+        operands.append(cur.strip())
+    return mnemonic, operands
+
+def is_reg(operand):
+    return re.fullmatch('%e[a-z]{2}', operand) is not None
+
+def is_mem(operand):
+    return not operand.startswith(('%', '$'))
+
+def regs_in(operand):
+    """ 32 bit registers an operand reads or names (byte registers count as
+    the register they are part of) """
+    regs = set()
+    for name in re.findall('%([a-z]+)', operand):
+        if name in REGS:
+            regs.add(name)
+        elif re.fullmatch('[abcd][lh]', name):
+            regs.add(f'e{name[0]}x')
+    return regs
+
+# instructions writing their last operand only, and the ones leaving
+# every operand alone
+WRITES_LAST = ('mov', 'movl', 'movb', 'movzbl', 'lea', 'add', 'addl', 'sub', 'imul',
+    'and', 'or', 'xor', 'not', 'neg', 'shl', 'shr', 'sar', 'sete', 'setne', 'setl', 'setle',
+    'setg', 'setge', 'seta', 'setae', 'setb', 'setbe', 'setp', 'setnp')
+WRITES_NOTHING = ('cmp', 'test', 'ucomiss')
+
+def written(line):
+    """ registers written by an instruction and whether it writes memory,
+    None if it is not known (calls, jumps, anything else) """
+    mnemonic, operands = split(line)
+    if mnemonic in WRITES_NOTHING:
+        return set(), False
+    if mnemonic in WRITES_LAST and operands:
+        dst = operands[-1]
+        if is_mem(dst):
+            return set(), True
+        return regs_in(dst), False
+    return None
+
+# #############################################################################
+# Rules
+# #############################################################################
+# every rule gets a window of consecutive instructions (comments skipped)
+# and returns the instructions replacing them, None if it does not apply
+
+def self_move(window):
+    mnemonic, ops = split(window[0])
+    if mnemonic == 'mov' and len(ops) == 2 and ops[0] == ops[1] and is_reg(ops[0]):
+        return []
+
+def add_zero_esp(window):
+    # stack cleanup after a call without arguments
+    mnemonic, ops = split(window[0])
+    if mnemonic in ('add', 'addl') and ops == ['$0x0', '%esp']:
+        return []
+
+def cmp_zero(window):
+    mnemonic, ops = split(window[0])
+    if mnemonic == 'cmp' and len(ops) == 2 and ops[0] in ('$0', '$0x0') and is_reg(ops[1]):
+        return [f'test {ops[1]}, {ops[1]}']
+
+def jump_to_next(window):
+    mnemonic, ops = split(window[0])
+    if mnemonic == 'jmp' and is_label(window[1]) and window[1][:-1] == ops[0]:
+        return [window[1]]
+
+def branch_over_jump(window):
+    # jcc L1; jmp L2; L1:  =>  j!cc L2; L1:
+    jcc, ops1 = split(window[0])
+    jmp, ops2 = split(window[1])
+    if (jcc in INVERSE_JUMPS and jmp == 'jmp' and is_label(window[2])
+            and window[2][:-1] == ops1[0]):
+        return [f'{INVERSE_JUMPS[jcc]} {ops2[0]}', window[2]]
+
+def store_reload(window):
+    # mov %r, M; mov M, %s  =>  mov %r, M; mov %r, %s
+    m1, ops1 = split(window[0])
+    m2, ops2 = split(window[1])
+    if (m1 == m2 == 'mov' and len(ops1) == len(ops2) == 2 and is_reg(ops1[0])
+            and is_mem(ops1[1]) and ops2[0] == ops1[1] and is_reg(ops2[1])):
+        if ops2[1] == ops1[0]:
+            return [window[0]]
+        return [window[0], f'mov {ops1[0]}, {ops2[1]}']
+
+def untouched(window, src, dst):
+    """ if the instructions leave src and dst (and the registers addressing
+    them) alone """
+    for line in window:
+        if is_label(line):
+            return False
+        writes = written(line)
+        if writes is None:
+            return False
+        regs, mem = writes
+        if regs & (regs_in(src) | regs_in(dst)) or (mem and is_mem(src)):
+            return False
+    return True
+
+def move_back(window):
+    # mov %r, %s; <not touching them>; mov %s, %r  =>  drop the last one
+    m1, ops1 = split(window[0])
+    m3, ops3 = split(window[-1])
+    if (m1 == m3 == 'mov' and len(ops1) == len(ops3) == 2 and is_reg(ops1[0])
+            and is_reg(ops1[1]) and ops3 == ops1[::-1] and untouched(window[1:-1], *ops1)):
+        return window[:-1]
+
+def repeated_load(window):
+    # mov X, %r; <not touching X or %r>; mov X, %r  =>  drop the last one
+    m1, ops1 = split(window[0])
+    m3, ops3 = split(window[-1])
+    if not (m1 == m3 == 'mov' and ops1 == ops3 and len(ops1) == 2 and is_reg(ops1[1])):
+        return None
+    src, dst = ops1
+    if regs_in(dst) & regs_in(src):
+        # the load changes its own address
+        return None
+    if untouched(window[1:-1], src, dst):
+        return window[:-1]
+
+# name => (window size, rule), applied in this order
+RULES = {
+    'self_move': (1, self_move),
+    'add_zero_esp': (1, add_zero_esp),
+    'cmp_zero': (1, cmp_zero),
+    'jump_to_next': (2, jump_to_next),
+    'branch_over_jump': (3, branch_over_jump),
+    'store_reload': (2, store_reload),
+    'move_back_2': (2, move_back),
+    'move_back_3': (3, move_back),
+    'repeated_load_2': (2, repeated_load),
+    'repeated_load_3': (3, repeated_load),
+}
+
+# #############################################################################
+# Optimizer
+# #############################################################################
+
+class Peephole:
+    """ window based rewriting of the generated assembly.
+
+    The rules (by default all of RULES) are tried at every instruction till
+    none applies anymore, comments in between are kept but never break a
+    window. `hits` counts the rewrites done by each rule. """
+
+    def __init__(self, rules=None, max_passes=8):
+        self.rules = RULES if rules is None else {name: RULES[name] for name in rules}
+        self.max_passes = max_passes
+        self.hits = {name: 0 for name in self.rules}
+
+    def run(self, lines):
+        for _ in range(self.max_passes):
+            lines, changed = self.run_pass(lines)
+            if not changed:
+                break
+        return lines
+
+    def run_pass(self, lines):
+        code = [idx for idx, line in enumerate(lines) if not is_comment(line)]
+        out = lines[:code[0] if code else len(lines)]
+        changed = False
+        pos = 0
+        while pos < len(code):
+            for name, (size, rule) in self.rules.items():
+                window = [lines[idx] for idx in code[pos:pos + size]]
+                if len(window) < size:
+                    continue
+                new = rule(window)
+                if new is None:
+                    continue
+                self.hits[name] += 1
+                changed = True
+                # comments inside the window go first
+                out.extend(lines[idx] for idx in range(code[pos], code[pos + size - 1]) if is_comment(lines[idx]))
+                out.extend(new)
+                end = code[pos + size - 1]
+                pos += size
+                break
+            else:
+                end = code[pos]
+                out.append(lines[end])
+                pos += 1
+            # comments up to the next instruction
+            stop = code[pos] if pos < len(code) else len(lines)
+            out.extend(lines[end + 1:stop])
+        return out, changed
+
+    def report(self):
+        """ hit counters as assembly comments """
+        return [f'\n // peephole {name}: {count}' for name, count in self.hits.items()]
@@ -0,0 +1,73 @@
+import os, copy, pickle, tempfile
+from context import CompilerContext
+from codegen import AssemblyGen
+from optimizer import optimize
+from lib import stdlib
+from cache import compiler_hash
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+PRELUDE_FILE = os.path.join(SRC_DIR, 'prelude.pickle')
+
+class Prelude:
+    """ the stdlib prelude (`lib.stdlib`) compiled once: signatures of the
+    functions it declares or defines, the IR of the helpers it defines and
+    their assembly, ready to be loaded into every CompilerContext """
+
+    def __init__(self, functions, func_code, data, text):
+        self.functions = functions  # name -> Function
+        self.func_code = func_code  # IR of the defined helpers
+        self.data = data            # .data section (fmt strings)
+        self.text = text            # .text section (helper bodies)
+
+    def load(self, ctx):
+        with ctx.activate():
+            ctx.symtable.function.update(copy.deepcopy(self.functions))
+
+def build_prelude():
+    ctx = CompilerContext('<stdlib>')
+    syntax_tree = ctx.parse(stdlib)
+    if syntax_tree is None or ctx.compilation_err:
+        raise Exception('stdlib prelude failed to compile')
+    ctx.gen(syntax_tree)
+    # always built at the default level, whatever level the input asks for
+    optimize(ctx)
+
+    asm = AssemblyGen(ctx, opt=1)
+    asm.gen_data()
+    data, asm.assembly = asm.assembly, []
+    asm.gen_functions()
+
+    return Prelude(ctx.symtable.function, ctx.tac.func_code, data, asm.assembly)
+
+_prelude = None
+
+def load_prelude():
+    """ prelude from the on disk cache (built and stored on first use) """
+    global _prelude
+    if _prelude is not None:
+        return _prelude
+
+    key = compiler_hash()
+    try:
+        with open(PRELUDE_FILE, 'rb') as f:
+            cached_key, prelude = pickle.load(f)
+        if cached_key == key:
+            _prelude = prelude
+            return _prelude
+    except Exception:
+        pass
+
+    _prelude = build_prelude()
+    try:
+        fd, tmp = tempfile.mkstemp(dir=SRC_DIR)
+    except OSError:
+        # read only installation, keep the prelude for this process only
+        return _prelude
+    with os.fdopen(fd, 'wb') as f:
+        pickle.dump((key, _prelude), f)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, PRELUDE_FILE)
+    return _prelude
+
+if __name__ == "__main__":
+    load_prelude()
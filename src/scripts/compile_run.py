@@ -3,10 +3,9 @@
 import sys, argparse, pydot
 from argparse import ArgumentParser
 # from parser import parser, lexer, symtable
-from parser import parser, lexer
-from helper import symtable, tac
+from context import CompilerContext
 from codegen import AssemblyGen
-from lib import stdlib
+from prelude import load_prelude
 import os
 
 
@@ -53,24 +52,23 @@ if __name__ == "__main__":
         arg_file = f.read()
     
     
-    ifile = stdlib + arg_file
-    lexer.filename = args.input 
-    lexer.lines = ifile.split("\n")
+    ifile = arg_file
+    ctx = CompilerContext(args.input, prelude=load_prelude())
 
-    syntax_tree = parser.parse(ifile)
+    syntax_tree = ctx.parse(ifile)
 
-    if syntax_tree is None or parser.compilation_err:
+    if syntax_tree is None or ctx.compilation_err:
         exit(1)
         
     graph = pydot.Dot('gcc_lite: Abstract Syntax Tree', graph_type='digraph')
-    syntax_tree.gen()
+    ctx.gen(syntax_tree)
     if syntax_tree is None:
         exit(-1)
-    symtable.dump_csv(args.out.split('.')[-2] + '.csv')
+    ctx.symtable.dump_csv(args.out.split('.')[-2] + '.csv')
 
-    tac.dump_code(args.out.split('.')[-2] + '.out')
+    ctx.tac.dump_code(args.out.split('.')[-2] + '.out')
 
-    asm = AssemblyGen(tac.func_code)
+    asm = AssemblyGen(ctx)
     asm.gen_assembly()
     asm.dump_code(args.out.split('.')[-2] + '.s')
 
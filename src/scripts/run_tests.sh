@@ -0,0 +1,40 @@
+#! /bin/bash
+
+# compiles every tests/optimizer/*.c with and without the optimizations
+# (and with --sse) and compares what it prints with the .out next to it
+
+package=$0
+root="`dirname $(realpath $0)`/../.."
+compiler="$root/bin/gcc_lite"
+tmpdir=$(mktemp -d)
+trap "rm -rf $tmpdir" EXIT
+
+if [ "$#" -eq 0 ]; then
+  set -- $root/tests/optimizer/*.c
+fi
+
+failed=0
+for src in "$@"; do
+  name=`basename $src .c`
+  for flags in "-O0" "-O1" "-O1 --sse"; do
+    exe="$tmpdir/$name"
+    if ! $compiler --no-server --no-cache $flags -o $exe $src > $tmpdir/log 2>&1; then
+      echo "FAIL $name ($flags): compilation failed"
+      cat $tmpdir/log
+      failed=$((failed+1))
+      continue
+    fi
+    timeout 10 $exe < /dev/null > $tmpdir/out 2>&1
+    if ! diff -q $tmpdir/out "${src%.c}.out" > /dev/null; then
+      echo "FAIL $name ($flags)"
+      diff $tmpdir/out "${src%.c}.out"
+      failed=$((failed+1))
+    fi
+  done
+done
+
+if [ "$failed" -ne 0 ]; then
+  echo "$package: $failed failed"
+  exit 1
+fi
+echo "$package: all passed"
@@ -0,0 +1,67 @@
+import os, io, json
+import socketserver
+from argparse import Namespace
+from contextlib import redirect_stdout
+from driver import compile_files
+
+
+class CompileHandler(socketserver.StreamRequestHandler):
+    """ one compile request per connection.
+
+    request  : {"cwd": <client working dir>, "args": <parsed cli arguments>}
+    response : {"status": <exit status>, "output": <compiler diagnostics>}
+    """
+
+    def handle(self):
+        try:
+            req = json.loads(self.rfile.readline())
+        except ValueError:
+            return
+
+        if req.get('cmd') == 'shutdown':
+            self.server.stop = True
+            self.reply(0, '')
+            return
+
+        out = io.StringIO()
+        try:
+            os.chdir(req['cwd'])
+            with redirect_stdout(out):
+                status = compile_files(Namespace(**req['args']))
+        except Exception as e:
+            out.write(f'gcc_lite server: {e!r}\n')
+            status = 1
+        self.reply(status, out.getvalue())
+
+    def reply(self, status, output):
+        self.wfile.write(json.dumps({'status': status, 'output': output}).encode() + b'\n')
+
+class CompileServer(socketserver.UnixStreamServer):
+    """ keeps a warm compiler (imported modules, loaded PLY tables) resident
+    and serves compile requests from `gcc_lite` clients.
+
+    Requests are handled one at a time since each of them changes the
+    working directory and redirects stdout of the whole process. """
+
+    def __init__(self, sock_path):
+        self.stop = False
+        self.sock_path = sock_path
+        if os.path.exists(sock_path):
+            os.unlink(sock_path)
+        super().__init__(sock_path, CompileHandler)
+
+    def serve(self):
+        try:
+            while not self.stop:
+                self.handle_request()
+        finally:
+            self.server_close()
+            os.unlink(self.sock_path)
+
+def serve(sock_path):
+    server = CompileServer(sock_path)
+    print(f'gcc_lite: serving on {sock_path}')
+    try:
+        server.serve()
+    except KeyboardInterrupt:
+        pass
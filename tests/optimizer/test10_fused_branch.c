@@ -0,0 +1,58 @@
+// int comparisons feeding branches directly or kept as values: every
+// relational operator, constants on either side, short circuits, chars
+// and pointers
+int classify(int a, int b){
+    int r;
+    r = 0;
+    if(a == b) r = r + 1;
+    if(a != b) r = r + 2;
+    if(a < b) r = r + 4;
+    if(a <= b) r = r + 8;
+    if(a > b) r = r + 16;
+    if(a >= b) r = r + 32;
+    if(3 < a) r = r + 64;
+    if(a >= -2) r = r + 128;
+    return r;
+}
+
+void main(){
+    int i; int j; int n; int lt; int both;
+    int arr[5];
+    int *p; int *q;
+    char c;
+
+    printf("%d %d %d %d\n", classify(1, 2), classify(2, 1), classify(5, 5), classify(-3, -7));
+
+    n = 0;
+    for(i = 10; i > -10; i = i - 3)
+        if(i % 2 == 0 && i != 4 || i == -5)
+            n = n + i;
+    printf("%d\n", n);
+
+    n = 0; i = 0; j = 20;
+    while(i < j && !(i * i >= 50)){
+        i++;
+        j--;
+        n = n + (i < 5) + (j >= 15) * 10;
+    }
+    printf("%d %d %d\n", n, i, j);
+
+    lt = 3 < 4;
+    both = (lt == 1) + (lt != 0) * 2 + (-1 < 0) * 4 + (7 <= 6) * 8;
+    printf("%d %d\n", lt, both);
+
+    n = 0;
+    for(c = 'a'; c <= 'z'; c = c + 1)
+        if(c > 'm' || c == 'c')
+            n++;
+    printf("%d\n", n);
+
+    p = &arr[1];
+    q = &arr[3];
+    n = 0;
+    while(p < q){
+        n++;
+        p = p + 1;
+    }
+    printf("%d %d %d\n", n, q - p == 0, p - q != 0);
+}
@@ -0,0 +1,19 @@
+// float comparisons, their results held in registers and fused with branches
+int cmpf(float a, float b){
+    int r = 0;
+    if(a == b) r = r + 16;
+    if(a != b) r = r + 32;
+    if(a < b) r = r + 1;
+    if(a <= b) r = r + 2;
+    if(a > b) r = r + 4;
+    if(a >= b) r = r + 8;
+    return r;
+}
+void main(){
+    float x; float y;
+    int eq; int ne; int lt;
+    x = 1.5; y = 2.5;
+    eq = x == y; ne = x != y; lt = x < y;
+    printf("%d %d %d\n", cmpf(x, y), cmpf(y, x), cmpf(x, x));
+    printf("%d %d %d\n", eq, ne, lt);
+}
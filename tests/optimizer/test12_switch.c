@@ -0,0 +1,101 @@
+// switch lowered to a jump table (dense cases) or a compare tree (sparse
+// cases, not in order): values out of range on either side, negative
+// values, no default, fall through, continue and nested switches
+int dense(int x){
+    int r;
+    r = 0;
+    switch(x){
+        case 0: r = 10; break;
+        case 1: r = 11; break;
+        case 2: r = 12;
+        case 3: r = r + 13; break;
+        case 4: r = 14; break;
+        case 5: r = 15; break;
+        case 6: r = 16; break;
+        case 7: r = 17; break;
+        default: r = -1;
+    }
+    return r;
+}
+
+int sparse(int x){
+    switch(x){
+        case 1: return 1;
+        case 7: return 2;
+        case 3: return 3;
+        case 64: return 4;
+        case 100: return 5;
+        case 4096: return 6;
+        case 99999: return 7;
+    }
+    return 0;
+}
+
+int shifted(int x){
+    int r;
+    r = 100;
+    switch(x){
+        case 107: r = r + 1;
+        case 108: r = r + 2;
+        case 109: r = r + 4; break;
+        case 110: r = r + 8;
+        case 111: r = r + 16; break;
+        case 112: r = r + 32; break;
+    }
+    return r;
+}
+
+void main(){
+    int i; int s;
+    char c;
+
+    for(i = -2; i < 10; i++)
+        printf("%d ", dense(i));
+    printf("\n");
+
+    s = 0;
+    for(i = -1001; i <= 100000; i++)
+        s = s + sparse(i) * (i % 7 + 8);
+    printf("%d %d %d\n", s, sparse(4095), sparse(-7));
+
+    for(i = 105; i < 114; i++)
+        printf("%d ", shifted(i));
+    printf("%d ", shifted(-1));
+    printf("\n");
+
+    s = 0;
+    for(i = 0; i < 20; i++){
+        switch(i % 5){
+            case 0:
+                continue;
+            case 1:
+                switch(i / 5){
+                    case 0: s = s + 1; break;
+                    case 1: s = s + 10; break;
+                    default: s = s + 100;
+                }
+                break;
+            case 3:
+                s = s + 1000;
+            default:
+                s = s + 10000;
+        }
+        s = s + 100000;
+    }
+    printf("%d\n", s);
+
+    s = 0;
+    for(c = 'a'; c <= 'h'; c = c + 1){
+        switch(c){
+            case 'a': case 'e':
+                s = s * 2 + 1;
+                break;
+            case 'b': case 'c': case 'd': case 'f': case 'g':
+                s = s * 2;
+                break;
+            default:
+                s = s + 1000;
+        }
+    }
+    printf("%d\n", s);
+}
@@ -0,0 +1,64 @@
+// locals of blocks nested in a switch or in loops get slots of their own
+int sum(int a, int b){
+    if(a == b) return a*2;
+    else return a+b;
+}
+void main(){
+    int a = 3;
+    int b = 2;
+    int c = 99;
+    int k;
+
+    switch(a)
+    {
+        case 1:
+            a = 0;
+        case 3:
+            if(b == 2){
+                int x = 10;
+                while(x > 1)
+                {
+                    x--;
+                    for(a = 0; a < 5; a++){
+                        int l = sum(x, a);
+                        c = c + l;
+                    }
+                }
+                a = x*a;
+            }
+        default:
+            a--;
+            break;
+    }
+    printf("%d %d %d\n", a, b, c);
+
+    for(k = 0; k < 3; k++){
+        switch(k){
+            case 0: {
+                int y = 5;
+                b = b + y;
+                break;
+            }
+            case 1: {
+                int y = 7;
+                int z = 1;
+                b = b * y + z;
+                break;
+            }
+            default:
+                b--;
+        }
+    }
+    printf("%d\n", b);
+
+    a = 1;
+    while(a < 3){
+        int w = 7;
+        for(b = 0; b < 2; b++){
+            int f = 100;
+            w = w + f;
+        }
+        printf("%d %d %d\n", a, b, w);
+        a++;
+    }
+}
@@ -0,0 +1,187 @@
+// struct copies for assignment, arguments and returned values: small and
+// large structs, sizes not a multiple of 4, callees changing their copy,
+// results written in place even when the destination is an argument, and
+// returned locals built in place but only in a destination the callee cannot
+// reach
+struct small {
+    int a;
+};
+
+struct pair {
+    int x;
+    int y;
+};
+
+struct odd {
+    char c[7];
+};
+
+struct big {
+    int v[20];
+    struct pair p;
+};
+
+struct pair make(int x, int y){
+    struct pair r;
+    r.x = x;
+    r.y = y;
+    return r;
+}
+
+struct pair swap(struct pair p){
+    struct pair r;
+    r.x = p.y;
+    r.y = p.x;
+    return r;
+}
+
+struct pair step(struct pair p){
+    p.x = p.x + p.y;
+    p.y = p.x * 2;
+    return p;
+}
+
+int total(struct big b){
+    int i; int s;
+    s = 0;
+    for(i = 0; i < 20; i++){
+        s = s + b.v[i];
+        b.v[i] = 0;
+    }
+    return s + b.p.x + b.p.y;
+}
+
+struct big scaled(struct big b, int k){
+    int i;
+    for(i = 0; i < 20; i++)
+        b.v[i] = b.v[i] * k;
+    b.p = swap(b.p);
+    return b;
+}
+
+struct small inc(struct small s){
+    s.a = s.a + 1;
+    return s;
+}
+
+struct pair g;
+struct pair *seen;
+
+struct pair from_global(int v){
+    struct pair r;
+    r.x = v;
+    r.y = g.x;
+    return r;
+}
+
+struct pair through(int v){
+    struct pair r;
+    r.x = v;
+    r.y = seen->x;
+    return r;
+}
+
+struct pair either(int c){
+    struct pair r = {1, 2};
+    if(c){
+        r.x = 10;
+        return r;
+    }
+    r.y = 20;
+    return r;
+}
+
+struct pair two(int c){
+    struct pair a; struct pair b;
+    a.x = 1; a.y = 2;
+    b.x = 3; b.y = 4;
+    if(c)
+        return a;
+    return b;
+}
+
+struct pair inner(int c){
+    struct pair r;
+    {
+        struct pair r;
+        r.x = 7;
+        r.y = 8;
+        if(c)
+            return r;
+    }
+    r.x = c;
+    r.y = c;
+    return r;
+}
+
+void main(){
+    struct pair p; struct pair q;
+    struct pair arr[3];
+    struct odd o; struct odd o2;
+    struct big b; struct big c;
+    struct small s;
+    struct pair e; struct pair arr2[2];
+    int i;
+
+    p = make(3, 4);
+    q = p;
+    p.x = 30;
+    printf("%d %d %d %d\n", p.x, p.y, q.x, q.y);
+
+    p = swap(p);
+    q = step(q);
+    q = step(q);
+    printf("%d %d %d %d\n", p.x, p.y, q.x, q.y);
+
+    arr[0] = make(1, 2);
+    arr[1] = swap(arr[0]);
+    arr[2] = arr[1];
+    arr[1].x = 9;
+    printf("%d %d %d %d %d %d\n", arr[0].x, arr[0].y, arr[1].x, arr[1].y, arr[2].x, arr[2].y);
+
+    for(i = 0; i < 6; i++)
+        o.c[i] = 'a' + i;
+    o.c[6] = 0;
+    o2 = o;
+    o.c[0] = 'X';
+    printf("%s %s\n", o.c, o2.c);
+
+    for(i = 0; i < 20; i++)
+        b.v[i] = i;
+    b.p = make(100, 200);
+    printf("%d %d\n", total(b), b.v[19]);
+
+    c = scaled(b, 3);
+    b = scaled(b, 2);
+    printf("%d %d %d %d %d\n", c.v[19], c.p.x, b.v[19], b.p.y, total(c));
+
+    s.a = 1;
+    s = inc(inc(s));
+    printf("%d\n", s.a);
+
+    g.x = 5; g.y = 6;
+    g = from_global(1);
+    printf("%d %d\n", g.x, g.y);
+
+    e.x = 40; e.y = 41;
+    seen = &e;
+    e = through(2);
+    printf("%d %d\n", e.x, e.y);
+
+    arr2[0].x = 50;
+    seen = arr2;
+    arr2[0] = through(3);
+    printf("%d %d\n", arr2[0].x, arr2[0].y);
+
+    p = either(1);
+    q = either(0);
+    printf("%d %d %d %d\n", p.x, p.y, q.x, q.y);
+
+    p = two(1);
+    q = two(0);
+    printf("%d %d %d %d\n", p.x, p.y, q.x, q.y);
+
+    p = inner(1);
+    q = inner(0);
+    printf("%d %d %d %d\n", p.x, p.y, q.x, q.y);
+}
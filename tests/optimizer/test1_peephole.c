@@ -0,0 +1,47 @@
+// assembly the peephole rules rewrite: reloads after stores, loads
+// repeated across stores through pointers, zero argument calls and
+// jumps to the next label
+int counter;
+
+int next(){
+    counter = counter + 1;
+    return counter;
+}
+
+void main(){
+    int a; int b; int i;
+    int *p; int arr[4];
+
+    a = 5; p = &a;
+    b = a;
+    *p = 7;
+    b = b + a;
+    printf("%d %d\n", a, b);
+
+    counter = 0;
+    a = next();
+    b = next();
+    printf("%d %d %d\n", a, b, next());
+
+    arr[0] = 1; arr[1] = 2; arr[2] = 3; arr[3] = 4;
+    p = arr;
+    a = arr[1];
+    p[1] = 20;
+    b = arr[1];
+    printf("%d %d\n", a, b);
+
+    a = 0;
+    for(i = 0; i < 10; i++){
+        if(i != 0){
+            if(a == 0)
+                a = i;
+            else
+                a = a + i;
+        }
+    }
+    b = 0;
+    while(b != 0){
+        b--;
+    }
+    printf("%d %d\n", a, b);
+}
@@ -0,0 +1,38 @@
+// multiplications, divisions and remainders by constants, negative
+// dividends and divisors included, and pointer differences
+struct pair {
+    int a;
+    int b;
+    int c;
+};
+
+void main(){
+    int i; int x; int s;
+    int arr[10];
+    struct pair pairs[5];
+    int *p; int *q;
+    struct pair *r;
+
+    for(i = -9; i <= 9; i = i + 3){
+        x = i * 7 - 1;
+        printf("%d: %d %d %d %d %d %d %d %d\n", x, x*0, x*1, x*2, x*3, x*5, x*9, x*10, x*-4);
+        printf("  %d %d %d %d %d %d\n", x/1, x/2, x/4, x/8, x/3, x/7);
+        printf("  %d %d %d %d %d %d\n", x%2, x%4, x%8, x%3, x%7, x%10);
+        printf("  %d %d %d %d %d %d\n", x/-1, x/-2, x/-8, x/-3, x/-7, x/-10);
+        printf("  %d %d %d %d %d\n", x%-1, x%-2, x%-8, x%-3, x%-7);
+    }
+
+    s = 0;
+    for(i = 0; i < 1000; i++){
+        s = s + i*13 % 64 + i/9;
+    }
+    x = 1 << 30;
+    printf("%d %d %d %d\n", s, x/3, x/-5, -x/6);
+
+    for(i = 0; i < 10; i++)
+        arr[i] = i*i;
+    p = &arr[2];
+    q = &arr[9];
+    r = &pairs[1];
+    printf("%d %d %d %d\n", q - p, p - q, *q - *p, &pairs[4] - r);
+}
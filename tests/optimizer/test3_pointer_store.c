@@ -0,0 +1,24 @@
+// stores of constants through pointers while every register is taken
+void main(){
+    int x; int *p; int y;
+    int a; int b; int c; int d; int e;
+    int *p1; int *p2; int *p3; int *p4; int *p5;
+    char str[2]; char *q1; char *q2;
+    int i; int s;
+
+    x = 3; p = &x;
+    y = *p + 1;
+    *p = 10;
+    y = y + *p + 1;
+    printf("%d %d\n", x, y);
+
+    p1 = &a; p2 = &b; p3 = &c; p4 = &d; p5 = &e;
+    q1 = str; q2 = str + 1;
+    s = 0;
+    for(i = 0; i < 10; i++){
+        *p1 = 1; *p2 = 2; *p3 = 3; *p4 = 4; *p5 = 5;
+        *q1 = 'a'; *q2 = 'z';
+        s = s + a*b + c*d + e + i*i + (str[1] - str[0]);
+    }
+    printf("%d %d %d %c%c\n", s + a + b, d + c*2, e*10, str[0], str[1]);
+}
@@ -0,0 +1,65 @@
+// array subscripts and struct fields folded into the addressing mode of
+// loads and stores: int and char elements, several dimensions, arrays
+// of structs and fields reached through pointers
+struct point {
+    int x;
+    char tag;
+    int y;
+};
+
+struct box {
+    int id;
+    struct point corner[2];
+};
+
+int grid[3][4][5];
+char text[4][8];
+struct box boxes[3];
+
+void main(){
+    int i; int j; int k; int s;
+    struct box *b;
+    struct point *pt;
+    int *row;
+    char *c;
+
+    for(i = 0; i < 3; i++)
+        for(j = 0; j < 4; j++)
+            for(k = 0; k < 5; k++)
+                grid[i][j][k] = i*100 + j*10 + k;
+    s = 0;
+    for(i = 0; i < 3; i++)
+        for(j = 0; j < 4; j++)
+            s = s + grid[i][j][4 - j] - grid[2 - i][j][j];
+    printf("%d %d %d\n", s, grid[2][3][4], grid[1][0][2]);
+
+    for(i = 0; i < 4; i++){
+        for(j = 0; j < 7; j++)
+            text[i][j] = 'a' + i + j;
+        text[i][7] = 0;
+    }
+    c = text[2];
+    c[3] = 'Z';
+    printf("%s %s %c%c\n", text[0], text[2], text[3][6], c[1]);
+
+    for(i = 0; i < 3; i++){
+        b = &boxes[i];
+        b->id = i + 1;
+        for(j = 0; j < 2; j++){
+            b->corner[j].x = i*10 + j;
+            b->corner[j].tag = 'p' + j;
+            b->corner[j].y = -(i*10 + j);
+        }
+    }
+    s = 0;
+    for(i = 0; i < 3; i++){
+        pt = &boxes[i].corner[1];
+        s = s + boxes[i].id * (pt->x - boxes[i].corner[0].y);
+    }
+    printf("%d %c %d\n", s, boxes[2].corner[1].tag, boxes[1].corner[0].x);
+
+    row = grid[1][2];
+    for(i = 0; i < 5; i++)
+        row[i] = row[i] * 2;
+    printf("%d %d\n", grid[1][2][4], grid[1][3][0]);
+}
@@ -0,0 +1,63 @@
+// loop invariant arithmetic and addresses, and values that only look
+// invariant: changed through a pointer, by a call, or guarded by a test
+int scale;
+
+void bump(){
+    scale = scale + 1;
+}
+
+void main(){
+    int a[4][4]; int b[4][4]; int c[4][4];
+    int i; int j; int k; int n; int d; int s; int x;
+    int *p;
+
+    for(i = 0; i < 4; i++)
+        for(j = 0; j < 4; j++){
+            a[i][j] = i + j;
+            b[i][j] = i - j;
+        }
+    n = 4;
+    for(i = 0; i < n; i++)
+        for(j = 0; j < n; j++){
+            c[i][j] = 0;
+            for(k = 0; k < n; k++)
+                c[i][j] = c[i][j] + a[i][k] * b[k][j];
+        }
+    printf("%d %d %d\n", c[0][0], c[3][1], c[2][3]);
+
+    x = 3; p = &x; s = 0;
+    for(i = 0; i < 5; i++){
+        s = s + x * 10;
+        *p = *p + 1;
+    }
+    printf("%d %d\n", s, x);
+
+    scale = 2; s = 0;
+    for(i = 0; i < 5; i++){
+        s = s + scale * 3;
+        bump();
+    }
+    printf("%d %d\n", s, scale);
+
+    d = 0; s = 0;
+    for(i = 0; i < 5; i++){
+        if(d != 0)
+            s = s + 100 / d;
+        s = s + n * n;
+    }
+    printf("%d\n", s);
+
+    s = 7;
+    i = 10;
+    while(i < 5){
+        s = n / d;
+        i++;
+    }
+    k = 0;
+    for(i = 0; i < 3; i++){
+        x = n * 2 + 1;
+        k = k + x;
+        n = 1;
+    }
+    printf("%d %d %d\n", s, k, x);
+}
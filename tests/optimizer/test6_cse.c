@@ -0,0 +1,58 @@
+// repeated expressions and subscripts, across stores through pointers,
+// stores to other elements of the same array, calls and branches
+int g;
+
+int setg(int v){
+    g = v;
+    return v;
+}
+
+void main(){
+    int a[5][5];
+    int i; int j; int x; int y; int z;
+    int *p; int *q;
+
+    for(i = 0; i < 5; i++)
+        for(j = 0; j < 5; j++)
+            a[i][j] = i * 5 + j;
+
+    i = 2; j = 3; x = 4;
+    a[i][j] = a[i][j] + x;
+    a[j][i] = a[i][j] * 2 + a[j][i];
+    printf("%d %d\n", a[2][3], a[3][2]);
+
+    x = i * j + 1;
+    y = i * j + 1;
+    i = i + 1;
+    z = i * j + 1;
+    printf("%d %d %d\n", x, y, z);
+
+    p = &a[1][1];
+    q = &a[1][1];
+    x = a[1][1] + 1;
+    *p = 100;
+    y = a[1][1] + 1;
+    *q = *q + 1;
+    z = *p + a[1][1];
+    printf("%d %d %d\n", x, y, z);
+
+    p = a[4];
+    x = p[2] * 3;
+    a[4][2] = 0;
+    y = p[2] * 3;
+    printf("%d %d\n", x, y);
+
+    g = 5;
+    x = g * g;
+    setg(6);
+    y = g * g;
+    printf("%d %d\n", x, y);
+
+    x = 0;
+    if(i > 2)
+        x = j * 7;
+    y = j * 7;
+    j = j + 1;
+    z = j * 7;
+    printf("%d %d %d\n", x, y, z);
+}
@@ -0,0 +1,85 @@
+// small and single call functions inlined into their callers: several
+// returns, float and char parameters, pointer parameters, locals named
+// like the caller's, helpers of the prelude, and recursion left alone
+int sq(int x){
+    return x * x;
+}
+
+int clamp(int x, int lo, int hi){
+    if(x < lo)
+        return lo;
+    if(x > hi)
+        return hi;
+    return x;
+}
+
+float mix(float a, float b, float t){
+    return a + (b - a) * t;
+}
+
+int upper(char c){
+    if(c >= 'a' && c <= 'z')
+        return c - 'a' + 'A';
+    return c;
+}
+
+void swap(int *a, int *b){
+    int t;
+    t = *a;
+    *a = *b;
+    *b = t;
+}
+
+int sum_sq(int n){
+    int i; int s;
+    s = 0;
+    for(i = 1; i <= n; i++)
+        s = s + sq(i);
+    return s;
+}
+
+int fact(int n){
+    if(n <= 1)
+        return 1;
+    return n * fact(n - 1);
+}
+
+int is_odd(int n);
+
+int is_even(int n){
+    if(n == 0)
+        return 1;
+    return is_odd(n - 1);
+}
+
+int is_odd(int n){
+    if(n == 0)
+        return 0;
+    return is_even(n - 1);
+}
+
+void main(){
+    int i; int t; int x; int y;
+    float f;
+
+    t = 0;
+    for(i = -3; i < 12; i++)
+        t = t + clamp(i, 0, 8) * sq(i);
+    printf("%d %d\n", t, sum_sq(10));
+
+    f = mix(1.0, 3.0, 0.25);
+    printf("%f %f\n", f, mix(f, 10.0, 0.5));
+
+    printf("%c%c%c\n", upper('g'), upper('Q'), upper('!'));
+
+    x = 4; y = 9;
+    swap(&x, &y);
+    t = 1;
+    swap(&t, &x);
+    printf("%d %d %d\n", x, y, t);
+
+    prints("fact ");
+    printn(fact(6));
+    prints("\n");
+    printf("%d %d %d\n", is_even(10), is_odd(7), is_even(3));
+}
@@ -0,0 +1,74 @@
+// self tail recursion turned into a loop and calls whose result is
+// returned right away turned into jumps: swapped and reused parameters,
+// callees taking fewer or more arguments, and calls not in tail position
+int sum_to(int n, int acc){
+    if(n == 0)
+        return acc;
+    return sum_to(n - 1, acc + n);
+}
+
+int gcd(int a, int b){
+    if(b == 0)
+        return a;
+    return gcd(b, a % b);
+}
+
+int rotate(int a, int b, int c, int n){
+    if(n == 0)
+        return a * 100 + b * 10 + c;
+    return rotate(c, a, b, n - 1);
+}
+
+float halve(float x, int n){
+    if(n == 0)
+        return x;
+    return halve(x / 2.0, n - 1);
+}
+
+int ping(int n, int acc);
+
+int pong(int n){
+    if(n <= 0)
+        return -1;
+    return ping(n - 1, n);
+}
+
+int ping(int n, int acc){
+    if(n <= 0)
+        return acc;
+    if(n % 2 == 0)
+        return pong(n - 1) + acc;
+    return ping(n - 1, acc + 1);
+}
+
+int three(int a, int b, int c){
+    return a - b + c;
+}
+
+int one(int a){
+    return three(a, a + 1, a * 2);
+}
+
+int ackermann(int m, int n){
+    if(m == 0)
+        return n + 1;
+    if(n == 0)
+        return ackermann(m - 1, 1);
+    return ackermann(m - 1, ackermann(m, n - 1));
+}
+
+int count(int n){
+    if(n == 0)
+        return 0;
+    return 1 + count(n - 1);
+}
+
+void main(){
+    printf("%d %d\n", sum_to(20000, 0), sum_to(0, 5));
+    printf("%d %d\n", gcd(1071, 462), gcd(17, 5));
+    printf("%d %d\n", rotate(1, 2, 3, 4), rotate(1, 2, 3, 20000));
+    printf("%f\n", halve(96.0, 5));
+    printf("%d %d %d\n", ping(10, 0), ping(5, 3), pong(0));
+    printf("%d %d\n", one(5), ackermann(2, 3));
+    printf("%d\n", count(1000));
+}
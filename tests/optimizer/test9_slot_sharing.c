@@ -0,0 +1,84 @@
+// locals and temporaries of disjoint blocks sharing stack slots: arrays,
+// structs, variables whose address is taken, blocks nested in loops,
+// and values live across the blocks and calls in between
+struct vec {
+    int x;
+    int y;
+    int z;
+};
+
+int depth(int n){
+    int local[3];
+    int r;
+    local[0] = n; local[1] = n * 2; local[2] = n * 3;
+    if(n == 0)
+        return 0;
+    r = depth(n - 1);
+    return r + local[0] + local[1] + local[2];
+}
+
+void fill(int *p, int n, int v){
+    int i;
+    for(i = 0; i < n; i++)
+        p[i] = v + i;
+}
+
+void main(){
+    int keep; int i; int j; int total;
+    int *ptr;
+
+    keep = 11;
+    total = 0;
+    {
+        int a[6];
+        fill(a, 6, 10);
+        total = total + a[0] + a[5];
+    }
+    {
+        int b[6];
+        int k;
+        fill(b, 6, 100);
+        k = 0;
+        for(i = 0; i < 6; i++)
+            k = k + b[i];
+        total = total + k;
+    }
+    {
+        struct vec v;
+        struct vec w;
+        v.x = 1; v.y = 2; v.z = 3;
+        w.x = v.z; w.y = v.x; w.z = v.y;
+        total = total + w.x * 100 + w.y * 10 + w.z;
+    }
+    printf("%d %d\n", total, keep);
+
+    for(i = 0; i < 3; i++){
+        int x;
+        int y;
+        x = i * 4;
+        ptr = &x;
+        {
+            int z;
+            int w;
+            z = 50;
+            w = z + i;
+            *ptr = *ptr + w;
+        }
+        y = x + keep;
+        total = total + y;
+    }
+    printf("%d\n", total);
+
+    j = 1;
+    while(j < 3){
+        int w = 7;
+        for(i = 0; i < 2; i++){
+            int f = 100;
+            w = w + f;
+        }
+        printf("%d %d %d\n", j, i, w);
+        j++;
+    }
+
+    printf("%d %d\n", depth(10), keep);
+}